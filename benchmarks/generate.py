@@ -0,0 +1,215 @@
+import argparse
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# ----------------------------
+# Syntetiske datafiler i samme format som standardized_*.csv
+# ----------------------------
+# Brukes av benchmarkene for å måle hvordan fanene skalerer fra 10k til 10M rader.
+# Filene skrives i biter, så selv 10M rader genereres uten å holde alt i minnet.
+#
+#   python -m benchmarks.generate --rows 1M
+
+CHUNK_ROWS = 500_000
+START_DATE = pd.Timestamp("2015-01-01")
+MAX_DAYS = 20 * 365
+
+PRODUCTS = ["Clip On Extension Virgin", "Tape Extension", "Keratin Extension Virgin",
+            "Clip On Volume", "Ponytail Extension", "Keratin Behandling"]
+LENGTHS = [30, 40, 45, 50, 55, 60]
+COLORS = ["#1", "#2", "#4", "#6", "#12", "#613", "#613/#12", "#18/#613"]
+KEYWORD_WORDS = ["hair", "extensions", "luxushair", "keratin", "behandling", "clip", "on",
+                 "tape", "premium", "virgin", "hårforlengelse", "billig", "oslo", "bergen",
+                 "pris", "langt", "hår", "ponytail", "volum", "extension"]
+
+
+def parse_size(text):
+    # "10k" -> 10_000, "1M" -> 1_000_000
+    text = text.strip().lower()
+    factor = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * factor)
+
+
+def format_size(n):
+    if n >= 1_000_000 and n % 1_000_000 == 0:
+        return f"{n // 1_000_000}M"
+    if n >= 1_000 and n % 1_000 == 0:
+        return f"{n // 1_000}k"
+    return str(n)
+
+
+def _format_amount(values):
+    # Samme format som eksporten: " 13 715.00"
+    return " " + pd.Series(values).map("{:,.2f}".format).str.replace(",", " ", regex=False)
+
+
+def _days_for_rows(positions, n_rows):
+    # Radene fordeles jevnt over perioden; flere rader per dag når n_rows > MAX_DAYS
+    days = min(n_rows, MAX_DAYS)
+    return START_DATE + pd.to_timedelta(positions * days // n_rows, unit="D")
+
+
+def _write_chunks(path, chunks):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(f, index=False, header=i == 0)
+
+
+def _sales_chunks(n_rows, rng):
+    for start in range(0, n_rows, CHUNK_ROWS):
+        positions = np.arange(start, min(start + CHUNK_ROWS, n_rows))
+        n = len(positions)
+        orders = rng.poisson(12, n)
+        sales = orders * rng.gamma(4.0, 400.0, n)
+        yield pd.DataFrame({
+            "date": _days_for_rows(positions, n_rows).strftime("%Y-%m-%d"),
+            "xsales": _format_amount(sales),
+            "antallordre": orders,
+            "produkt": orders + rng.poisson(8, n),
+            "sales": _format_amount(sales),
+            "invoiced": _format_amount(sales * 0.8),
+            "refunded": _format_amount(np.zeros(n)),
+            "sales tax": _format_amount(sales * 0.2),
+            "sales shipping": _format_amount(orders * 99.0),
+            "sales discount": _format_amount(np.zeros(n)),
+            "canceled": 0.0,
+        })
+
+
+def _sku_catalog(n_rows, rng):
+    n_skus = int(np.clip(n_rows // 200, 50, 5000))
+    names = rng.choice(PRODUCTS, n_skus)
+    lengths = rng.choice(LENGTHS, n_skus)
+    colors = rng.choice(COLORS, n_skus)
+    weights = rng.choice([16, 50, 100, 120, 180], n_skus)
+    skus = [f"{name}-{color}-{length}cm {weight}g-{i}" for i, (name, color, length, weight)
+            in enumerate(zip(names, colors, lengths, weights))]
+    # Noen få SKU-er står for det meste av salget
+    popularity = 1.0 / np.arange(1, n_skus + 1)
+    return names, np.array(skus), popularity / popularity.sum()
+
+
+def _product_sales_chunks(n_rows, rng):
+    names, skus, popularity = _sku_catalog(n_rows, rng)
+    for start in range(0, n_rows, CHUNK_ROWS):
+        positions = np.arange(start, min(start + CHUNK_ROWS, n_rows))
+        n = len(positions)
+        # Ordrer på 1–4 linjer; bare første linje i en ordre har dato
+        order_start = rng.random(n) < 0.45
+        order_start[0] = True
+        dates = _days_for_rows(positions, n_rows).strftime("%m/%d/%y")
+        codes = rng.choice(len(skus), n, p=popularity)
+        yield pd.DataFrame({
+            "date": np.where(order_start, dates, ""),
+            "product_name": names[codes],
+            "sku": skus[codes],
+            "antallsolgt": rng.integers(1, 4, n),
+        })
+
+
+def _keyword_vocabulary(n_rows, rng):
+    n_keywords = int(np.clip(n_rows // 20, 100, 200_000))
+    words = np.array(KEYWORD_WORDS)
+    lengths = rng.integers(1, 4, n_keywords)
+    keywords = {" ".join(rng.choice(words, k)) for k in lengths}
+    return np.array(sorted(keywords))
+
+
+def _traffic_chunks(n_rows, rng):
+    keywords = _keyword_vocabulary(n_rows, rng)
+    for start in range(0, n_rows, CHUNK_ROWS):
+        positions = np.arange(start, min(start + CHUNK_ROWS, n_rows))
+        n = len(positions)
+        days = _days_for_rows(positions, n_rows)
+        # Som i eksporten: dato på første rad for hver dag, tom på resten
+        first_of_day = np.r_[True, days[1:] != days[:-1]]
+        views = rng.integers(10, 60_000, n)
+        yield pd.DataFrame({
+            "date": np.where(first_of_day, days.strftime("%Y-%m-%d"), ""),
+            "søkeord": keywords[rng.integers(0, len(keywords), n)],
+            "konverteringer": (views * rng.random(n) * 0.1).astype("int64"),
+            "antallvisninger": views,
+            "clicks": pd.Series(rng.random(n) * 20).map("{:.2f}%".format),
+            "plassering": np.round(rng.random(n) * 20 + 1, 2),
+        })
+
+
+def _cost_chunks(n_rows, rng):
+    # Én rad per år i perioden, som kostnadsfilen; størrelsen følger perioden, ikke n_rows
+    years = START_DATE.year + np.arange(max(min(n_rows, MAX_DAYS) // 365, 1))
+    n = len(years)
+    goods = rng.integers(1_000_000, 3_000_000, n)
+    operating = rng.integers(1_000_000, 3_000_000, n)
+    financial = rng.integers(20_000, 150_000, n)
+    salaries = rng.integers(500_000, 1_500_000, n)
+    yield pd.DataFrame({
+        "date": years,
+        "varekostnad": goods,
+        "driftskostnader": operating,
+        "finansielle_kostnader": financial,
+        "lønnskostnad": salaries,
+        "totale_kostnader": goods + operating + financial + salaries,
+        "driftsresultat": rng.integers(200_000, 1_500_000, n),
+    })
+
+
+def _product_prices_chunks(n_rows, rng):
+    # Som produktprisfilen: ett produkt per SKU i produktdataene, hvert etterfulgt av
+    # en tom skillelinje
+    names, skus, _ = _sku_catalog(n_rows, rng)
+    n = len(skus)
+    purchase = np.round(rng.uniform(100, 2000, n), 0)
+    price = np.round(purchase * rng.uniform(1.8, 3.2, n), -1) - 1
+    without_vat = np.round(price / 1.25, 0)
+    products = pd.DataFrame({
+        "product_name": skus,
+        "sku": "",
+        "innkjøpspris": purchase,
+        "vår utpris (med mva)": price,
+        "salgspris_uten_mva": without_vat,
+        "inntekt (etter avsatt mva) pr produkt før skatt": without_vat - purchase,
+        "prosentvis inntekt av salgspris før mva og skatt": np.round((without_vat - purchase) / without_vat * 100),
+    })
+    blank = pd.DataFrame(np.nan, index=products.index, columns=products.columns)
+    yield pd.concat([products, blank]).sort_index(kind="stable").reset_index(drop=True)
+
+
+GENERATORS = {
+    "sales": _sales_chunks,
+    "product_sales": _product_sales_chunks,
+    "traffic": _traffic_chunks,
+    "cost": _cost_chunks,
+    "product_prices": _product_prices_chunks,
+}
+
+
+def generate(out_dir, n_rows, seed=0, datasets=tuple(GENERATORS)):
+    # Returnerer {datasett: sti}; eksisterende filer med samme størrelse gjenbrukes
+    size_dir = os.path.join(out_dir, format_size(n_rows))
+    os.makedirs(size_dir, exist_ok=True)
+    paths = {}
+    for name in datasets:
+        path = os.path.join(size_dir, f"standardized_{name}.csv")
+        if not os.path.exists(path):
+            tmp_path = f"{path}.tmp"
+            _write_chunks(tmp_path, GENERATORS[name](n_rows, np.random.default_rng(seed)))
+            os.replace(tmp_path, path)
+        paths[name] = path
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genererer syntetiske SmartDash-filer")
+    parser.add_argument("--rows", default="100k", help="Antall rader per fil, f.eks. 10k, 1M, 10M")
+    parser.add_argument("--out", default=os.path.join(tempfile.gettempdir(), "smartdash_bench"), help="Katalog filene skrives til")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    for name, path in generate(args.out, parse_size(args.rows), args.seed).items():
+        print(f"{name:15s} {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+
+# ----------------------------
+# Importtid for appen ved kald start
+# ----------------------------
+# Kjører importene øverst i dashapp.py i en ny Python-prosess (slik en container
+# som skalerer fra null gjør) og måler tiden. Feiler hvis tiden går over
+# budsjettet, eller hvis moduler som skal lastes først når en fane brukes
+# (Plotly, Dash, GA-klienten) blir importert allerede ved oppstart.
+# tests/test_import_time.py kjører samme måling med pytest.
+#
+#   python -m benchmarks.import_time --budget 1.5
+#   python -m benchmarks.import_time --top 15
+
+APP_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "dashapp.py")
+DEFAULT_BUDGET_SECONDS = 1.5
+# Skal ikke være importert før en visning trenger dem. Streamlit laster selv
+# plotly-kjernen (for temaet sitt), men ikke plotly.express.
+DEFERRED_MODULES = ["dash", "plotly.express", "google.analytics", "http.server"]
+
+CHILD_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+exec(compile({source!r}, "dashapp-imports", "exec"))
+seconds = time.perf_counter() - start
+loaded = [name for name in {deferred!r} if name in sys.modules]
+print(json.dumps({{"seconds": seconds, "loaded": loaded}}))
+"""
+
+
+def app_imports(path=APP_FILE):
+    # Import-setningene på toppnivå i appen, i samme rekkefølge
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    return "\n".join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+def measure(source, repeat=3):
+    # Beste av flere kalde starter; hver måling er en ny prosess uten importerte moduler
+    cwd = os.path.dirname(APP_FILE)
+    script = CHILD_SCRIPT.format(source=source, deferred=DEFERRED_MODULES)
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", script], cwd=cwd, capture_output=True, text=True, check=True)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return min(runs, key=lambda run: run["seconds"])
+
+
+def slowest_modules(source, top):
+    # Kumulativ importtid per toppnivåmodul fra -X importtime
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", source], cwd=os.path.dirname(APP_FILE),
+                         capture_output=True, text=True, check=True)
+    totals = {}
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit() and not name.startswith("  "):
+            totals[name.strip()] = int(cumulative) / 1e6
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Måler importtiden til SmartDash ved kald start")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_SECONDS, help="Maks sekunder for importene")
+    parser.add_argument("--repeat", type=int, default=3, help="Antall kalde starter (beste teller)")
+    parser.add_argument("--top", type=int, default=10, help="Vis de tregeste toppnivåmodulene")
+    args = parser.parse_args()
+
+    source = app_imports()
+    result = measure(source, args.repeat)
+    print(f"Importtid ved kald start: {result['seconds']:.3f} s (budsjett {args.budget:g} s)")
+    if args.top:
+        for name, seconds in slowest_modules(source, args.top):
+            print(f"  {seconds:7.3f} s  {name}")
+
+    failed = False
+    if result["loaded"]:
+        print(f"FEIL: importeres ved oppstart, men skal lastes ved behov: {', '.join(result['loaded'])}")
+        failed = True
+    if result["seconds"] > args.budget:
+        print("FEIL: importtiden er over budsjettet")
+        failed = True
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
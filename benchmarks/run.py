@@ -0,0 +1,271 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+from benchmarks.generate import format_size, generate, parse_size
+from smartdash.charts import choose_granularity, fan_figure, line_figure
+from smartdash.day_groups import DayGroupIndex, normalize_product_sales
+from smartdash.ga_reports import GA_PROPERTY, FakeAnalyticsClient, GAReportCache
+from smartdash.reports import (
+    cost_columns, cost_summary, inventory_recommendations, is_streamed, normalize_cost, normalize_sales,
+    price_deviations, price_sweep, product_price_catalog, seo_top_keywords, valuation,
+)
+from smartdash.rollups import LABELS as ROLLUP_LABELS, SalesRollup
+from smartdash.schemas import parse_csv
+from smartdash.sku_index import SkuIndex
+from smartdash.streaming import aggregate_product_sales
+
+# ----------------------------
+# Benchmark av fanenes datapipeline uten Streamlit
+# ----------------------------
+# Hver fane kjøres som stegene appen gjør (innlasting, filter, gruppering,
+# figur) mot syntetiske filer, og veggtid og topp-minne måles per steg.
+# Topp-minne er det tracemalloc ser (Python, numpy og pandas), relativt til
+# starten av steget, og måles i en egen runde etter tidsmålingen.
+# Figursteget inkluderer JSON-serialiseringen som sendes til nettleseren.
+# Innlastingen er den appen gjør uten snapshot (kald start): produktfiler under
+# STREAMING_THRESHOLD_BYTES parses hele, større filer leses i strømmemodus.
+#
+#   python -m benchmarks.run --sizes 10k,100k,1M --json resultater.json
+#   python -m benchmarks.run --sizes 10k,100k --baseline resultater.json
+#   python -m benchmarks.run --sizes 10k,100k,1M,10M --budget 5
+
+DEFAULT_SIZES = "10k,100k,1M"
+# Endringer under støygulvet regnes ikke som regresjon
+NOISE_SECONDS = 0.05
+NOISE_BYTES = 1_000_000
+
+
+class StageTimer:
+    def __init__(self, track_memory=True):
+        self.track_memory = track_memory
+        self.results = []
+
+    @contextmanager
+    def stage(self, size, pipeline, name):
+        if self.track_memory:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        yield
+        wall = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] - base if self.track_memory else None
+        self.results.append({"size": size, "pipeline": pipeline, "stage": name,
+                             "seconds": wall, "peak_bytes": peak})
+
+
+def bench_sales(timer, size, path):
+    with timer.stage(size, "salgsdata", "load"):
+        df = normalize_sales(parse_csv(path, "sales"))
+    with timer.stage(size, "salgsdata", "rollup"):
+        rollup = SalesRollup(df.dropna(subset=["date"]))
+    first, last = rollup.first_date, rollup.last_date
+    with timer.stage(size, "salgsdata", "filter"):
+        # Siste år daglig, som standardvalget i fanen
+        start = max(first, last - pd.Timedelta(days=365))
+        rollup.frame(start, last, "D")
+        rollup.totals(start, last, "D")
+    with timer.stage(size, "salgsdata", "groupby"):
+        rollup.frame(first, last, "M")
+    with timer.stage(size, "salgsdata", "figure"):
+        freq = choose_granularity(first, last)
+        chart = rollup.frame(first, last, freq)
+        line_figure(chart, x=ROLLUP_LABELS[freq], y="Omsetning").to_json()
+    return rollup
+
+
+def load_product_sales(path):
+    # Samme valg som reports.load_product_sales, men uten snapshot
+    if is_streamed(path):
+        return aggregate_product_sales(path)
+    return normalize_product_sales(parse_csv(path, "product_sales"))
+
+
+def bench_cost(timer, size, path):
+    with timer.stage(size, "kostnader", "load"):
+        df = normalize_cost(parse_csv(path, "cost"))
+    with timer.stage(size, "kostnader", "groupby"):
+        columns = cost_columns(df)
+        cost_summary(df, 0.30)
+    with timer.stage(size, "kostnader", "figure"):
+        px.bar(df, x="date", y=columns, barmode="group").to_json()
+    return df
+
+
+def bench_inventory(timer, size, path):
+    with timer.stage(size, "lagerinnsikt", "load"):
+        df = load_product_sales(path)
+    with timer.stage(size, "lagerinnsikt", "index"):
+        sku_index = SkuIndex(df)
+        # Salgsdagene finnes bare når filen er parset hel
+        day_index = DayGroupIndex(df) if "day_group" in df.columns else None
+    with timer.stage(size, "lagerinnsikt", "filter"):
+        rows = sku_index.row_positions("40 cm")
+    with timer.stage(size, "lagerinnsikt", "groupby"):
+        # Siste år, gruppert per SKU med anbefalt varelager
+        end = df["date"].max()
+        grouped = inventory_recommendations(df, end - pd.Timedelta(days=365), end, rows)
+    with timer.stage(size, "lagerinnsikt", "figure"):
+        px.bar(grouped, x="sku", y="antallsolgt",
+               hover_data=["product_name", "Gj.sn. solgt per måned", "Anbefalt varelager"]).to_json()
+    if day_index is not None:
+        with timer.stage(size, "lagerinnsikt", "dager"):
+            day_index.day_summary(end - pd.Timedelta(days=365), end)
+            day_index.sold_same_day(rows, end - pd.Timedelta(days=365), end)
+
+
+def bench_seo(timer, size, path):
+    with timer.stage(size, "seo", "load"):
+        df = parse_csv(path, "traffic")
+    with timer.stage(size, "seo", "groupby"):
+        seo_agg = seo_top_keywords(df)
+    with timer.stage(size, "seo", "figure"):
+        px.bar(seo_agg, x="søkeord", y="antallvisninger").to_json()
+
+
+def bench_pricing(timer, size, path):
+    with timer.stage(size, "priser", "load"):
+        catalog = product_price_catalog(parse_csv(path, "product_prices"))
+    with timer.stage(size, "priser", "groupby"):
+        price_deviations(catalog, 0.30, 0.25)
+    with timer.stage(size, "priser", "sweep"):
+        # Hele rutenettet fra glidebryterne i fanen
+        price_sweep(catalog, np.arange(0.0, 0.951, 0.05), np.arange(0.0, 1.001, 0.05))
+
+
+def bench_valuation(timer, size, cost_df, rollup):
+    with timer.stage(size, "verdivurdering", "groupby"):
+        result = valuation(cost_df, rollup)
+    with timer.stage(size, "verdivurdering", "figure"):
+        value_df = result["value_df"]
+        px.bar(value_df, x="Metode", y="Verdi (kr)",
+               error_y=value_df["Høy (kr)"] - value_df["Verdi (kr)"],
+               error_y_minus=value_df["Verdi (kr)"] - value_df["Lav (kr)"]).to_json()
+        if result["dcf"] is not None:
+            fan_figure(result["dcf"]["cash_flow_bands"], x="År").to_json()
+
+
+def bench_live(timer, size):
+    # GA-fanen skalerer med datoperioden, ikke filstørrelsen – tre år med syntetiske tall
+    cache = GAReportCache(client_factory=FakeAnalyticsClient)
+    metrics = ["activeUsers", "newUsers"]
+    start, end = date(2022, 1, 1), date(2024, 12, 31)
+    with timer.stage(size, "live-data", "load"):
+        df = cache.get(GA_PROPERTY, metrics, start, end)
+    with timer.stage(size, "live-data", "figure"):
+        line_figure(df, x="Dato", y=metrics).to_json()
+
+
+def _run_pass(timer, sizes, data_dir):
+    for n_rows in sizes:
+        size = format_size(n_rows)
+        paths = generate(data_dir, n_rows)
+        rollup = bench_sales(timer, size, paths["sales"])
+        cost_df = bench_cost(timer, size, paths["cost"])
+        bench_inventory(timer, size, paths["product_sales"])
+        bench_seo(timer, size, paths["traffic"])
+        bench_pricing(timer, size, paths["product_prices"])
+        bench_valuation(timer, size, cost_df, rollup)
+        bench_live(timer, size)
+
+
+def _warm_up():
+    # Første Plotly-figur bygger opp validatorer og maler – skal ikke telle på første steg
+    line_figure(pd.DataFrame({"x": [0, 1], "y": [0, 1]}), x="x", y="y").to_json()
+
+
+def run(sizes, data_dir, track_memory=True):
+    # Tid måles uten tracemalloc (den gjør Python-tunge steg mange ganger tregere);
+    # topp-minne måles i en egen runde
+    _warm_up()
+    timer = StageTimer(track_memory=False)
+    _run_pass(timer, sizes, data_dir)
+    if track_memory:
+        memory_timer = StageTimer(track_memory=True)
+        tracemalloc.start()
+        try:
+            _run_pass(memory_timer, sizes, data_dir)
+        finally:
+            tracemalloc.stop()
+        for result, measured in zip(timer.results, memory_timer.results):
+            result["peak_bytes"] = measured["peak_bytes"]
+    return timer.results
+
+
+def print_results(results):
+    print(f"{'størrelse':>9}  {'fane':14s} {'steg':8s} {'sekunder':>9} {'topp-minne':>11}")
+    for r in results:
+        peak = f"{r['peak_bytes'] / 1e6:9.1f} MB" if r["peak_bytes"] is not None else f"{'-':>11}"
+        print(f"{r['size']:>9}  {r['pipeline']:14s} {r['stage']:8s} {r['seconds']:9.3f} {peak}")
+
+
+def find_regressions(results, baseline, tolerance):
+    previous = {(r["size"], r["pipeline"], r["stage"]): r for r in baseline}
+    regressions = []
+    for r in results:
+        old = previous.get((r["size"], r["pipeline"], r["stage"]))
+        if old is None:
+            continue
+        if r["seconds"] > old["seconds"] * tolerance and r["seconds"] - old["seconds"] > NOISE_SECONDS:
+            regressions.append((r, "sekunder", old["seconds"], r["seconds"]))
+        if r["peak_bytes"] is not None and old.get("peak_bytes") is not None and \
+                r["peak_bytes"] > old["peak_bytes"] * tolerance and r["peak_bytes"] - old["peak_bytes"] > NOISE_BYTES:
+            regressions.append((r, "topp-minne", old["peak_bytes"], r["peak_bytes"]))
+    return regressions
+
+
+def largest_size_within(results, budget_seconds):
+    # Største filstørrelse der ingen fane bruker mer enn budsjettet totalt
+    totals = {}
+    for r in results:
+        key = (r["size"], r["pipeline"])
+        totals[key] = totals.get(key, 0.0) + r["seconds"]
+    best = None
+    for size in dict.fromkeys(r["size"] for r in results):
+        if all(total <= budget_seconds for (s, _), total in totals.items() if s == size):
+            best = size
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark av SmartDash-fanene uten Streamlit")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Kommaseparerte radantall, f.eks. 10k,1M,10M")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "smartdash_bench"),
+                        help="Katalog for genererte filer (gjenbrukes mellom kjøringer)")
+    parser.add_argument("--json", help="Skriv resultatene til denne filen")
+    parser.add_argument("--baseline", help="Sammenlign med resultater fra en tidligere kjøring")
+    parser.add_argument("--tolerance", type=float, default=1.3, help="Tillatt faktor mot baseline")
+    parser.add_argument("--budget", type=float, help="Sekunder per fane – rapporterer største størrelse innenfor")
+    parser.add_argument("--no-memory", action="store_true", help="Slå av minnemåling (tracemalloc gir overhead)")
+    args = parser.parse_args()
+
+    sizes = [parse_size(s) for s in args.sizes.split(",") if s.strip()]
+    results = run(sizes, args.data_dir, track_memory=not args.no_memory)
+    print_results(results)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.budget is not None:
+        best = largest_size_within(results, args.budget)
+        print(f"\nStørste størrelse innenfor {args.budget:g} s per fane: {best or 'ingen'}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance)
+        for r, metric, old, new in regressions:
+            print(f"REGRESJON {r['size']} {r['pipeline']}/{r['stage']}: {metric} {old:.3g} -> {new:.3g}")
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
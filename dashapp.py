@@ -1,34 +1,37 @@
 import os
 import json
-from dash import dash_table
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-from datetime import datetime
-from io import BytesIO
-import re
-import base64
-from dash import html, dcc, Dash
-from dash.dependencies import Output, Input
-from google.analytics.data_v1beta import BetaAnalyticsDataClient, RunReportRequest, Dimension, DateRange, Metric  # type: ignore
-import math
-from dash import no_update
-
-# Hent innholdet fra Streamlit Secrets
-key_content = st.secrets["GOOGLE_APPLICATION_CREDENTIALS_CONTENT"]
-
-# Konverter AttrDict til en vanlig Python-ordbok
-key_content_dict = dict(key_content)
-
-# Konverter innholdet til en JSON-streng
-key_content_str = json.dumps(key_content_dict)
-
-# Lagre innholdet midlertidig som en fil
-with open("key.json", "w") as key_file:
-    key_file.write(key_content_str)
+from datetime import date
+from smartdash.schemas import parse_issues
+from smartdash.rollups import LABELS as ROLLUP_LABELS, SalesRollup
+from smartdash.charts import GRANULARITY_LABELS, choose_granularity, fan_figure, line_figure, resample_frame
+from smartdash.sku_index import SkuIndex, tokenize
+from smartdash.append_store import DATASETS, AppendStore
+from smartdash.ga_reports import GA_PROPERTY, GAReportCache, uses_fake_client
+from smartdash.reports import (
+    cost_columns, cost_summary, cost_summary_from_frame, inventory_recommendations, is_streamed, load_dataset,
+    load_product_sales, load_sales, main_product_options, normalize_cost, normalize_sales, optimal_price,
+    price_deviations, price_sweep, product_price_catalog, purchase_price_map, SEO_TOP_N, sweep_values, valuation,
+    valuation_from_frame,
+)
+from smartdash.batch import load_report
+from smartdash.dataset_cache import DatasetCache
+from smartdash.figure_cache import CachedFigure, create_figure_cache, figure_key
+from smartdash.ingest import IngestCoordinator, dataset_kind
+from smartdash.snapshots import source_hash
+from smartdash.metrics import create_registry
+from smartdash.forecast import FORECAST_VERSION
+from smartdash.day_groups import DAY_GROUPS_VERSION, DayGroupIndex, daily_day_groups
+from smartdash.keywords import KEYWORDS_VERSION, METRICS as KEYWORD_METRICS, KeywordStats
+from smartdash.tables import PAGE_SIZE, table_page
+from smartdash.valuation import (
+    DEFAULT_ASSUMPTIONS, REINVESTMENT_RATE, TAX_RATE, default_growth_pct, derive_financials, monte_carlo_dcf,
+)
 
-# Sett miljøvariabelen for Google Analytics
-os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "key.json"
+# Datasettene deles mellom sesjoner og leses rett fra minnemappede snapshots. Med
+# copy-on-write kopieres en kolonne først når en visning faktisk endrer den.
+pd.set_option("mode.copy_on_write", True)
 
 # Konfigurer siden
 st.set_page_config(
@@ -37,6 +40,22 @@ st.set_page_config(
     page_icon="🚀"  # eks. et alternativt emoji-ikon
 )
 
+@st.cache_resource
+def get_metrics():
+    # Tidsmålinger og cache-treff for hele prosessen (logg, metrikkfil og endepunkt)
+    return create_registry()
+
+# Måler stegene i denne kjøringen; legges inn i metrikkene nederst i skriptet
+run_metrics = get_metrics().start_run()
+
+def timed(name):
+    return run_metrics.stage(name)
+
+def emit_chart(name, fig, **kwargs):
+    # Serialiseringen av figuren til nettleseren måles som et eget steg
+    with timed(f"emit.{name}"):
+        st.plotly_chart(fig, use_container_width=True, **kwargs)
+
 
 # Google Analytics (frontend-script)
 st.markdown("""
@@ -50,69 +69,28 @@ st.markdown("""
 </script>
 """, unsafe_allow_html=True)
 
-# Legg til CSS for å gjøre fanene scrollbare
-st.markdown("""
-    <style>
-    div[data-testid="stTabs"] > div {
-        overflow-x: auto;
-        white-space: nowrap;
-    }
-    div[data-testid="stTabs"] button {
-        flex-shrink: 0;
-    }
-    </style>
-""", unsafe_allow_html=True)
-
-# Forbedret CSS for horisontal scrollbar
-st.markdown("""
+# CSS for appen og for scrollbare faner, samlet i én blokk som sendes én gang per kjøring
+APP_CSS = """
     <style>
-    div[data-testid="stTabs"] > div {
+    /* Fanene er en horisontal st.radio (key="active_view"); raden scroller sidelengs på smale skjermer */
+    .st-key-active_view div[role="radiogroup"] {
+        flex-wrap: nowrap;
         overflow-x: auto;
         white-space: nowrap;
         scrollbar-width: thin; /* For smal scrollbar */
         scrollbar-color: #007bff #e6e6e6; /* Farge på scrollbar */
     }
-    div[data-testid="stTabs"]::-webkit-scrollbar {
+    .st-key-active_view div[role="radiogroup"]::-webkit-scrollbar {
         height: 8px; /* Høyde på scrollbar */
     }
-    div[data-testid="stTabs"]::-webkit-scrollbar-thumb {
+    .st-key-active_view div[role="radiogroup"]::-webkit-scrollbar-thumb {
         background-color: #007bff; /* Farge på scrollbar-tommel */
         border-radius: 10px; /* Runde kanter */
     }
-    div[data-testid="stTabs"]::-webkit-scrollbar-track {
+    .st-key-active_view div[role="radiogroup"]::-webkit-scrollbar-track {
         background: #e6e6e6; /* Bakgrunnsfarge for scrollbar */
     }
-    div[data-testid="stTabs"] button {
-        flex-shrink: 0;
-    }
-    </style>
-""", unsafe_allow_html=True)
 
-# Forbedret CSS for horisontal scrollbar kun for fanene
-st.markdown("""
-    <style>
-    div[data-testid="stTabs"] > div {
-        overflow-x: auto;
-        white-space: nowrap;
-        scrollbar-width: thin; /* For smal scrollbar */
-        scrollbar-color: #007bff #e6e6e6; /* Farge på scrollbar */
-    }
-    div[data-testid="stTabs"]::-webkit-scrollbar {
-        height: 8px; /* Høyde på scrollbar */
-    }
-    div[data-testid="stTabs"]::-webkit-scrollbar-thumb {
-        background-color: #007bff; /* Farge på scrollbar-tommel */
-        border-radius: 10px; /* Runde kanter */
-    }
-    div[data-testid="stTabs"]::-webkit-scrollbar-track {
-        background: #e6e6e6; /* Bakgrunnsfarge for scrollbar */
-    }
-    </style>
-""", unsafe_allow_html=True)
-
-# Legg til CSS for å style appen
-st.markdown("""
-    <style>
     /* Bakgrunnsfarge */
     body {
         background-color: #f5f5f5;
@@ -129,7 +107,8 @@ st.markdown("""
     }
 
     /* Tab-knapper */
-    div[data-testid="stTabs"] button {
+    .st-key-active_view div[role="radiogroup"] label {
+        flex-shrink: 0;
         background-color: #ffffff;
         border: 1px solid #cccccc;
         border-radius: 5px;
@@ -139,14 +118,19 @@ st.markdown("""
         font-weight: bold;
     }
 
+    /* Skjul radioknappens sirkel, fanen vises som en knapp */
+    .st-key-active_view div[role="radiogroup"] label > div:first-child {
+        display: none;
+    }
+
     /* Hover-effekt på tab-knapper */
-    div[data-testid="stTabs"] button:hover {
+    .st-key-active_view div[role="radiogroup"] label:hover {
         background-color: #e6e6e6;
         color: #000000;
     }
 
     /* Aktiv tab */
-    div[data-testid="stTabs"] button[aria-selected="true"] {
+    .st-key-active_view div[role="radiogroup"] label:has(input:checked) {
         background-color: #007bff;
         color: #ffffff;
     }
@@ -157,7 +141,8 @@ st.markdown("""
         border-radius: 5px;
     }
     </style>
-""", unsafe_allow_html=True)
+"""
+st.markdown(APP_CSS, unsafe_allow_html=True)
 
 # ----------------------------
 # 2. Dataopplasting og standarddata
@@ -168,79 +153,426 @@ uploaded_cost = st.sidebar.file_uploader("Last opp Kostnadsdata", type="csv", ke
 uploaded_traffic = st.sidebar.file_uploader("Last opp Trafikkdata", type="csv", key="traffic")
 uploaded_prod = st.sidebar.file_uploader("Last opp Produktdata", type="csv", key="prod")
 uploaded_prices = st.sidebar.file_uploader("Last opp Innkjøpspriser", type="csv", key="prices")
+uploaded_product_prices = st.sidebar.file_uploader("Last opp Produktpriser", type="csv", key="product_prices")
+# Fremdriften for innlesingen av opplastingene vises her, under opplastingsfeltene
+ingest_panel = st.sidebar.container()
+
+# Delta-opplasting: nye perioder legges til et lagret datasett i stedet for å laste opp hele historikken
+with st.sidebar.expander("➕ Legg til nye perioder"):
+    st.markdown("Last opp kun de nye radene (f.eks. forrige uke). De slås sammen med lagrede data, "
+                "og dager/SKU-er som finnes fra før erstattes av de nye radene. Radene må ha dato.")
+    # Nøklene får et nytt nummer når lageret tømmes, så opplastingsfeltene tømmes også
+    delta_generation = st.session_state.setdefault("delta_generation", 0)
+    delta_sales = st.file_uploader("Nye salgsdata", type="csv", key=f"sales_delta_{delta_generation}")
+    delta_prod = st.file_uploader("Nye produktdata", type="csv", key=f"prod_delta_{delta_generation}")
+    delta_traffic = st.file_uploader("Nye trafikkdata", type="csv", key=f"traffic_delta_{delta_generation}")
+    reset_stores = st.button("Tøm lagrede data", key="reset_stores")
+
+@st.cache_resource
+def get_store(name):
+    return AppendStore(name)
+
+@st.cache_resource
+def get_dataset_cache():
+    # Én cache per prosess med et samlet minnebudsjett for alle sesjoner
+    return DatasetCache()
+
+def dataset_key(source):
+    # Et lagret datasett caches på sti og versjon, filer og opplastinger på innholdshash
+    if isinstance(source, AppendStore):
+        return source.cache_key()
+    return source_hash(source)
+
+def cached_dataset(kind, source, build):
+    # Datasettene deles mellom sesjoner og skal bare leses, ikke endres
+    built = []
+
+    def build_and_count():
+        built.append(True)
+        return build()
+
+    key = (kind, dataset_key(source))
+    with timed(f"load.{kind}"):
+        # En opplasting som leses i bakgrunnen hentes derfra i stedet for å parses på nytt
+        get_ingest_coordinator().wait(key)
+        value = get_dataset_cache().get(key, build_and_count)
+    run_metrics.lookup(kind, hit=not built)
+    return value
+
+@st.cache_resource
+def get_ingest_coordinator():
+    # Prosesspool som leser alle opplastede filer samtidig og legger dem i datasett-cachen
+    return IngestCoordinator(get_dataset_cache())
+
+def start_ingest():
+    uploads = {
+        "sales": ("Salgsdata", uploaded_sales),
+        "cost": ("Kostnadsdata", uploaded_cost),
+        "traffic": ("Trafikkdata", uploaded_traffic),
+        "product_sales": ("Produktdata", uploaded_prod),
+        "prices": ("Innkjøpspriser", uploaded_prices),
+        "product_prices": ("Produktpriser", uploaded_product_prices),
+    }
+    coordinator = get_ingest_coordinator()
+    tasks = []
+    with timed("load.ingest"):
+        for name, (label, upload) in uploads.items():
+            if upload is None:
+                continue
+            task = coordinator.submit(label, upload, (dataset_kind(name, upload), dataset_key(upload)))
+            if task is not None:
+                tasks.append(task)
+        coordinator.forget({task.key for task in tasks})
+    return tasks
+
+def show_ingest_progress(tasks):
+    # Status per fil, oppdatert hvert halve sekund til alle filene er lest
+    if not tasks:
+        return
+    polling = not all(task.done for task in tasks)
+
+    @st.fragment(run_every=0.5 if polling else None)
+    def ingest_progress():
+        if polling and all(task.done for task in tasks):
+            # Ferdig – en full kjøring viser resultatet og slår av oppdateringen
+            st.rerun()
+        finished = sum(task.done for task in tasks)
+        st.progress(finished / len(tasks), text=f"📥 Innlesing: {finished} av {len(tasks)} filer")
+        for task in tasks:
+            if task.status == "feil":
+                detail = f"❌ feilet ({task.error})"
+            elif task.status == "ferdig":
+                rows = "" if task.rows is None else f"{task.rows:,}".replace(",", " ")
+                detail = f"✅ {rows} rader på {task.seconds:.1f} s" if rows else "✅ allerede lest"
+            elif task.status == "leser":
+                detail = f"⏳ leses … {task.elapsed():.0f} s"
+            else:
+                detail = "🕒 i kø"
+            st.caption(f"{task.label} ({task.size / 1e6:.1f} MB): {detail}")
+
+    with ingest_panel:
+        ingest_progress()
+
+@st.cache_resource
+def get_figure_cache():
+    # Ferdige figurer for alle sesjoner, med eget minnebudsjett
+    return create_figure_cache()
+
+def cached_figure(name, sources, params, build):
+    # Figuren bygges bare når datasettene (sources) eller visningsvalgene (params) er nye.
+    # Den er delt mellom sesjoner, så den skal ikke endres etter at den er hentet.
+    built = []
+
+    def build_and_count():
+        built.append(True)
+        return CachedFigure(build())
+
+    key = figure_key(name, [dataset_key(source) for source in sources], params)
+    with timed(f"figure.{name}"):
+        entry = get_figure_cache().get(key, build_and_count)
+    run_metrics.lookup(f"figure.{name}", hit=not built)
+    return entry.figure
 
-@st.cache_data
 def load_sales_data(filepath):
-    df = pd.read_csv(filepath)
-    df.columns = df.columns.str.strip().str.lower()
-    rename_map = {"date": "dato", "sales": "omsetning", "antallsolgt": "antallordre"}
-    df = df.rename(columns=rename_map)
-    if "dato" in df.columns:
-        df["Dato"] = pd.to_datetime(df["dato"], errors="coerce").dt.date
-    if "omsetning" in df.columns:
-        df["Omsetning"] = pd.to_numeric(df["omsetning"].astype(str).str.replace(" ", ""), errors="coerce")
-    if "antallordre" in df.columns:
-        df["Ant. ordre"] = pd.to_numeric(df["antallordre"], errors="coerce")
-    return df
+    if isinstance(filepath, AppendStore):
+        return cached_dataset("sales", filepath, lambda: normalize_sales(filepath.read()))
+    return cached_dataset("sales", filepath, lambda: load_sales(filepath))
 
-def read_standard_csv(filepath, date_col="date"):
-    df = pd.read_csv(filepath)
-    df.columns = df.columns.str.strip()
-    if date_col in df.columns:
-        df[date_col] = pd.to_datetime(df[date_col], errors="coerce")
-    elif "dato" in df.columns:
-        df.rename(columns={"dato": date_col}, inplace=True)
-        df[date_col] = pd.to_datetime(df[date_col], errors="coerce")
+def read_standard_csv(filepath, schema, date_col="date"):
+    if isinstance(filepath, AppendStore):
+        df = cached_dataset(schema, filepath, filepath.read)
     else:
+        df = cached_dataset(schema, filepath, lambda: load_dataset(filepath, schema))
+    if date_col not in df.columns:
         st.error("Ingen dato-kolonne funnet.")
     return df
 
-if uploaded_sales is not None:
-    sales_df = load_sales_data(uploaded_sales)
-else:
-    sales_df = load_sales_data("standardized_sales.csv")
+def show_memory_footprint():
+    # Minnebruk per innlastet datasett – cachen er felles for alle sesjoner i prosessen
+    cache = get_dataset_cache()
+    stats = cache.stats()
+    with st.sidebar.expander(f"💾 Minnebruk: {stats['bytes'] / 1e6:.1f} av {stats['max_bytes'] / 1e6:.0f} MB"):
+        st.dataframe(pd.DataFrame(
+            [{"Datasett": kind, "Nøkkel": str(key)[:12], "MB": round(size / 1e6, 2)}
+             for (kind, key), size, _ in reversed(cache.entries())],
+            columns=["Datasett", "Nøkkel", "MB"]), hide_index=True)
+        figures = get_figure_cache().stats()
+        st.caption(f"Figurer: {figures['entries']} i cache, {figures['bytes'] / 1e6:.1f} av "
+                   f"{figures['max_bytes'] / 1e6:.0f} MB")
+
+def show_debug_panel(run):
+    # Ytelsesdata for denne kjøringen og hele prosessen; slås på i sidepanelet eller med ?debug=1
+    if not st.sidebar.checkbox("🛠 Vis ytelsesdata", value=st.query_params.get("debug") == "1", key="debug_panel"):
+        return
+    snapshot = get_metrics().snapshot()
+    with st.sidebar.expander(f"⏱️ Denne kjøringen: {run.elapsed() * 1000:.0f} ms", expanded=True):
+        st.dataframe(pd.DataFrame(
+            [{"Steg": name, "ms": round(seconds * 1000, 1)} for name, seconds in run.stages],
+            columns=["Steg", "ms"]), hide_index=True)
+    with st.sidebar.expander("📊 Alle kjøringer"):
+        st.dataframe(pd.DataFrame(
+            [{"Steg": name, "Antall": s["count"], "Snitt ms": round(s["seconds_avg"] * 1000, 1),
+              "p95 ms": round(s["seconds_p95"] * 1000, 1), "Maks ms": round(s["seconds_max"] * 1000, 1)}
+             for name, s in sorted(snapshot["stages"].items())],
+            columns=["Steg", "Antall", "Snitt ms", "p95 ms", "Maks ms"]), hide_index=True)
+        st.markdown("**Cache-treff per datasett**")
+        st.dataframe(pd.DataFrame(
+            [{"Datasett": kind, "Treff": s["hits"], "Bom": s["misses"], "Treffrate": f"{s['hit_rate']:.0%}"}
+             for kind, s in sorted(snapshot["cache_lookups"].items())],
+            columns=["Datasett", "Treff", "Bom", "Treffrate"]), hide_index=True)
+
+def show_parse_issues(label, df):
+    # Viser rader som ikke kunne tolkes etter skjemaet (df kan også være en SalesRollup)
+    count, issues = parse_issues(df)
+    if count:
+        with st.sidebar.expander(f"⚠️ {label}: {count} verdier kunne ikke tolkes"):
+            st.dataframe(issues, hide_index=True)
+
+# Ferdigberegnede rapporter for denne butikken (python -m smartdash.batch)
+REPORT_DIR = os.environ.get("SMARTDASH_REPORT_DIR")
+
+def precomputed_report(name, sources, params):
+    # Kun for filer på disk – opplastinger og lagrede datasett beregnes alltid her
+    if REPORT_DIR is None or not all(isinstance(source, str) for source in sources.values()):
+        return None
+    with timed(f"load.report.{name}"):
+        report = load_report(REPORT_DIR, name, sources, params)
+    run_metrics.lookup(f"report.{name}", hit=report is not None)
+    return report
+
+def build_sales_rollup(filepath):
+    # Bygges én gang per datasett og deles mellom kjøringer (kun lesing). For lagrede
+    # datasett legger append_delta inn den flettede rollupen under den nye versjonen.
+    # Har batchkjøringen dagssummene for filen, bygges rollupen fra dem uten å lese filen.
+    def build():
+        daily = precomputed_report("sales_daily", {"sales": filepath}, {})
+        return SalesRollup(daily if daily is not None else load_sales_data(filepath))
+    return cached_dataset("sales-rollup", filepath, build)
+
+def dataset_source(name, uploaded, default_path):
+    # En full opplasting vinner, deretter lagrede data fra delta-opplastinger, ellers standardfilen.
+    # Er det lagt deltaer oppå akkurat denne opplastingen, er det lageret som gjelder.
+    store = get_store(name)
+    if uploaded is not None:
+        return store if store.has_applied(dataset_key(uploaded)) else uploaded
+    return default_path if store.is_empty() else store
+
+def sales_source():
+    return dataset_source("sales", uploaded_sales, "standardized_sales.csv")
+
+# Datasettene lastes først når en visning trenger dem
+def get_sales_rollup():
+    rollup = build_sales_rollup(sales_source())
+    show_parse_issues("Salgsdata", rollup)
+    return rollup
+
+def cost_source():
+    return uploaded_cost if uploaded_cost is not None else "standardized_cost.csv"
+
+def get_cost_df():
+    cost_df = read_standard_csv(cost_source(), "cost")
+    show_parse_issues("Kostnadsdata", cost_df)
+    return normalize_cost(cost_df)
+
+def traffic_source():
+    return dataset_source("traffic", uploaded_traffic, "standardized_traffic.csv")
+
+def get_traffic_df():
+    traffic_df = read_standard_csv(traffic_source(), "traffic")
+    show_parse_issues("Trafikkdata", traffic_df)
+    return traffic_df
+
+def build_keyword_stats(filepath):
+    # Alle trafikkmetrikker summert per søkeord, bygget én gang per fil; klyngene lages ved behov
+    return cached_dataset("keyword-stats", filepath, lambda: KeywordStats(read_standard_csv(filepath, "traffic")))
+
+def product_prices_source():
+    return uploaded_product_prices if uploaded_product_prices is not None else "standardized_product_prices.csv"
+
+def read_product_prices(source):
+    return cached_dataset("product_prices", source, lambda: load_dataset(source, "product_prices"))
 
-if uploaded_cost is not None:
-    cost_df = read_standard_csv(uploaded_cost, date_col="date")
-else:
-    cost_df = read_standard_csv("standardized_cost.csv", date_col="date")
+def get_product_price_catalog():
+    prices_df = read_product_prices(product_prices_source())
+    show_parse_issues("Produktpriser", prices_df)
+    return product_price_catalog(prices_df)
 
-if uploaded_traffic is not None:
-    traffic_df = read_standard_csv(uploaded_traffic, date_col="date")
-else:
-    traffic_df = read_standard_csv("standardized_traffic.csv", date_col="date")
+def product_sales_source():
+    return dataset_source("product_sales", uploaded_prod, "standardized_product_sales.csv")
 
-if uploaded_prod is not None:
-    product_sales_df = read_standard_csv(uploaded_prod, date_col="date")
-else:
-    product_sales_df = read_standard_csv("standardized_product_sales.csv", date_col="date")
+def read_product_sales(filepath):
+    if not isinstance(filepath, AppendStore) and is_streamed(filepath):
+        # Store filer foldes bit for bit inn i dag/SKU-summer (strømmemodus)
+        return cached_dataset("product_sales-daily", filepath, lambda: load_product_sales(filepath))
+    return read_standard_csv(filepath, "product_sales")
 
-if "Produktnavn" in product_sales_df.columns:
-    product_sales_df.rename(columns={"Produktnavn": "product_name"}, inplace=True)
-if "SKU" in product_sales_df.columns:
-    product_sales_df.rename(columns={"SKU": "sku"}, inplace=True)
+def get_product_sales_df():
+    source = product_sales_source()
+    product_sales_df = read_product_sales(source)
+    if not isinstance(source, AppendStore) and is_streamed(source):
+        st.sidebar.caption("Produktdata er lest i strømmemodus og summert per dag og SKU.")
+    show_parse_issues("Produktdata", product_sales_df)
+    return product_sales_df
 
-# Eksempel på kolonneomdøping
-if "varekostnad" in cost_df.columns:
-    cost_df.rename(columns={"varekostnad": "cost"}, inplace=True)
+def build_sku_index(filepath):
+    # Ord-indeks over alle distinkte SKU-er og produktnavn, bygget én gang per fil
+    return cached_dataset("sku-index", filepath, lambda: SkuIndex(read_product_sales(filepath)))
+
+def build_day_group_index(filepath):
+    # Indeks over salgsdagene (linjer, varer og SKU-er per dag), bygget én gang per fil.
+    # Delta-lageret er summert per dag og SKU, så der er hver dato én salgsdag.
+    # Strømmemodus har verken linjene eller et lager å flette i, og får ingen indeks.
+    product_sales_df = read_product_sales(filepath)
+    if isinstance(filepath, AppendStore):
+        return cached_dataset("day-group-index", filepath, lambda: DayGroupIndex(daily_day_groups(product_sales_df)))
+    if "day_group" not in product_sales_df.columns:
+        return None
+    return cached_dataset("day-group-index", filepath, lambda: DayGroupIndex(product_sales_df))
+
+def append_delta(name, delta_file, base_source):
+    if delta_file is None:
+        return
+    store = get_store(name)
+    if not isinstance(base_source, str) and not store.has_applied(dataset_key(base_source)):
+        # En ny full opplasting erstatter det som er lagret, og deltaen legges oppå den
+        store.clear()
+    try:
+        if store.is_empty():
+            # Første delta: gjeldende datasett lagres som utgangspunkt
+            store.append_source(base_source)
+        previous_key = dataset_key(store)
+        appended = store.append_source(delta_file)
+    except ValueError as e:
+        st.sidebar.error(f"Kunne ikke legge til {delta_file.name}: {e}")
+        return
+    if appended is None:
+        return
+    # Indeksene som allerede er bygget for forrige versjon flettes med deltaen og legges
+    # inn under den nye versjonen, i stedet for å bygges på nytt fra hele lageret
+    delta, replaced = appended
+    if name == "sales":
+        # Bare dagene, ukene og månedene i deltaen regnes ut på nytt
+        merge_cached("sales-rollup", previous_key, store, lambda rollup: rollup.merge(normalize_sales(delta)))
+    elif name == "product_sales":
+        # Bare nye SKU-er og produktnavn deles i ord; bare dagene i deltaen telles på nytt
+        merge_cached("sku-index", previous_key, store, lambda index: index.merge(read_product_sales(store)))
+        merge_cached("day-group-index", previous_key, store,
+                     lambda index: index.merge(read_product_sales(store), delta))
+    elif name == "traffic":
+        # Radene i deltaen legges til og radene de erstattet trekkes fra, per søkeord
+        merge_cached("keyword-stats", previous_key, store, lambda stats: stats.merge(delta, replaced))
+
+def merge_cached(kind, previous_key, store, merge):
+    cache = get_dataset_cache()
+    previous = cache.peek((kind, previous_key))
+    if previous is not None:
+        cache.put((kind, dataset_key(store)), merge(previous))
+
+# Alle opplastede filer leses samtidig i bakgrunnen, før visningene ber om dem
+show_ingest_progress(start_ingest())
+
+if reset_stores:
+    for dataset_name in DATASETS:
+        get_store(dataset_name).clear()
+    # Deltaene som fortsatt ligger i opplastingsfeltene skal ikke legges til på nytt
+    st.session_state["delta_generation"] += 1
+    st.rerun()
+append_delta("sales", delta_sales, uploaded_sales if uploaded_sales is not None else "standardized_sales.csv")
+append_delta("product_sales", delta_prod, uploaded_prod if uploaded_prod is not None else "standardized_product_sales.csv")
+append_delta("traffic", delta_traffic, uploaded_traffic if uploaded_traffic is not None else "standardized_traffic.csv")
 
 # ----------------------------
-# 3. Navigasjon / Tabs
+# 3. Visninger – hver fane er en funksjon som kun kjøres når den er aktiv
 # ----------------------------
-tabs = st.tabs([
-    "Salgsdata",  
-    "Kostnadsanalyse & Budsjett", 
-    "Lagerinnsikt & Innkjøpsstrategi", 
-    "Digital Analyse & SEO", 
-    "Konkurrentanalyse", 
-    "Optimale produktpriser & Bedriftsråd", 
-    "Verdivurdering", 
-    "Analytics Live-data"
-])
+# Standardverdier for widgetene i alle visninger. Verdiene ligger i session_state,
+# slik at hver visning beholder sine valg når brukeren bytter fane.
+VIEW_STATE_DEFAULTS = {
+    "sales_filter_mode": "Daglig",
+    "sales_vis_type": "Stolpediagram",
+    "sales_start_date": date(2024, 1, 1),
+    "sales_end_date": date(2024, 12, 31),
+    "sales_start_month": "2024-01",
+    "sales_end_month": "2024-12",
+    "margin_kostnad": 30.0,
+    "sku_filter": "",
+    "sku_start": date(2023, 11, 7),
+    "sku_end": date(2024, 12, 31),
+    "main_product_select_unique_f6": "Clip On Extension Virgin 40 cm",
+    "margin_bedriftsrad_tab6": 30.0,
+    "overhead_bedrads_tab6": 25.0,
+    "price_sweep_margins": (20.0, 50.0),
+    "price_sweep_overheads": (10.0, 40.0),
+    # Vekstfeltet fylles med den historiske veksten fra salgsdataene første gang visningen åpnes
+    "valuation_growth": None,
+    "valuation_growth_source": None,
+    "valuation_discount": DEFAULT_ASSUMPTIONS["discount"] * 100,
+    "seo_metric": "antallvisninger",
+    "seo_clustered": False,
+    "seo_min_views": 100,
+    "ga_start_date": date(2025, 1, 1),
+    "ga_end_date": date.today(),
+    "ga_metric_live": ["Active Users", "New Users"],
+}
+
+# Sidedelte tabeller: nøkkel -> (standard sorteringskolonne, synkende)
+NO_SORT = "(ingen sortering)"
+PAGED_TABLES = {
+    "sales_daily_table": (NO_SORT, False),
+    "sales_monthly_table": (NO_SORT, False),
+    "cost_table": (NO_SORT, False),
+    "inventory_table": ("Anbefalt varelager", True),
+}
+for table_key, (sort_by, descending) in PAGED_TABLES.items():
+    VIEW_STATE_DEFAULTS.update({f"{table_key}_query": "", f"{table_key}_sort": sort_by,
+                                f"{table_key}_desc": descending, f"{table_key}_page": 1})
+
+def init_view_state(defaults):
+    for key, value in defaults.items():
+        if key in st.session_state:
+            # Tilordning på nytt hindrer at Streamlit rydder bort verdien til widgets
+            # som ikke vises i denne kjøringen
+            st.session_state[key] = st.session_state[key]
+        else:
+            st.session_state[key] = value
+
+TABLE_ROW_PX = 35
+
+def paged_table(df, key, page_size=PAGE_SIZE):
+    # Søk, sortering og sidedeling skjer på serveren; bare radene på siden sendes til nettleseren.
+    # key må finnes i PAGED_TABLES, så valgene huskes når brukeren bytter fane.
+    query_key, sort_key, desc_key, page_key = (f"{key}_query", f"{key}_sort", f"{key}_desc", f"{key}_page")
+    options = [NO_SORT] + [str(col) for col in df.columns]
+    if st.session_state[sort_key] not in options:
+        sort_by = PAGED_TABLES[key][0]
+        st.session_state[sort_key] = sort_by if sort_by in options else NO_SORT
+    col1, col2, col3 = st.columns([3, 3, 1])
+    query = col1.text_input("Søk i tabellen", key=query_key, placeholder="f.eks. 40 cm")
+    sort_col = col2.selectbox("Sorter etter", options, key=sort_key)
+    desc = col3.checkbox("Synkende", key=desc_key)
+
+    # Nytt søk eller ny sortering starter på første side
+    view = (query, sort_col, desc, len(df))
+    if st.session_state.get(f"{key}_view") != view:
+        st.session_state[f"{key}_view"] = view
+        st.session_state[page_key] = 1
+    with timed(f"compute.table.{key}"):
+        window, total, n_pages = table_page(df, query, None if sort_col == NO_SORT else sort_col, desc,
+                                            st.session_state[page_key], page_size)
+    st.session_state[page_key] = min(max(int(st.session_state[page_key]), 1), n_pages)
+    with timed(f"emit.table.{key}"):
+        st.dataframe(window, hide_index=True, use_container_width=True,
+                     height=TABLE_ROW_PX * (max(len(window), 1) + 1) + 3)
+    col1, col2 = st.columns([1, 4])
+    page = col1.number_input(f"Side (av {n_pages})", min_value=1, max_value=n_pages, step=1, key=page_key)
+    first = (page - 1) * page_size
+    col2.caption(f"Viser rad {min(first + 1, total)}–{first + len(window)} av {total:,}".replace(",", " "))
 
 # ----------------------------
 # FANE 1 – Salgsdata med templatemaler og info om SmartDash
-with tabs[0]:
+def render_sales_view():
+    # Plotly importeres i visningene som tegner figurer, så en kald start slipper å laste det
+    import plotly.express as px
+    sales_rollup = get_sales_rollup()
     st.markdown("### Slik bruker dere SmartDash")
     st.markdown("""
 **Templatemaler for opplasting**  
@@ -253,39 +585,62 @@ venstre sidebar.
     st.header("Salgsdata")
     st.markdown("Her kan du se salgsdata for valgte perioder. Velg om du vil se data daglig eller aggregert per måned, og hvilken visualisering du ønsker.")
     
-    filter_mode = st.radio("Filtermodus", ("Daglig", "Månedlig"))
-    vis_type = st.selectbox("Velg visualiseringsmetode", ("Stolpediagram", "Linjediagram", "Kakediagram"))
+    filter_mode = st.radio("Filtermodus", ("Daglig", "Månedlig"), key="sales_filter_mode")
+    vis_type = st.selectbox("Velg visualiseringsmetode", ("Stolpediagram", "Linjediagram", "Kakediagram"), key="sales_vis_type")
     
     if filter_mode == "Daglig":
-        start_date = st.date_input("Velg startdato", value=datetime(2024, 1, 1))
-        end_date = st.date_input("Velg sluttdato", value=datetime(2024, 12, 31))
-        mask = (pd.to_datetime(sales_df["Dato"]) >= pd.to_datetime(start_date)) & \
-               (pd.to_datetime(sales_df["Dato"]) <= pd.to_datetime(end_date))
-        filtered_sales = sales_df.loc[mask]
-        st.write("Filtrerte salgsdata (daglig):", filtered_sales)
-        if vis_type == "Stolpediagram":
-            fig = px.bar(filtered_sales, x="Dato", y="Omsetning", title="Omsetning per dag")
-        elif vis_type == "Linjediagram":
-            fig = px.line(filtered_sales, x="Dato", y="Omsetning", title="Omsetning per dag")
-        else:
-            agg = filtered_sales.groupby("Dato", as_index=False)["Omsetning"].sum()
-            fig = px.pie(agg, names="Dato", values="Omsetning", title="Andel omsetning daglig")
-        st.plotly_chart(fig, use_container_width=True, key="fig_sales_daily")
+        start_date = st.date_input("Velg startdato", key="sales_start_date")
+        end_date = st.date_input("Velg sluttdato", key="sales_end_date")
+        # Lange perioder tegnes per uke eller måned, så diagrammet holder seg lett
+        freq = choose_granularity(start_date, end_date)
+        with timed("compute.sales"):
+            # Binærsøk i den daglige rollupen i stedet for en maske over alle rader
+            filtered_sales = sales_rollup.frame(start_date, end_date, "D")
+            total_sales = sales_rollup.totals(start_date, end_date, "D")
+            chart_sales = filtered_sales if freq == "D" else sales_rollup.frame(start_date, end_date, freq)
+        st.markdown(f"**Total omsetning i perioden:** {total_sales.get('Omsetning', 0):,.0f} kr")
+        st.markdown("Filtrerte salgsdata (daglig):")
+        paged_table(filtered_sales, "sales_daily_table")
+        x_col = ROLLUP_LABELS[freq]
+        unit = GRANULARITY_LABELS[freq]
+        if freq != "D":
+            st.caption(f"Perioden er lang – diagrammet viser omsetning per {unit}.")
+
+        def build_daily_figure():
+            if vis_type == "Stolpediagram":
+                return px.bar(chart_sales, x=x_col, y="Omsetning", title=f"Omsetning per {unit}")
+            if vis_type == "Linjediagram":
+                return line_figure(chart_sales, x=x_col, y="Omsetning", title=f"Omsetning per {unit}")
+            agg = chart_sales.groupby(x_col, as_index=False)["Omsetning"].sum()
+            return px.pie(agg, names=x_col, values="Omsetning", title=f"Andel omsetning per {unit}")
+
+        fig = cached_figure("fig_sales_daily", [sales_source()],
+                            {"start": start_date, "end": end_date, "vis_type": vis_type}, build_daily_figure)
+        emit_chart("fig_sales_daily", fig, key="fig_sales_daily")
     else:
-        sales_df["YearMonth"] = pd.to_datetime(sales_df["Dato"]).dt.to_period("M").astype(str)
-        start_month = st.text_input("Startmåned (YYYY-MM)", value="2024-01")
-        end_month = st.text_input("Sluttmåned (YYYY-MM)", value="2024-12")
-        mask = (sales_df["YearMonth"] >= start_month) & (sales_df["YearMonth"] <= end_month)
-        filtered_sales = sales_df.loc[mask].copy()
-        agg_sales = filtered_sales.groupby("YearMonth", as_index=False)["Omsetning"].sum()
-        st.write("Aggregert salgsdata per måned:", agg_sales)
-        if vis_type == "Stolpediagram":
-            fig = px.bar(agg_sales, x="YearMonth", y="Omsetning", title="Omsetning per måned")
-        elif vis_type == "Linjediagram":
-            fig = px.line(agg_sales, x="YearMonth", y="Omsetning", title="Omsetning per måned")
-        else:
-            fig = px.pie(agg_sales, names="YearMonth", values="Omsetning", title="Andel omsetning per måned")
-        st.plotly_chart(fig, use_container_width=True, key="fig_sales_monthly")
+        start_month = st.text_input("Startmåned (YYYY-MM)", key="sales_start_month")
+        end_month = st.text_input("Sluttmåned (YYYY-MM)", key="sales_end_month")
+        # Ferdig aggregerte månedssummer fra rollupen
+        try:
+            with timed("compute.sales"):
+                agg_sales = sales_rollup.frame(start_month, end_month, "M")[["YearMonth", "Omsetning"]]
+        except ValueError:
+            agg_sales = None
+            st.error("Ugyldig måned – bruk formatet YYYY-MM.")
+        if agg_sales is not None:
+            st.markdown("Aggregert salgsdata per måned:")
+            paged_table(agg_sales, "sales_monthly_table")
+
+            def build_monthly_figure():
+                if vis_type == "Stolpediagram":
+                    return px.bar(agg_sales, x="YearMonth", y="Omsetning", title="Omsetning per måned")
+                if vis_type == "Linjediagram":
+                    return line_figure(agg_sales, x="YearMonth", y="Omsetning", title="Omsetning per måned")
+                return px.pie(agg_sales, names="YearMonth", values="Omsetning", title="Andel omsetning per måned")
+
+            fig = cached_figure("fig_sales_monthly", [sales_source()],
+                                {"start": start_month, "end": end_month, "vis_type": vis_type}, build_monthly_figure)
+            emit_chart("fig_sales_monthly", fig, key="fig_sales_monthly")
         
     st.markdown("**Merk:** Dataene kan filtreres både på daglig og månedlig basis.")
 
@@ -299,7 +654,8 @@ venstre sidebar.
         "Standardisert kostnadsdata CSV": "standardized_cost.csv",
         "Standardisert trafikkdata CSV": "standardized_traffic.csv",
         "Standardisert produktdata CSV": "standardized_product_sales.csv",
-        "Standardisert innkjøpspriser CSV": "standardized_prices.csv"
+        "Standardisert innkjøpspriser CSV": "standardized_prices.csv",
+        "Standardisert produktpriser CSV": "standardized_product_prices.csv"
     }
 
     for label, filepath in template_files.items():
@@ -317,32 +673,37 @@ venstre sidebar.
 # ----------------------------
 # FANE 2 – Kostnadsanalyse & Budsjett
 # ----------------------------
-with tabs[1]:
+def render_cost_view():
+    import plotly.express as px
+    cost_df = get_cost_df()
     st.header("Kostnadsanalyse & Budsjett")
     st.markdown("**Kostnadsdata for hele 2024**")
-    st.write(cost_df)
-    cost_columns = [col for col in ["varekostnad", "driftskostnader", "finansielle_kostnader", "lønnskostnad", "totale_kostnader"] if col in cost_df.columns]
-    if cost_columns:
-        fig_cost = px.bar(cost_df, x="date", y=cost_columns, 
-                          title="Kostnader per måned",
-                          barmode="group",
-                          labels={"value": "Kostnader (kr)", "variable": "Kostnadstype"})
-        st.plotly_chart(fig_cost, use_container_width=True, key="fig_cost_chart")
+    paged_table(cost_df, "cost_table")
+    cost_cols = cost_columns(cost_df)
+    if cost_cols:
+        fig_cost = cached_figure("fig_cost_chart", [cost_source()], {}, lambda: px.bar(
+            cost_df, x="date", y=cost_cols,
+            title="Kostnader per måned",
+            barmode="group",
+            labels={"value": "Kostnader (kr)", "variable": "Kostnadstype"}))
+        emit_chart("fig_cost_chart", fig_cost, key="fig_cost_chart")
     else:
         st.error("Ingen kostnadskolonner funnet for å lage diagram.")
-    st.markdown("#### Kostnadstall per kategori:")
-    for col in cost_columns:
-        if col in cost_df.columns:
-            total = cost_df[col].sum()
-            st.markdown(f"- **{col.capitalize()}**: {total:,.0f} kr")
     selected_margin = st.number_input("Angi ønsket fortjenestemargin (%)", min_value=0.0, max_value=100.0, 
-                                      value=30.0, step=1.0, key="margin_kostnad")
+                                      step=1.0, key="margin_kostnad")
     margin = selected_margin / 100.0
-    if "totale_kostnader" in cost_df.columns:
-        total_cost = cost_df["totale_kostnader"].iloc[0]
+    # Med standardmarginen kan summene være ferdig beregnet av batchkjøringen
+    report = precomputed_report("cost_summary", {"cost": cost_source()}, {"margin": margin})
+    if report is not None:
+        summary = cost_summary_from_frame(report)
     else:
-        total_cost = sum(cost_df[col].sum() for col in cost_columns)
-    optimal_revenue = total_cost / (1 - margin)
+        with timed("compute.cost"):
+            summary = cost_summary(cost_df, margin)
+    st.markdown("#### Kostnadstall per kategori:")
+    for col, total in summary["totals"].items():
+        st.markdown(f"- **{col.capitalize()}**: {total:,.0f} kr")
+    total_cost = summary["total_cost"]
+    optimal_revenue = summary["optimal_revenue"]
     
     st.markdown(f"**Total kostnad:** {total_cost:,.0f} kr")
     st.markdown(f"**Optimal budsjettert omsetning:** {optimal_revenue:,.0f} kr")
@@ -359,83 +720,112 @@ må omsetningen være minst {optimal_revenue:,.0f} kr for å oppnå ønsket fort
 # ----------------------------
 # FANE 3 – Lagerinnsikt & Innkjøpsstrategi
 # ----------------------------
-with tabs[2]:
+def render_inventory_view():
+    import plotly.express as px
     st.header("Lagerinnsikt & Innkjøpsstrategi")
 
     # Velg SKU-filtrering
     selected_sku_filter = st.text_input(
         "Filtrer etter SKU (f.eks. '40 cm', 'Clip On')",
-        value="",
         key="sku_filter"
     )
 
     # Velg datoer
-    inv_start_date = st.date_input("Startdato", value=datetime(2023, 11, 7), key="sku_start")
-    inv_end_date = st.date_input("Sluttdato", value=datetime(2024, 12, 31), key="sku_end")
-
-    # Filtrer data basert på dato
-    mask = (product_sales_df["date"] >= pd.to_datetime(inv_start_date)) & \
-           (product_sales_df["date"] <= pd.to_datetime(inv_end_date))
-    df = product_sales_df.loc[mask].copy()
+    inv_start_date = st.date_input("Startdato", key="sku_start")
+    inv_end_date = st.date_input("Sluttdato", key="sku_end")
 
-    # Filtrer data basert på SKU
-    if selected_sku_filter.strip():
-        pattern = re.compile(rf"\b{re.escape(selected_sku_filter.strip())}\b", re.IGNORECASE)
-        df = df[df["sku"].str.contains(pattern, na=False)]
+    source = product_sales_source()
+    grouped = None
+    if not tokenize(selected_sku_filter):
+        # Uten SKU-filter kan anbefalingene være ferdig beregnet av batchkjøringen
+        grouped = precomputed_report("inventory", {"product_sales": source},
+                                     {"start": inv_start_date, "end": inv_end_date, "forecast": FORECAST_VERSION,
+                                      "day_groups": DAY_GROUPS_VERSION})
+    if grouped is not None:
+        show_parse_issues("Produktdata", grouped)
+    else:
+        product_sales_df = get_product_sales_df()
+        # SKU-indeksen gir radposisjonene direkte; dato og gruppering regnes på de
+        # posisjonene uten å kopiere ut et filtrert utsnitt
+        sku_index = build_sku_index(source)
+        with timed("compute.inventory"):
+            sku_rows = sku_index.row_positions(selected_sku_filter)
+            grouped = inventory_recommendations(product_sales_df, inv_start_date, inv_end_date, sku_rows)
 
-    # Sjekk om df er tom
-    if df.empty:
+    # Sjekk om det finnes data
+    if grouped.empty:
         st.error("Ingen data tilgjengelig for de valgte filtrene.")
     else:
-        # Gruppere data basert på SKU
-        grouped = df.groupby("sku", as_index=False).agg({
-            "antallsolgt": "sum",
-            "product_name": "first"
-        })
-
-        # Beregn gjennomsnittlig solgt per måned og anbefalt varelager
-        start_dt = pd.to_datetime(inv_start_date)
-        end_dt = pd.to_datetime(inv_end_date)
-        n_months = (end_dt - start_dt).days / 30
-        if n_months <= 0:
-            n_months = 1
-        grouped["Gj.sn. solgt per måned"] = grouped["antallsolgt"] / n_months
-        grouped["Anbefalt varelager"] = grouped["Gj.sn. solgt per måned"].apply(lambda x: math.ceil(x * 4 * 1.2))
-
         # Visualisering – stolpediagram
-        fig = px.bar(
-            grouped,
-            x="sku",
-            y="antallsolgt",
-            title="Antall solgt per SKU",
-            labels={"antallsolgt": "Antall solgt", "sku": "SKU"},
-            hover_data=["product_name", "Gj.sn. solgt per måned", "Anbefalt varelager"]
-        )
-        st.plotly_chart(fig, use_container_width=True)
-
-        # Sorter tabellen basert på "Anbefalt varelager" i synkende rekkefølge
-        grouped = grouped.sort_values(by="Anbefalt varelager", ascending=False)
+        fig = cached_figure("fig_inventory", [source],
+                            {"start": inv_start_date, "end": inv_end_date, "sku": tokenize(selected_sku_filter)},
+                            lambda: px.bar(
+                                grouped,
+                                x="sku",
+                                y="antallsolgt",
+                                title="Antall solgt per SKU",
+                                labels={"antallsolgt": "Antall solgt", "sku": "SKU"},
+                                hover_data=["product_name", "Gj.sn. solgt per måned", "Prognose per måned",
+                                            "Bestillingspunkt"]
+                            ))
+        emit_chart("fig_inventory", fig)
 
-        # Vis tabell med data
+        # Vis tabell med data, sortert på "Anbefalt varelager" i synkende rekkefølge
         st.markdown("### Detaljert lagerinnsikt")
-        st.dataframe(
-            grouped[["sku", "product_name", "antallsolgt", "Gj.sn. solgt per måned", "Anbefalt varelager"]],
-            height=600
-        )
+        paged_table(grouped[["sku", "product_name", "antallsolgt", "Gj.sn. solgt per måned", "Prognose per måned",
+                             "Sikkerhetslager", "Bestillingspunkt", "Anbefalt varelager"]], "inventory_table")
+
+        show_sales_days(source, selected_sku_filter, inv_start_date, inv_end_date)
 
         # Legg til forklarende tekst nederst i fanen
         st.markdown("""
         ### Forklaring:
         - **Gj.sn. solgt per måned**: Gjennomsnittlig antall solgte enheter per måned basert på valgt datoperiode.
+        - **Prognose per måned**: Forventet salg neste måned, beregnet per SKU fra ukesalget i perioden med eksponentiell glatting som fanger opp trend (og sesong når perioden dekker minst to år).
+        - **Sikkerhetslager**: Ekstra enheter som dekker svingningene i salget gjennom 3 ukers leverings/produksjonstid med 95 % sannsynlighet.
+        - **Bestillingspunkt**: Når lageret er nede på dette antallet, bør det bestilles – forventet salg i leveringstiden pluss sikkerhetslageret.
         - **Anbefalt varelager**: Beregnet ut i fra salgsstatistikk og 3 uker leverings/produksjonstid med 20 % sikkerhetsmargin for å sikre tilgjengelighet. Bestill varer ca hver 3. uke.
-        - **Filtrering**: Du kan filtrere etter SKU (produktvariant) ved å bruke nøkkelord som "40 cm" eller "Clip On".
+        - **Filtrering**: Du kan filtrere etter SKU (produktvariant) eller produktnavn ved å bruke nøkkelord som "40 cm" eller "Clip On". "40 cm" treffer også "40cm".
         - **Visualisering**: Diagrammet viser antall solgte enheter per SKU, og tabellen gir detaljert innsikt i lagerbehovet.
+        - **Salgsdager**: Linjer uten dato hører til datoen over (bare første linje per dag har dato). Produktfilen har ikke ordrenummer, så tallene gjelder hele salgsdager, ikke enkeltordrer. Med et SKU-filter vises produktene som oftest selges samme dag, og andelen av dagene med de filtrerte SKU-ene de selges på.
         """)
 
+def show_sales_days(source, sku_filter, start_date, end_date):
+    st.markdown("### Salgsdager")
+    day_index = build_day_group_index(source)
+    if day_index is None:
+        st.info("Produktdataene er summert per dag og SKU, så linjene per dag kan ikke vises.")
+        return
+    st.caption("Produktfilen har ikke ordrenummer, så linjene er gruppert per dato. "
+               "Tallene gjelder hele salgsdager, ikke enkeltordrer.")
+    if isinstance(source, AppendStore):
+        st.caption("De lagrede dataene er summert per dag og SKU, så linjene per dag er SKU-ene solgt den dagen.")
+    with timed("compute.sales_days"):
+        summary = day_index.day_summary(start_date, end_date)
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Salgsdager i perioden", f"{summary['days']:,}".replace(",", " "))
+    col2.metric("Varer per salgsdag", f"{summary['items_per_day']:.1f}")
+    col3.metric("Linjer per salgsdag", f"{summary['lines_per_day']:.1f}")
+    col4.metric("Dager med flere produkter", f"{summary['share_multi_line']:.0%}")
+
+    if tokenize(sku_filter):
+        # Hva selges samme dag som SKU-ene som treffer filteret
+        rows = build_sku_index(source).row_positions(sku_filter)
+        with timed("compute.sales_days"):
+            same_day = day_index.sold_same_day(rows, start_date, end_date)
+        st.markdown(f"**Selges ofte samme dag som «{sku_filter}»**")
+        if same_day.empty:
+            st.caption("Ingen salgsdager med disse SKU-ene i perioden.")
+        else:
+            st.dataframe(same_day, hide_index=True)
+    else:
+        st.caption("Skriv inn et SKU-filter for å se hvilke produkter som selges samme dag.")
+
 # ----------------------------
 # FANE 4 – Digital Analyse & SEO
 # ----------------------------
-with tabs[3]:
+def render_seo_view():
+    import plotly.express as px
     st.header("Digital Analyse & SEO")
     st.markdown("""
     **SEO-Analyse med annonseforslag**  
@@ -478,21 +868,51 @@ with tabs[3]:
         st.markdown(f"**Bildeprompt:** {ad['prompt']}")
         st.markdown("---")
 
-    if "date" not in traffic_df.columns:
-        st.error("Ingen 'date' kolonne funnet i trafikkdata.")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        by = st.selectbox("Sorter etter", list(KEYWORD_METRICS), format_func=KEYWORD_METRICS.get, key="seo_metric")
+    with col2:
+        min_views = st.number_input("Minst antall visninger", min_value=0, step=10, key="seo_min_views",
+                                    help="Gjelder klikkrate og plassering, så søkeord med nesten ingen visninger ikke havner øverst.")
+    with col3:
+        clustered = st.toggle("Slå sammen like søkeord", key="seo_clustered",
+                              help="Skrivefeil, flertall og varianter av samme søkeord summeres som én rad.")
+
+    # Standardlisten (flest visninger, uten klynger) kan være ferdig beregnet av batchkjøringen
+    seo_agg = stats = None
+    if by == "antallvisninger" and not clustered:
+        seo_agg = precomputed_report("seo_top", {"traffic": traffic_source()}, {"keywords": KEYWORDS_VERSION})
+    if seo_agg is not None:
+        show_parse_issues("Trafikkdata", seo_agg)
     else:
-        if traffic_df.empty:
-            traffic_df = pd.DataFrame({
+        traffic_df = get_traffic_df()
+        if "date" not in traffic_df.columns:
+            st.error("Ingen 'date' kolonne funnet i trafikkdata.")
+        elif traffic_df.empty:
+            stats = KeywordStats(pd.DataFrame({
                 "søkeord": ["luxushair behandling", "premium extensions", "keratin behandling"],
                 "antallvisninger": [1000, 800, 600]
-            })
-        seo_agg = traffic_df.groupby("søkeord", as_index=False)["antallvisninger"].sum()
-        seo_agg = seo_agg.sort_values(by="antallvisninger", ascending=False).head(35)
-        st.markdown("#### Top 35 søkeord (sortert fra høy til lav visning):")
-        st.table(seo_agg)
-        fig_traffic = px.bar(seo_agg, x="søkeord", y="antallvisninger", 
-                             title="Topp søkeord (visninger)", template="plotly_white")
-        st.plotly_chart(fig_traffic, use_container_width=True, key="fig_traffic_chart")
+            }))
+        else:
+            stats = build_keyword_stats(traffic_source())
+        if stats is not None:
+            with timed("compute.seo"):
+                seo_agg = stats.top(SEO_TOP_N, by=by, clustered=clustered, min_views=min_views)
+
+    if seo_agg is not None:
+        order = "lav til høy" if by == "plassering" else "høy til lav"
+        st.markdown(f"#### Topp {SEO_TOP_N} søkeord (sortert fra {order} {KEYWORD_METRICS[by].lower()}):")
+        with timed("emit.seo_table"):
+            st.table(seo_agg)
+        if clustered and stats is not None:
+            with st.expander("Søkeord i klyngene"):
+                for keyword in seo_agg.loc[seo_agg["søkeord i klyngen"] > 1, "søkeord"]:
+                    st.markdown(f"**{keyword}:** {', '.join(stats.cluster_members(keyword))}")
+        fig_traffic = cached_figure(
+            "fig_traffic_chart", [traffic_source()], {"by": by, "clustered": clustered, "min_views": min_views},
+            lambda: px.bar(seo_agg, x="søkeord", y=by, labels={by: KEYWORD_METRICS[by]},
+                           title=f"Topp søkeord ({KEYWORD_METRICS[by].lower()})", template="plotly_white"))
+        emit_chart("fig_traffic_chart", fig_traffic, key="fig_traffic_chart")
     st.markdown("""
 **SEO-ekspertise og annonseplan:**  
 - Beste Keywords: luxushair behandling, premium extensions, keratin behandling  
@@ -505,7 +925,8 @@ with tabs[3]:
 # ----------------------------
 # FANE 5 – Konkurrentanalyse
 # ----------------------------
-with tabs[4]:
+def render_competitor_view():
+    import plotly.express as px
     st.header("Konkurrentanalyse")
     competitor_data = pd.DataFrame({
         "Firma": ["LuxusHair", "HairLux", "StylePro", "GlamourHair"],
@@ -518,15 +939,18 @@ with tabs[4]:
     st.dataframe(competitor_data)
     
     # Visualisering av omsetning
-    fig_comp = px.bar(
-        competitor_data, 
-        x="Firma", 
-        y="Omsetning (kr)", 
-        title="Konkurrentanalyse – Omsetning",
-        text="Markedsandel (%)"
-    )
-    fig_comp.update_traces(textposition="outside")
-    st.plotly_chart(fig_comp, use_container_width=True)
+    def build_competitor_figure():
+        fig = px.bar(
+            competitor_data, 
+            x="Firma", 
+            y="Omsetning (kr)", 
+            title="Konkurrentanalyse – Omsetning",
+            text="Markedsandel (%)"
+        )
+        return fig.update_traces(textposition="outside")
+
+    fig_comp = cached_figure("fig_competitor", [], {}, build_competitor_figure)
+    emit_chart("fig_competitor", fig_comp)
     
     st.markdown("""
     **Forklaring:**  
@@ -536,7 +960,7 @@ with tabs[4]:
 
 # ----------------------------
 # I FANE 6 – Bedriftsråd (Oppsummering)
-with tabs[5]:
+def render_pricing_view():
     st.header("Optimale produktpriser & Bedriftsråd")
     st.markdown("""
 Her oppsummeres bedriftsråd, samt nøkkeltall knyttet til optimal budsjettering og produktprising.
@@ -557,29 +981,15 @@ Velg hvilket hovedprodukt du vil se optimal utsalgspris for ved å bruke dropdow
 
     # Last inn innkjøpspriser (bruk standarddata hvis ingen fil er lastet opp)
     if uploaded_prices is not None:
-        df_prices = pd.read_csv(uploaded_prices)
-        purchase_prices = dict(zip(df_prices["Produkt"], df_prices["Pris"]))
+        prices_df = cached_dataset("prices", uploaded_prices, lambda: load_dataset(uploaded_prices, "prices"))
+        purchase_prices = purchase_price_map(prices_df)
     else:
-        purchase_prices = {
-            "Clip On Extension Virgin 55 cm": 1300,
-            "Clip On Extension Virgin 60 cm": 3900,
-            "Clip On Extension Virgin 40 cm": 400,
-            "Clip On Extension Virgin 50 cm": 500
-        }
-    fallback_tekst = "\n".join(["- {}: {} kr".format(produkt, pris) for produkt, pris in purchase_prices.items()])  # Bygg liste med hovedproduktalternativer
-    lengths = ["40", "50", "55", "60"]
-    main_product_options = []
-    for typ in ["Clip On Extension Virgin", "Tape On Extension Virgin", "Keratin Extension Virgin"]:
-        for l in lengths:
-            main_product_options.append(f"{typ} {l} cm")
-    default_main = "Clip On Extension Virgin 40 cm"
-    default_main_index = main_product_options.index(default_main) if default_main in main_product_options else 0
+        purchase_prices = purchase_price_map()
 
     # Drop-down for valg av hovedprodukt med unik key (kun i FANE 6)
     selected_main_product = st.selectbox(
         "Velg hovedprodukt for optimal prisberegning (anbefalt utsalgspris vises lenger ned på siden)",
-        options=main_product_options,
-        index=default_main_index,
+        options=main_product_options(),
         key="main_product_select_unique_f6"
     )
     normalized_main_product = selected_main_product.replace("Extensions ", "Extension ")
@@ -589,7 +999,6 @@ Velg hvilket hovedprodukt du vil se optimal utsalgspris for ved å bruke dropdow
         "Angi fortjenestemargin (%)", 
         min_value=0.0, 
         max_value=100.0,
-        value=30.0, 
         step=1.0, 
         key="margin_bedriftsrad_tab6"
     ) / 100.0
@@ -597,7 +1006,6 @@ Velg hvilket hovedprodukt du vil se optimal utsalgspris for ved å bruke dropdow
         "Angi overhead (%)", 
         min_value=0.0, 
         max_value=100.0,
-        value=25.0, 
         step=1.0, 
         key="overhead_bedrads_tab6"
     ) / 100.0
@@ -613,40 +1021,108 @@ Velg hovedprodukt du ønsker se anbefalt utsalgspris for i dropdownen over.
         """.format(user_overhead_tab6 * 100, user_margin_tab6 * 100)
     )
 
+    if user_margin_tab6 >= 1:
+        st.error("Fortjenestemarginen må være under 100 %.")
+        return
+
     # Hent fallback-innkjøpspris for det valgte hovedproduktet og beregn optimal pris
     fallback_price = purchase_prices.get(normalized_main_product, None)
     if fallback_price is not None:
-        totalkost = fallback_price * (1 + user_overhead_tab6)
-        computed_price = totalkost / (1 - user_margin_tab6)
-        optimal_price = (computed_price // 10) * 10 + 9
+        product_price = optimal_price(fallback_price, user_margin_tab6, user_overhead_tab6)
         st.markdown(
-            f"### Optimale produktpriser\n**Optimal produktpris for {normalized_main_product}: {int(optimal_price):,} kr**"
+            f"### Optimale produktpriser\n**Optimal produktpris for {normalized_main_product}: {int(product_price):,} kr**"
         )
     else: 
         st.info(
             "Ingen standard innkjøpspris funnet for det valgte hovedproduktet. "
             "Dataene er basert på LuxusHair sine standarddata, og oppdateres når din bedrift laster opp egne priser."
         )
-    
-    
+
+    # Hele katalogen fra produktprisfilen, beregnet for alle produkter på én gang
+    st.markdown("### Prisoversikt for hele katalogen")
+    st.markdown("""
+Optimal pris for alle produkter i produktprisfilen med valgt margin og overhead, sammenlignet med dagens utsalgspris.  
+Positivt avvik betyr at prisen bør opp for å nå ønsket margin. Klikk på en kolonne for å sortere.
+    """)
+    # Med standardvalgene kan tabellen og følsomheten være ferdig beregnet av batchkjøringen;
+    # katalogen leses bare når noe må beregnes her
+    source = product_prices_source()
+    catalog = None
+    deviations = precomputed_report("prices", {"product_prices": source},
+                                    {"margin": user_margin_tab6, "overhead": user_overhead_tab6})
+    if deviations is not None:
+        show_parse_issues("Produktpriser", deviations)
+    else:
+        catalog = get_product_price_catalog()
+        with timed("compute.prices"):
+            deviations = price_deviations(catalog, user_margin_tab6, user_overhead_tab6)
+    if deviations.empty:
+        st.info("Ingen produkter med innkjøpspris i produktprisfilen.")
+        return
+    with timed("emit.price_table"):
+        st.dataframe(deviations, hide_index=True, use_container_width=True)
+
+    with st.expander("Følsomhet for margin og overhead"):
+        margin_range = st.slider("Margin (%)", 0.0, 95.0, step=5.0, key="price_sweep_margins")
+        overhead_range = st.slider("Overhead (%)", 0.0, 100.0, step=5.0, key="price_sweep_overheads")
+        sweep = precomputed_report("price_sweep", {"product_prices": source},
+                                   {"margins": margin_range, "overheads": overhead_range})
+        if sweep is None:
+            if catalog is None:
+                catalog = product_price_catalog(read_product_prices(source))
+            with timed("compute.price_sweep"):
+                sweep = price_sweep(catalog, sweep_values(margin_range), sweep_values(overhead_range))
+        st.markdown("Antall produkter der dagens pris er under optimal pris:")
+        st.dataframe(sweep.pivot(index="Margin (%)", columns="Overhead (%)", values="Produkter under optimal pris"))
+        st.markdown("Gjennomsnittlig avvik fra dagens pris (%):")
+        st.dataframe(sweep.pivot(index="Margin (%)", columns="Overhead (%)", values="Snittavvik (%)"))
+
+
 # ----------------------------
 # FANE 7 – Verdivurdering
-with tabs[6]:
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_dcf(revenue, margin, assumptions):
+    # Samme tall og forutsetninger gir samme simulering (fast frø) – hentes fra cachen ved ny kjøring
+    return monte_carlo_dcf(revenue, margin, assumptions)
+
+def init_valuation_growth(cost_df, sales_rollup):
+    # Standardverdien for vekst er den historiske veksten siste år, og den hentes på nytt
+    # når brukeren laster opp andre salgsdata. Uten to hele år med salg brukes standardantakelsen.
+    source = dataset_key(sales_source())
+    if st.session_state["valuation_growth"] is not None and st.session_state["valuation_growth_source"] == source:
+        return
+    st.session_state["valuation_growth"] = default_growth_pct(derive_financials(cost_df, sales_rollup))
+    st.session_state["valuation_growth_source"] = source
+
+def render_valuation_view():
+    import plotly.express as px
     st.header("Verdivurdering")
-    ebitda = 755000
-    try:
-        cost_data = pd.read_csv("standardized_cost.csv")
-        if "driftsresultat" in cost_data.columns:
-            driftsresultat = pd.to_numeric(cost_data["driftsresultat"], errors="coerce").sum()
-        else:
-            driftsresultat = None
-    except Exception as e:
-        driftsresultat = None
-    value_df = pd.DataFrame({
-        "Metode": ["EBITDA-metoden", "DCF-modellen"],
-        "Verdi (kr)": [ebitda * 8, ebitda * 11]
-    })
-    fig_value = px.bar(value_df, x="Metode", y="Verdi (kr)", title="Estimert selskapsverdi")
+    cost_df = get_cost_df()
+    sales_rollup = get_sales_rollup()
+    init_valuation_growth(cost_df, sales_rollup)
+    growth_pct = st.number_input("Forventet årlig vekst i omsetning (%)", min_value=-50.0, max_value=100.0,
+                                 step=1.0, key="valuation_growth")
+    discount_pct = st.number_input("Diskonteringsrente (%)", min_value=3.0, max_value=40.0,
+                                   step=0.5, key="valuation_discount")
+    valuation_params = {"growth": growth_pct, "discount": discount_pct}
+    # Med standardvalgene kan simuleringen være ferdig beregnet av batchkjøringen
+    report = precomputed_report("valuation", {"cost": cost_source(), "sales": sales_source()}, valuation_params)
+    if report is not None:
+        result = valuation_from_frame(report)
+    else:
+        with timed("compute.valuation"):
+            result = valuation(cost_df, sales_rollup,
+                               assumptions={"growth": growth_pct / 100.0, "discount": discount_pct / 100.0},
+                               simulate=cached_dcf)
+    ebitda = result["ebitda"]
+    driftsresultat = result["driftsresultat"]
+    financials = result["financials"]
+    dcf = result["dcf"]
+    value_df = result["value_df"]
+    fig_value = cached_figure("fig_value_chart", [cost_source(), sales_source()], valuation_params,
+                              lambda: px.bar(value_df, x="Metode", y="Verdi (kr)", title="Estimert selskapsverdi",
+                                             error_y=value_df["Høy (kr)"] - value_df["Verdi (kr)"],
+                                             error_y_minus=value_df["Verdi (kr)"] - value_df["Lav (kr)"]))
     extra = ""
     if driftsresultat is not None:
         extra = f"\n- Faktisk driftsresultat: {int(driftsresultat):,} kr (basert på kostnadsdatafilen)."
@@ -654,23 +1130,63 @@ with tabs[6]:
         "Bransjefaktoren, satt til 8 for EBITDA-metoden, er basert på historiske data og markedsforventninger. "
         "Faktoren reflekterer forhold som vekstpotensial, risiko og lønnsomhet."
     )
+    if dcf is not None:
+        percentiles = dcf["value_percentiles"]
+        assumptions = dcf["assumptions"]
+        historic = ""
+        if financials["growth"] is not None:
+            historic = f" Historisk vekst siste år var {financials['growth'] * 100:.1f} %."
+        dcf_text = f"""- Omsetning siste 12 måneder: {financials['revenue']:,.0f} kr, EBITDA-margin {financials['margin'] * 100:.1f} %  
+    - DCF (median av {dcf['n_scenarios']:,} scenarioer) = {percentiles[50]:,.0f} kr  
+    - 90 % av scenarioene gir mellom {percentiles[5]:,.0f} og {percentiles[95]:,.0f} kr
+
+    DCF-modellen simulerer kontantstrømmen de neste fem årene (etter {TAX_RATE:.0%} skatt og {REINVESTMENT_RATE:.0%} reinvestering) med
+    tilfeldig vekst ({assumptions['growth'] * 100:.1f} % ± {assumptions['growth_sd'] * 100:.0f} %),
+    margin (± {assumptions['margin_sd'] * 100:.0f} prosentpoeng) og diskonteringsrente
+    ({assumptions['discount'] * 100:.1f} % ± {assumptions['discount_sd'] * 100:.0f} %), pluss en terminalverdi
+    med {assumptions['terminal_growth'] * 100:.0f} % evig vekst.{historic}"""
+    else:
+        dcf_text = f"- DCF x 11 = {ebitda * 11:,.0f} kr (ingen salgsdata å beregne margin fra)"
     text = f"""
     **Verdivurdering – Forklaring:**
 
     - EBITDA: {ebitda:,.0f} kr  
     - EBITDA x 8 = {ebitda * 8:,.0f} kr  
-    - DCF x 11 = {ebitda * 11:,.0f} kr  
+    {dcf_text}
 
     Forutsetter stabil drift og kontantstrøm.{extra}
 
     {explanation}
     """
-    st.plotly_chart(fig_value, use_container_width=True, key="fig_value_chart")
+    emit_chart("fig_value_chart", fig_value, key="fig_value_chart")
     st.markdown(text)
+    if dcf is not None:
+        fig_cash_flow = cached_figure("fig_cash_flow", [cost_source(), sales_source()], valuation_params,
+                                      lambda: fan_figure(dcf["cash_flow_bands"], "År", title="Simulert kontantstrøm per år",
+                                                         y_title="Kontantstrøm (kr)"))
+        emit_chart("fig_cash_flow", fig_cash_flow, key="fig_cash_flow")
 
 # ----------------------------
 # FANE 8 – Analytics Live-data (med datovelger)
-with tabs[7]:
+@st.cache_resource
+def materialize_credentials():
+    # Nøkkelfilen for Google Analytics skrives én gang per prosess, først når Live-fanen brukes
+    key_content_str = json.dumps(dict(st.secrets["GOOGLE_APPLICATION_CREDENTIALS_CONTENT"]))
+    with open("key.json", "w") as key_file:
+        key_file.write(key_content_str)
+    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "key.json"
+    return "key.json"
+
+@st.cache_resource
+def get_ga_cache():
+    # Én GA-klient og én rapportcache per prosess, delt mellom sesjoner. Den falske
+    # klienten trenger ingen nøkkelfil, og da leses ikke st.secrets.
+    if not uses_fake_client():
+        materialize_credentials()
+    return GAReportCache()
+
+def render_live_analytics_view():
+    import plotly.express as px
     st.header("Analytics Live-data")
     st.markdown("""
     **SmartDash Analytics Integrasjon**  
@@ -678,8 +1194,8 @@ with tabs[7]:
     """)
     
     # Legg til datovelger for Analytics (start- og sluttdato)
-    ga_start_date = st.date_input("Velg GA startdato", value=datetime(2025, 1, 1), key="ga_start_date")
-    ga_end_date = st.date_input("Velg GA sluttdato", value=datetime.today(), key="ga_end_date")
+    ga_start_date = st.date_input("Velg GA startdato", key="ga_start_date")
+    ga_end_date = st.date_input("Velg GA sluttdato", key="ga_end_date")
     
     available_metrics = {
         "Active Users": "activeUsers",
@@ -688,43 +1204,95 @@ with tabs[7]:
         "Conversions": "conversions"
     }
     selected_display_metrics = st.multiselect("Velg metrikker", list(available_metrics.keys()),
-                                              default=["Active Users", "New Users"],
                                               key="ga_metric_live")
-    selected_metrics = [Metric(name=available_metrics[m]) for m in selected_display_metrics]
+    metric_names = [available_metrics[m] for m in selected_display_metrics]
+    if not metric_names:
+        st.info("Velg minst én metrikk.")
+        return
+
+    # Kun dager som ikke allerede er hentet (og de siste, uferdige dagene) spørres fra GA.
+    # Hentingen går i bakgrunnen; diagrammet tegnes fra cachen og fylles på side for side.
+    try:
+        # Inne i try: mangler nøkkelen i secrets, vises feilmeldingen i stedet for et krasj
+        ga_cache = get_ga_cache()
+        with timed("load.ga"):
+            ga_job = ga_cache.start_fetch(GA_PROPERTY, metric_names, ga_start_date, ga_end_date)
+    except Exception as e:
+        st.error(f"Kunne ikke hente live data: {e}")
+        return
+    # Treff når hele perioden kan serveres fra cachen uten å spørre GA
+    run_metrics.lookup("ga", hit=not ga_job.ranges)
     
-    def get_live_analytics(selected_metrics, start_date, end_date):
-        client = BetaAnalyticsDataClient()
-        metric_names = [m.name for m in selected_metrics]
-        request = RunReportRequest(
-            property="properties/283157216", 
-            dimensions=[{"name": "date"}],
-            metrics=[{"name": name} for name in metric_names],
-            date_ranges=[{"start_date": start_date.strftime("%Y-%m-%d"), "end_date": end_date.strftime("%Y-%m-%d")}]
-        )
-        response = client.run_report(request)
-        data = {"Dato": [row.dimension_values[0].value for row in response.rows]}
-        for i, name in enumerate(metric_names):
-            data[name] = [int(row.metric_values[i].value) for row in response.rows]
-        df = pd.DataFrame(data)
-        fig = px.line(
-            df, 
+    # Lange perioder vises som snitt per dag for hver uke eller måned
+    freq = choose_granularity(ga_start_date, ga_end_date)
+
+    def get_live_analytics(df, metric_names):
+        fig = line_figure(
+            resample_frame(df, "Dato", freq, how="mean"),
             x="Dato", 
             y=metric_names, 
             title="Live Analytics Data",
             color_discrete_sequence=px.colors.qualitative.Bold  # Forbedrede farger
         )
-        return fig
-    
-    try:
-        fig_live = get_live_analytics(selected_metrics, ga_start_date, ga_end_date)
-        fig_live.update_layout(
+        fig.update_layout(
             title_font_size=24,
             xaxis=dict(title="Dato", tickangle=45),
             yaxis=dict(title="Måleverdi"),
             margin=dict(l=50, r=50, t=80, b=50),
             template="plotly_white"
         )
-        st.plotly_chart(fig_live, use_container_width=True, key="fig_live_chart")
-    except Exception as e:
-        st.error(f"Kunne ikke hente live data: {e}")
+        return fig
+    
+    # Fragmentet kjøres på nytt hvert sekund mens hentingen pågår, uten resten av siden
+    polling = ga_job.running
+
+    @st.fragment(run_every=1.0 if polling else None)
+    def live_chart():
+        if polling and not ga_job.running:
+            # Ferdig – hentingen måles fra start til slutt, og en full kjøring slår av pollingen
+            get_metrics().observe("load.ga.fetch", ga_job.seconds)
+            st.rerun()
+        df = ga_cache.cached_frame(GA_PROPERTY, metric_names, ga_start_date, ga_end_date)
+        if ga_job.running:
+            st.caption(f"Henter fra Google Analytics … {ga_job.pages} sider / {ga_job.rows} rader mottatt så langt.")
+        elif ga_job.status == "timeout":
+            st.warning("Google Analytics svarte ikke innen fristen – viser dataene som er hentet så langt.")
+        elif ga_job.status == "failed":
+            st.error(f"Kunne ikke hente live data: {ga_job.error}")
+        if not df.empty:
+            if freq != "D":
+                st.caption(f"Perioden er lang – diagrammet viser snitt per dag for hver {GRANULARITY_LABELS[freq]}.")
+            if ga_job.running:
+                # Dataene endres for hver side som kommer inn, så figuren caches først når hentingen er ferdig
+                with timed("figure.fig_live_chart"):
+                    fig_live = get_live_analytics(df, metric_names)
+            else:
+                fig_live = cached_figure("fig_live_chart", [],
+                                         {"metrics": metric_names, "freq": freq,
+                                          "data": int(pd.util.hash_pandas_object(df).sum())},
+                                         lambda: get_live_analytics(df, metric_names))
+            emit_chart("fig_live_chart", fig_live, key="fig_live_chart")
+
+    live_chart()
+
+# ----------------------------
+# 4. Navigasjon – kun den aktive visningen beregner data og bygger figurer
+# ----------------------------
+VIEWS = {
+    "Salgsdata": render_sales_view,
+    "Kostnadsanalyse & Budsjett": render_cost_view,
+    "Lagerinnsikt & Innkjøpsstrategi": render_inventory_view,
+    "Digital Analyse & SEO": render_seo_view,
+    "Konkurrentanalyse": render_competitor_view,
+    "Optimale produktpriser & Bedriftsråd": render_pricing_view,
+    "Verdivurdering": render_valuation_view,
+    "Analytics Live-data": render_live_analytics_view,
+}
 
+init_view_state(VIEW_STATE_DEFAULTS)
+active_view = st.radio("Fane", list(VIEWS), horizontal=True, key="active_view", label_visibility="collapsed")
+run_metrics.view = active_view
+VIEWS[active_view]()
+show_memory_footprint()
+get_metrics().finish_run(run_metrics, get_dataset_cache().stats())
+show_debug_panel(run_metrics)
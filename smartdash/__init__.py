@@ -0,0 +1 @@
+# SmartDash – hjelpemoduler for datainnlasting og beregninger brukt av dashapp.py
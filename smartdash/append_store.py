@@ -0,0 +1,201 @@
+import json
+import os
+import threading
+from io import BytesIO
+
+import pandas as pd
+
+from smartdash.schemas import SCHEMAS, compact_frame, parse_csv, widen_int
+from smartdash.snapshots import content_hash, read_snapshot, read_source_bytes, temp_path_for, write_snapshot
+
+# ----------------------------
+# Lagret datasett med inkrementell tilføying av nye perioder
+# ----------------------------
+# Radene lagres som én Arrow-fil per måned. En delta-opplasting parses alene,
+# og bare månedene den berører leses, slås sammen og skrives på nytt.
+# Rader med samme nøkkel (dato / dato+SKU / dato+søkeord) erstattes av de nye.
+# Manifestet husker hash av opplastinger som allerede er lagt til, slik at
+# samme fil ikke legges til på nytt ved hver rerun.
+#
+# Rader uten dato kan ikke plasseres i en periode og havner i "undated". Det går
+# bare for grunnlaget i et tomt lager: i en delta ville de erstattet hele det
+# lagrede grunnlaget (f.eks. trafikkfilen, der søkeordene er summert for én
+# periode uten dato per rad), så en slik delta avvises med ValueError.
+
+STORE_DIR = os.environ.get(
+    "SMARTDASH_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".smartdash_data"),
+)
+
+DATASETS = {
+    # Salgsfilen kan ha flere rader per dag; de summeres, og en dag i deltaen erstatter hele dagen
+    "sales": {"schema": "sales", "keys": ["date"], "fill_dates": False,
+              "sum": [col for col, kind in SCHEMAS["sales"]["columns"].items() if kind in ("number", "int")]},
+    # Ordrelinjer summeres per dag og SKU – det er granulariteten fanene bruker
+    "product_sales": {"schema": "product_sales", "keys": ["date", "sku"], "fill_dates": True,
+                      "sum": ["antallsolgt"], "first": ["product_name"]},
+    "traffic": {"schema": "traffic", "keys": ["date", "søkeord"], "fill_dates": True},
+}
+
+UNDATED = "undated"
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _lock_for(path):
+    with _locks_guard:
+        return _locks.setdefault(path, threading.Lock())
+
+
+class AppendStore:
+    def __init__(self, name, root=STORE_DIR):
+        self.name = name
+        self.spec = DATASETS[name]
+        self.path = os.path.join(root, name)
+        self._manifest_path = os.path.join(self.path, "manifest.json")
+        self._lock = _lock_for(self.path)
+        self._manifest_mtime = None
+        self.manifest = self._read_manifest()
+
+    def _read_manifest(self):
+        try:
+            self._manifest_mtime = os.stat(self._manifest_path).st_mtime_ns
+            with open(self._manifest_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"version": 0, "applied": [], "partitions": []}
+
+    def refresh(self):
+        # Leser manifestet på nytt hvis en annen prosess eller instans har skrevet til lageret
+        try:
+            mtime = os.stat(self._manifest_path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime != self._manifest_mtime:
+            self.manifest = self._read_manifest()
+
+    def _write_manifest(self):
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = temp_path_for(self._manifest_path)
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.manifest, f)
+            os.replace(tmp_path, self._manifest_path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._manifest_mtime = os.stat(self._manifest_path).st_mtime_ns
+
+    @property
+    def version(self):
+        self.refresh()
+        return self.manifest["version"]
+
+    def cache_key(self):
+        return f"{self.path}@{self.version}"
+
+    def is_empty(self):
+        self.refresh()
+        return not self.manifest["partitions"]
+
+    def has_applied(self, digest):
+        self.refresh()
+        return digest in self.manifest["applied"]
+
+    def _partition_path(self, label):
+        return os.path.join(self.path, f"{label}.arrow")
+
+    def _prepare(self, df):
+        keys = self.spec["keys"]
+        df = df.copy()
+        df.attrs = {}
+        if self.spec["fill_dates"] and "date" in df.columns:
+            # Bare første linje i en ordre/periode har dato
+            df["date"] = df["date"].ffill()
+        required = [k for k in keys if k != "date" or not self.spec["fill_dates"]]
+        df = df.dropna(subset=[k for k in required if k in df.columns])
+        if "sum" in self.spec:
+            agg = {col: "sum" for col in self.spec["sum"] if col in df.columns}
+            agg.update({col: "first" for col in self.spec.get("first", []) if col in df.columns})
+            df = df.assign(**{col: widen_int(df[col]) for col in self.spec["sum"] if col in df.columns})
+            df = df.groupby(keys, as_index=False, dropna=False, sort=False, observed=True).agg(agg)
+        return df.drop_duplicates(subset=keys, keep="last")
+
+    def _partition_labels(self, df):
+        if "date" not in df.columns:
+            return pd.Series(UNDATED, index=df.index)
+        labels = df["date"].dt.strftime("%Y-%m")
+        return labels.fillna(UNDATED)
+
+    def _apply_locked(self, delta, digest=None):
+        # Kalles med self._lock. Returnerer (nye rader, rader de erstattet), eller None
+        # om ingenting endret seg; digest registreres som lagt til i samme manifest
+        if delta.empty and digest is None:
+            return None
+        self.refresh()
+        partitions = set(self.manifest["partitions"])
+        labels = self._partition_labels(delta)
+        if partitions and (labels == UNDATED).any():
+            raise ValueError("Filen har rader uten dato og kan ikke legges til som nye perioder. "
+                             "Last den opp som en full fil i stedet.")
+        keys = self.spec["keys"]
+        replaced = []
+        for label, part in delta.groupby(labels, sort=False):
+            existing = read_snapshot(self._partition_path(label)) if label in partitions else None
+            if existing is not None:
+                part = pd.concat([existing, part], ignore_index=True)
+                duplicated = part.duplicated(subset=keys, keep="last").to_numpy()
+                replaced.append(existing[duplicated[:len(existing)]])
+                part = part[~duplicated]
+            part = part.sort_values(keys, kind="stable", na_position="first").reset_index(drop=True)
+            if not write_snapshot(self._partition_path(label), part):
+                raise OSError(f"Kunne ikke skrive {self._partition_path(label)}")
+            partitions.add(label)
+        if digest is not None:
+            self.manifest["applied"].append(digest)
+        if not delta.empty:
+            self.manifest["partitions"] = sorted(partitions)
+            self.manifest["version"] += 1
+        self._write_manifest()
+        if delta.empty:
+            return None
+        replaced = pd.concat(replaced, ignore_index=True) if replaced else delta.iloc[:0]
+        return delta, replaced
+
+    def append_frame(self, df):
+        delta = self._prepare(df)
+        with self._lock:
+            return self._apply_locked(delta)
+
+    def append_source(self, source):
+        # Parser kun delta-filen; en fil som allerede er lagt til ignoreres
+        data = read_source_bytes(source)
+        digest = content_hash(data)
+        if self.has_applied(digest):
+            return None
+        delta = self._prepare(parse_csv(BytesIO(data), self.spec["schema"]))
+        with self._lock:
+            # Sjekkes på nytt under låsen: en annen sesjon kan ha lagt til samme fil mens denne ble parset
+            self.refresh()
+            if digest in self.manifest["applied"]:
+                return None
+            return self._apply_locked(delta, digest)
+
+    def read(self):
+        self.refresh()
+        frames = [read_snapshot(self._partition_path(label)) for label in self.manifest["partitions"]]
+        frames = [f for f in frames if f is not None]
+        if not frames:
+            return pd.DataFrame(columns=self.spec["keys"])
+        return compact_frame(pd.concat(frames, ignore_index=True), self.spec["schema"])
+
+    def clear(self):
+        with self._lock:
+            for label in self.manifest["partitions"]:
+                path = self._partition_path(label)
+                if os.path.exists(path):
+                    os.remove(path)
+            self.manifest = {"version": self.version + 1, "applied": [], "partitions": []}
+            self._write_manifest()
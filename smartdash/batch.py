@@ -0,0 +1,205 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+from smartdash import reports
+from smartdash.forecast import FORECAST_VERSION
+from smartdash.day_groups import DAY_GROUPS_VERSION
+from smartdash.keywords import KEYWORDS_VERSION
+from smartdash.rollups import SalesRollup
+from smartdash.snapshots import read_snapshot, source_hash, write_snapshot
+from smartdash.valuation import default_growth_pct, derive_financials
+
+# ----------------------------
+# Batchberegning av rapporter for mange butikker
+# ----------------------------
+# Hver butikk er en katalog med de samme standardiserte filene som appen bruker.
+# Rapportene beregnes på en prosesspool (én butikk per prosess) og skrives som
+# Arrow-snapshots i <ut>/<butikk>/, sammen med et manifest som husker hash av
+# kildefilene og valgene (margin, periode osv.) hver rapport er beregnet med.
+# Appen bruker en rapport bare når både kildefilen og valgene stemmer.
+#
+# Salgsrapporten er dagssummene for hele filen; appen bygger salgsrollupen fra
+# den i stedet for å lese salgsfilen, og velger periode selv. Verdivurderingen
+# (Monte Carlo-simuleringen) beregnes med vekstfeltets standardverdi, den
+# historiske veksten, slik at den treffer når brukeren ikke har endret feltene.
+#
+#   python -m smartdash.batch butikker/ --out rapporter/ --workers 8
+#   SMARTDASH_REPORT_DIR=rapporter/<butikk> streamlit run dashapp.py
+
+DATA_FILES = {
+    "sales": "standardized_sales.csv",
+    "cost": "standardized_cost.csv",
+    "traffic": "standardized_traffic.csv",
+    "product_sales": "standardized_product_sales.csv",
+    "product_prices": "standardized_product_prices.csv",
+}
+
+# Valgene rapportene beregnes for – de samme som standardvalgene i appen
+DEFAULT_PARAMS = {
+    "margin": 0.30,
+    "inventory_start": "2023-11-07",
+    "inventory_end": "2024-12-31",
+    "price_margin": 0.30,
+    "price_overhead": 0.25,
+    "price_sweep_margins": (20.0, 50.0),
+    "price_sweep_overheads": (10.0, 40.0),
+    # Veksten er den historiske veksten i hver butikks salgsdata (som i appen)
+    "valuation_discount": 12.0,
+}
+
+MANIFEST = "manifest.json"
+
+
+def _jsonable(params):
+    # Datoer lagres som ISO-tekst, slik at date(2024, 12, 31) og "2024-12-31" er like
+    return json.loads(json.dumps(params, default=str))
+
+
+def tenant_files(tenant_dir):
+    paths = {}
+    for name, filename in DATA_FILES.items():
+        path = os.path.join(tenant_dir, filename)
+        if os.path.exists(path):
+            paths[name] = path
+    return paths
+
+
+def compute_reports(tenant_dir, params=DEFAULT_PARAMS):
+    # {rapport: (DataFrame, [datasett den bygger på], valg)}
+    paths = tenant_files(tenant_dir)
+    out = {}
+
+    rollup = None
+    if "sales" in paths:
+        rollup = SalesRollup(reports.load_sales(paths["sales"]))
+        out["sales_daily"] = (rollup.daily(), ["sales"], {})
+
+    if "cost" in paths:
+        cost_df = reports.normalize_cost(reports.load_dataset(paths["cost"], "cost"))
+        summary = reports.cost_summary(cost_df, params["margin"])
+        out["cost_summary"] = (reports.cost_summary_frame(summary), ["cost"], {"margin": params["margin"]})
+
+        growth_pct = default_growth_pct(derive_financials(cost_df, rollup))
+        discount_pct = params["valuation_discount"]
+        result = reports.valuation(cost_df, rollup,
+                                   assumptions={"growth": growth_pct / 100.0, "discount": discount_pct / 100.0})
+        out["valuation"] = (reports.valuation_frame(result), ["cost", "sales"] if rollup is not None else ["cost"],
+                            {"growth": growth_pct, "discount": discount_pct})
+
+    if "product_sales" in paths:
+        product_sales_df = reports.load_product_sales(paths["product_sales"])
+        grouped = reports.inventory_recommendations(product_sales_df, params["inventory_start"], params["inventory_end"])
+        grouped.attrs = dict(product_sales_df.attrs)
+        out["inventory"] = (grouped, ["product_sales"],
+                            {"start": params["inventory_start"], "end": params["inventory_end"],
+                             "forecast": FORECAST_VERSION, "day_groups": DAY_GROUPS_VERSION})
+
+    if "traffic" in paths:
+        traffic_df = reports.load_dataset(paths["traffic"], "traffic")
+        seo_agg = reports.seo_top_keywords(traffic_df)
+        seo_agg.attrs = dict(traffic_df.attrs)
+        out["seo_top"] = (seo_agg, ["traffic"], {"keywords": KEYWORDS_VERSION})
+
+    if "product_prices" in paths:
+        prices_df = reports.load_dataset(paths["product_prices"], "product_prices")
+        catalog = reports.product_price_catalog(prices_df)
+        deviations = reports.price_deviations(catalog, params["price_margin"], params["price_overhead"])
+        deviations.attrs = dict(prices_df.attrs)
+        out["prices"] = (deviations, ["product_prices"],
+                         {"margin": params["price_margin"], "overhead": params["price_overhead"]})
+        sweep = reports.price_sweep(catalog, reports.sweep_values(params["price_sweep_margins"]),
+                                    reports.sweep_values(params["price_sweep_overheads"]))
+        out["price_sweep"] = (sweep, ["product_prices"],
+                              {"margins": params["price_sweep_margins"], "overheads": params["price_sweep_overheads"]})
+
+    return out, paths
+
+
+def write_reports(report_dir, computed, paths):
+    manifest = {"created": datetime.now().isoformat(timespec="seconds"), "reports": {}}
+    for name, (frame, datasets, params) in computed.items():
+        if not write_snapshot(os.path.join(report_dir, f"{name}.arrow"), frame.reset_index(drop=True)):
+            continue
+        manifest["reports"][name] = {
+            "sources": {dataset: source_hash(paths[dataset]) for dataset in datasets},
+            "params": _jsonable(params),
+        }
+    os.makedirs(report_dir, exist_ok=True)
+    tmp_path = os.path.join(report_dir, f"{MANIFEST}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(report_dir, MANIFEST))
+    return manifest
+
+
+def precompute_tenant(tenant_dir, out_root, params=DEFAULT_PARAMS):
+    # Kjøres i en arbeiderprosess; feil i én butikk stopper ikke de andre.
+    # Datasettene er minnemappede snapshots, så kolonner kopieres bare ved endring.
+    pd.set_option("mode.copy_on_write", True)
+    tenant = os.path.basename(os.path.normpath(tenant_dir))
+    start = time.perf_counter()
+    try:
+        computed, paths = compute_reports(tenant_dir, params)
+        manifest = write_reports(os.path.join(out_root, tenant), computed, paths)
+        return {"tenant": tenant, "reports": len(manifest["reports"]),
+                "seconds": time.perf_counter() - start, "error": None}
+    except Exception as e:
+        return {"tenant": tenant, "reports": 0, "seconds": time.perf_counter() - start, "error": repr(e)}
+
+
+def find_tenants(tenants_root):
+    tenants = []
+    for entry in sorted(os.scandir(tenants_root), key=lambda e: e.name):
+        if entry.is_dir() and tenant_files(entry.path):
+            tenants.append(entry.path)
+    return tenants
+
+
+def run_batch(tenants_root, out_root, workers=None, params=DEFAULT_PARAMS):
+    tenants = find_tenants(tenants_root)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(precompute_tenant, tenant, out_root, params) for tenant in tenants]
+        return [future.result() for future in futures]
+
+
+def load_report(report_dir, name, sources, params):
+    # sources: {datasett: kilde}. None hvis rapporten mangler, er beregnet med andre
+    # valg, eller kildefilene har endret seg siden batchkjøringen.
+    try:
+        with open(os.path.join(report_dir, MANIFEST), encoding="utf-8") as f:
+            entry = json.load(f)["reports"].get(name)
+    except (OSError, ValueError, KeyError):
+        return None
+    if entry is None or entry["params"] != _jsonable(params) or set(entry["sources"]) != set(sources):
+        return None
+    for dataset, digest in entry["sources"].items():
+        if source_hash(sources[dataset]) != digest:
+            return None
+    return read_snapshot(os.path.join(report_dir, f"{name}.arrow"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Forhåndsberegner SmartDash-rapporter for mange butikker")
+    parser.add_argument("tenants", help="Katalog med én underkatalog per butikk")
+    parser.add_argument("--out", required=True, help="Katalog rapportene skrives til")
+    parser.add_argument("--workers", type=int, default=None, help="Antall prosesser (standard: antall kjerner)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = run_batch(args.tenants, args.out, args.workers)
+    for result in results:
+        status = f"FEIL: {result['error']}" if result["error"] else f"{result['reports']} rapporter"
+        print(f"{result['tenant']:30s} {result['seconds']:7.2f} s  {status}")
+    print(f"{len(results)} butikker på {time.perf_counter() - start:.1f} s")
+    if any(result["error"] for result in results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+
+# ----------------------------
+# Klargjøring av tidsserier før de sendes til Plotly
+# ----------------------------
+# Lange serier tynnes ut med LTTB (Largest-Triangle-Three-Buckets), som beholder
+# topper og bunner i kurven. Over WEBGL_THRESHOLD punkter tegnes linjer med WebGL,
+# og granulariteten (dag/uke/måned) velges ut fra lengden på valgt periode.
+
+MAX_POINTS = 2000
+WEBGL_THRESHOLD = 1000
+
+# Periode i dager -> granularitet
+DAILY_MAX_DAYS = 400
+WEEKLY_MAX_DAYS = 3 * 366
+
+GRANULARITY_LABELS = {"D": "dag", "W": "uke", "M": "måned"}
+
+
+def choose_granularity(start_date, end_date):
+    days = (pd.Timestamp(end_date) - pd.Timestamp(start_date)).days
+    if days <= DAILY_MAX_DAYS:
+        return "D"
+    if days <= WEEKLY_MAX_DAYS:
+        return "W"
+    return "M"
+
+
+def _as_float(values):
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype("datetime64[ns]").astype("int64").astype("float64")
+    return values.astype("float64")
+
+
+def lttb_indices(x, y, n_out):
+    # Indeksene til punktene LTTB beholder; første og siste punkt tas alltid med
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = _as_float(x)
+    y = np.nan_to_num(_as_float(y))
+    edges = np.linspace(1, n - 1, n_out - 1).astype("int64")
+    selected = np.empty(n_out, dtype="int64")
+    selected[0] = 0
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+        else:
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area)) if end > start else start
+        selected[i + 1] = a
+    selected[-1] = n - 1
+    return selected
+
+
+def downsample(df, x, y_cols, max_points=MAX_POINTS):
+    # Flere y-kolonner: unionen av punktene LTTB velger for hver serie
+    if len(df) <= max_points:
+        return df
+    x_values = df[x].to_numpy()
+    if not (np.issubdtype(x_values.dtype, np.datetime64) or np.issubdtype(x_values.dtype, np.number)):
+        # Tekstetiketter (f.eks. "2024-05") er sortert – posisjonen brukes som x
+        x_values = np.arange(len(df))
+    keep = np.unique(np.concatenate([lttb_indices(x_values, df[col].to_numpy(), max_points)
+                                     for col in y_cols]))
+    return df.iloc[keep]
+
+
+def line_figure(df, x, y, max_points=MAX_POINTS, **kwargs):
+    import plotly.express as px
+    y_cols = [y] if isinstance(y, str) else list(y)
+    df = downsample(df, x, y_cols, max_points)
+    render_mode = "webgl" if len(df) > WEBGL_THRESHOLD else "svg"
+    return px.line(df, x=x, y=y, render_mode=render_mode, **kwargs)
+
+
+def resample_frame(df, x, freq, how="sum"):
+    # Dagsrader -> uke- (mandag) eller månedsbøtter; "D" returnerer rammen uendret
+    if freq == "D" or df.empty:
+        return df
+    period = "W-SUN" if freq == "W" else "M"
+    buckets = pd.to_datetime(df[x]).dt.to_period(period).dt.start_time.rename(x)
+    return df.drop(columns=[x]).groupby(buckets).agg(how).reset_index()
+
+
+def fan_figure(bands, x, title=None, y_title=None):
+    # Persentilbånd (kolonner p5, p25, p50, p75, p95): 90 %- og 50 %-bånd rundt medianen
+    import plotly.graph_objects as go
+    fig = go.Figure()
+    for low, high, opacity, label in (("p5", "p95", 0.15, "90 %-intervall"), ("p25", "p75", 0.3, "50 %-intervall")):
+        fig.add_trace(go.Scatter(x=bands[x], y=bands[high], mode="lines", line=dict(width=0),
+                                 showlegend=False, hoverinfo="skip"))
+        fig.add_trace(go.Scatter(x=bands[x], y=bands[low], mode="lines", line=dict(width=0), fill="tonexty",
+                                 fillcolor=f"rgba(0, 123, 255, {opacity})", name=label))
+    fig.add_trace(go.Scatter(x=bands[x], y=bands["p50"], mode="lines+markers", name="Median",
+                             line=dict(color="#007bff")))
+    fig.update_layout(title=title, xaxis_title=x, yaxis_title=y_title)
+    return fig
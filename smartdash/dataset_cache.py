@@ -0,0 +1,127 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+# ----------------------------
+# Minnebegrenset cache for innlastede datasett
+# ----------------------------
+# Én cache per prosess, delt av alle sesjoner, med et samlet minnebudsjett.
+# Hver oppføring har en beregnet størrelse; når budsjettet er brukt opp, kastes
+# de minst nylig brukte oppføringene (LRU), og oppføringer som ikke er brukt
+# på TTL_SECONDS kastes uansett. Nøklene er (type, innholdshash) eller
+# (type, lagret datasett@versjon), og de parsede dataene ligger som snapshot
+# på disk under samme hash – en kastet oppføring bygges derfor raskt på nytt
+# fra snapshotet neste gang den trengs, uten å parse filen.
+
+MAX_BYTES = int(os.environ.get("SMARTDASH_CACHE_MB", "512")) * 1024 * 1024
+TTL_SECONDS = int(os.environ.get("SMARTDASH_CACHE_TTL_MINUTES", "60")) * 60
+
+
+def estimate_size(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        size = value.memory_usage(index=True, deep=True)
+        return int(size.sum() if isinstance(value, pd.DataFrame) else size)
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    return sys.getsizeof(value)
+
+
+class DatasetCache:
+    def __init__(self, max_bytes=MAX_BYTES, ttl_seconds=TTL_SECONDS, clock=time.monotonic):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        # nøkkel -> [verdi, størrelse, sist brukt]; rekkefølgen er LRU-rekkefølgen
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rejected = 0
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry[1]
+
+    def _expire(self, now):
+        # Eldste bruk ligger først, så vi kan stoppe ved første oppføring som fortsatt er fersk
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if now - entry[2] <= self.ttl_seconds:
+                break
+            self._drop(key)
+            self.expirations += 1
+
+    def peek(self, key):
+        # Verdien uten å bygge den eller telle treff/bom
+        with self._lock:
+            entry = self._entries.get(key)
+            return None if entry is None else entry[0]
+
+    def get(self, key, build):
+        now = self._clock()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry[2] = now
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        # Bygges utenfor låsen; to sesjoner kan i verste fall bygge samme datasett samtidig
+        value = build()
+        self.put(key, value)
+        return value
+
+    def put(self, key, value):
+        size = estimate_size(value)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            if size > self.max_bytes:
+                # Større enn hele budsjettet – brukes av kallet, men caches ikke
+                self.rejected += 1
+                return
+            self._entries[key] = [value, size, self._clock()]
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def discard(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "rejected": self.rejected,
+            }
+
+    def entries(self):
+        # (nøkkel, størrelse, sekunder siden bruk) i LRU-rekkefølge, eldste først
+        now = self._clock()
+        with self._lock:
+            return [(key, entry[1], now - entry[2]) for key, entry in self._entries.items()]
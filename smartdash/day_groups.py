@@ -0,0 +1,201 @@
+import numpy as np
+import pandas as pd
+
+from smartdash.schemas import widen_int
+
+# ----------------------------
+# Salgsdager i produktdataene
+# ----------------------------
+# I produktfilen har bare første linje i hver gruppe en dato; linjene under har
+# tom dato og hører til samme dato. En linje med dato starter altså en ny gruppe,
+# og gruppenummeret er antall daterte linjer til og med linjen (kumulativ sum).
+# Datoen fylles fremover innenfor gruppen, så alle linjene kommer med i
+# periodefiltrene. Linjer før første daterte linje hører ikke til noen gruppe
+# (gruppenummer -1) og beholder tom dato.
+#
+# Filen har ikke ordrenummer, og i eksporten er hver gruppe én kalenderdag med
+# flere ordrer (salgsfilen viser flere ordrer per dag). Statistikken under
+# gjelder derfor salgsdager og produkter solgt samme dag, ikke enkeltordrer.
+#
+# Linjer og varer per dag og hvilke SKU-er som selges samme dag regnes med
+# bincount over gruppenummeret til hver rad, uten løkker over dager eller rader.
+#
+# Delta-lageret har summert linjene per dag og SKU. Der er hver dato én gruppe
+# (daily_day_groups), og linjene per dag er SKU-ene som ble solgt den dagen.
+
+# Økes når grupperingen endres, så ferdigberegnede lagerrapporter beregnes på nytt
+DAY_GROUPS_VERSION = "2"
+
+SAME_DAY_TOP_N = 10
+
+
+def normalize_product_sales(df):
+    if "date" not in df.columns:
+        return df
+    dates = df["date"]
+    day_group = np.cumsum(dates.notna().to_numpy()) - 1
+    return df.assign(date=dates.ffill(), day_group=day_group.astype("int32"))
+
+
+def daily_day_groups(df):
+    # Summerte produktdata (én rad per dag og SKU): gruppenummeret er datoens plass
+    # blant de sorterte datoene, og rader uten dato får -1
+    dates = df["date"].to_numpy()
+    dated = ~np.isnat(dates)
+    days = np.unique(dates[dated])
+    day_group = np.where(dated, np.searchsorted(days, dates), -1)
+    return df.assign(day_group=day_group.astype("int32"))
+
+
+def _first_rows(day_group, n_days):
+    # Første rad i hver gruppe (alle gruppenumrene 0..n_days-1 har rader)
+    valid = np.flatnonzero(day_group >= 0)
+    _, first = np.unique(day_group[valid], return_index=True)
+    return valid[first[:n_days]]
+
+
+class DayGroupIndex:
+    def __init__(self, product_sales_df):
+        df = product_sales_df
+        day_group = df["day_group"].to_numpy()
+        n_days = max(int(day_group.max()) + 1, 0) if len(day_group) else 0
+        valid = day_group >= 0
+        self.lines = np.bincount(day_group[valid], minlength=n_days)
+        self.dates = df["date"].to_numpy()[_first_rows(day_group, n_days)]
+        self.day_group = day_group
+
+        if isinstance(df["sku"].dtype, pd.CategoricalDtype):
+            sku_codes, skus = df["sku"].cat.codes.to_numpy(), df["sku"].cat.categories
+        else:
+            sku_codes, skus = pd.factorize(df["sku"])
+        self.sku_codes = sku_codes
+        self.skus = np.asarray(skus, dtype=object)
+        used, first = np.unique(sku_codes, return_index=True)
+        first = first[used >= 0]
+        self.product_names = np.empty(len(skus), dtype=object)
+        self.product_names[sku_codes[first]] = df["product_name"].to_numpy(dtype=object)[first]
+
+        quantities = widen_int(df["antallsolgt"]).to_numpy(dtype="float64", na_value=np.nan)
+        self.items = np.bincount(day_group[valid], weights=np.nan_to_num(quantities[valid]), minlength=n_days)
+
+    def merge(self, product_sales_df, delta_df):
+        # For delta-lageret (én rad per dag og SKU, uten day_group): ny indeks for hele
+        # product_sales_df der bare dagene i delta_df telles på nytt, som SalesRollup.merge.
+        # De andre dagene beholder linjer og varer, og SKU-ene beholder kodene sine.
+        df = daily_day_groups(product_sales_df)
+        merged = DayGroupIndex.__new__(DayGroupIndex)
+        merged.day_group = df["day_group"].to_numpy()
+        n_days = max(int(merged.day_group.max()) + 1, 0) if len(df) else 0
+        merged.dates = df["date"].to_numpy()[_first_rows(merged.day_group, n_days)]
+
+        codes, uniques = pd.factorize(df["sku"])
+        uniques = pd.Index(np.asarray(uniques, dtype=object))
+        known = pd.Index(self.skus)
+        added = ~uniques.isin(known)
+        skus = known.append(uniques[added])
+        mapping = skus.get_indexer(uniques)
+        merged.sku_codes = np.where(codes >= 0, mapping[np.maximum(codes, 0)], -1) if len(mapping) else codes
+        merged.skus = np.asarray(skus, dtype=object)
+        _, first = np.unique(codes, return_index=True)
+        first = first[codes[first] >= 0]
+        new_first = first[added[codes[first]]]
+        merged.product_names = np.concatenate([
+            self.product_names, df["product_name"].to_numpy(dtype=object)[new_first]])
+
+        old_position = np.minimum(np.searchsorted(self.dates, merged.dates), max(len(self.dates) - 1, 0))
+        delta_dates = delta_df["date"].to_numpy()
+        reuse = np.zeros(n_days, dtype=bool)
+        if len(self.dates):
+            reuse = (self.dates[old_position] == merged.dates) & ~np.isin(merged.dates, delta_dates)
+        merged.lines = np.zeros(n_days, dtype="int64")
+        merged.items = np.zeros(n_days, dtype="float64")
+        merged.lines[reuse] = self.lines[old_position[reuse]]
+        merged.items[reuse] = self.items[old_position[reuse]]
+
+        # Én plass ekstra: rader uten dato (gruppe -1) slår opp der og telles ikke
+        recount = np.zeros(n_days + 1, dtype=bool)
+        recount[:n_days] = ~reuse
+        rows = np.flatnonzero(recount[merged.day_group])
+        quantities = widen_int(df["antallsolgt"]).to_numpy(dtype="float64", na_value=np.nan)[rows]
+        groups = merged.day_group[rows]
+        merged.lines[~reuse] = np.bincount(groups, minlength=n_days)[~reuse]
+        merged.items[~reuse] = np.bincount(groups, weights=np.nan_to_num(quantities), minlength=n_days)[~reuse]
+        return merged
+
+    @property
+    def n_days(self):
+        return len(self.lines)
+
+    @property
+    def nbytes(self):
+        # day_group og sku_codes er som regel delt med rammen (snapshot), men regnes med
+        size = self.lines.nbytes + self.dates.nbytes + self.items.nbytes
+        size += self.day_group.nbytes + self.sku_codes.nbytes
+        size += self.skus.nbytes + self.product_names.nbytes
+        size += sum(len(str(value)) for value in self.skus) + sum(len(str(value)) for value in self.product_names)
+        return size
+
+    def _days_in_period(self, start_date, end_date):
+        start = pd.to_datetime(start_date).to_datetime64()
+        end = pd.to_datetime(end_date).to_datetime64()
+        return (self.dates >= start) & (self.dates <= end)
+
+    def day_summary(self, start_date, end_date):
+        # Antall salgsdager og snitt/median linjer og varer per salgsdag i perioden
+        in_period = self._days_in_period(start_date, end_date)
+        lines = self.lines[in_period]
+        items = self.items[in_period]
+        if not len(lines):
+            return {"days": 0, "lines_per_day": 0.0, "items_per_day": 0.0,
+                    "median_items": 0.0, "share_multi_line": 0.0}
+        return {
+            "days": int(len(lines)),
+            "lines_per_day": float(lines.mean()),
+            "items_per_day": float(items.mean()),
+            "median_items": float(np.median(items)),
+            "share_multi_line": float((lines > 1).mean()),
+        }
+
+    def items_per_day_counts(self, start_date, end_date):
+        # Antall salgsdager per antall solgte varer den dagen
+        items = self.items[self._days_in_period(start_date, end_date)].astype("int64")
+        counts = np.bincount(items) if len(items) else np.zeros(0, dtype="int64")
+        present = np.flatnonzero(counts)
+        return pd.DataFrame({"Varer solgt": present, "Dager": counts[present]})
+
+    def sold_same_day(self, rows, start_date, end_date, top=SAME_DAY_TOP_N):
+        # SKU-ene som oftest selges samme dag som radene i rows (f.eks. radene fra
+        # SKU-filteret), med antall felles dager og andel av dagene med de valgte SKU-ene
+        rows = np.asarray(rows, dtype="int64")
+        in_period = self._days_in_period(start_date, end_date)
+        anchor_days = self.day_group[rows]
+        anchor_days = anchor_days[anchor_days >= 0]
+        anchor_days = np.unique(anchor_days[in_period[anchor_days]])
+        if not len(anchor_days):
+            return pd.DataFrame(columns=["sku", "product_name", "Dager sammen", "Andel av dagene"])
+
+        selected = np.zeros(self.n_days, dtype=bool)
+        selected[anchor_days] = True
+        excluded = np.zeros(len(self.skus), dtype=bool)
+        codes = self.sku_codes[rows]
+        excluded[codes[codes >= 0]] = True
+
+        # Alle linjer på de valgte dagene, unntatt de valgte SKU-ene selv; hver SKU
+        # telles én gang per dag
+        lines = np.flatnonzero((self.day_group >= 0) & selected[np.maximum(self.day_group, 0)])
+        codes = self.sku_codes[lines]
+        keep = codes >= 0
+        lines, codes = lines[keep], codes[keep]
+        keep = ~excluded[codes]
+        pairs = np.unique(self.day_group[lines[keep]].astype("int64") * len(self.skus) + codes[keep])
+        counts = np.bincount(pairs % len(self.skus), minlength=len(self.skus))
+
+        # Flest felles dager først; like antall i SKU-rekkefølge
+        chosen = np.flatnonzero(counts)
+        chosen = chosen[np.lexsort((chosen, -counts[chosen]))][:top]
+        return pd.DataFrame({
+            "sku": self.skus[chosen],
+            "product_name": self.product_names[chosen],
+            "Dager sammen": counts[chosen],
+            "Andel av dagene": (counts[chosen] / len(anchor_days)).round(3),
+        })
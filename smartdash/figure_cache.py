@@ -0,0 +1,57 @@
+import os
+
+import numpy as np
+
+from smartdash.dataset_cache import TTL_SECONDS, DatasetCache
+
+# ----------------------------
+# Cache for ferdige Plotly-figurer
+# ----------------------------
+# En figur bygges én gang per datasettversjon og visningsvalg (periode,
+# diagramtype, filter osv.) og deles mellom kjøringer og sesjoner, så et bytte
+# av fane eller en omkjøring uten endrede valg ikke bygger figuren på nytt.
+# Cachen er en egen DatasetCache med eget budsjett (LRU og utløpstid).
+#
+# Selve figurobjektet caches, ikke JSON-teksten: Streamlit serialiserer et
+# ferdig figurobjekt på et par millisekunder, mens en figur bygget opp igjen fra
+# JSON valideres på nytt og tar omtrent like lang tid som å lage den. Størrelsen
+# på en oppføring anslås derfor fra dataene i sporene (arrayer og tekst) i stedet
+# for å serialisere figuren bare for å måle den.
+
+MAX_BYTES = int(os.environ.get("SMARTDASH_FIGURE_CACHE_MB", "64")) * 1024 * 1024
+# Oppsett og mal per figur, omtrent det samme for alle figurene i appen
+LAYOUT_BYTES = 8 * 1024
+
+
+def _value_nbytes(value):
+    # Omtrentlig JSON-størrelse: tall som ca. 8 tegn, datoer ca. 24, tekst med sin lengde
+    if isinstance(value, dict):
+        return sum(len(key) + _value_nbytes(item) for key, item in value.items())
+    if isinstance(value, np.ndarray):
+        if value.dtype == object:
+            return sum(_value_nbytes(item) for item in value.ravel())
+        # Datoer blir ISO-tekst ("2024-01-01T00:00:00")
+        return value.size * (24 if value.dtype.kind == "M" else 8)
+    if isinstance(value, (list, tuple)):
+        return sum(_value_nbytes(item) for item in value) + len(value)
+    if isinstance(value, str):
+        return len(value) + 2
+    return 8
+
+
+class CachedFigure:
+    # Figuren og anslått størrelse; figuren er delt og skal ikke endres etter bygging
+    __slots__ = ("figure", "nbytes")
+
+    def __init__(self, figure):
+        self.figure = figure
+        self.nbytes = LAYOUT_BYTES + sum(_value_nbytes(trace.to_plotly_json()) for trace in figure.data)
+
+
+def figure_key(name, versions, params):
+    # versions: datasettnøklene figuren bygger på; params: visningsvalgene
+    return (name, tuple(versions), tuple(sorted((key, repr(value)) for key, value in params.items())))
+
+
+def create_figure_cache(max_bytes=MAX_BYTES, ttl_seconds=TTL_SECONDS):
+    return DatasetCache(max_bytes=max_bytes, ttl_seconds=ttl_seconds)
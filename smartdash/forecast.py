@@ -0,0 +1,118 @@
+import numpy as np
+
+# ----------------------------
+# Etterspørselsprognose for alle SKU-er samtidig
+# ----------------------------
+# Salget legges i en SKU × uke-matrise, og Holt-Winters (eksponentiell glatting
+# med dempet trend og additiv sesong) kjøres på hele matrisen: løkken går over
+# ukene, mens hvert steg er én vektoroperasjon over alle SKU-er. Glattefaktoren
+# alpha velges per SKU fra et lite rutenett (lavest kvadratfeil på ettstegs-
+# prognosene). Sesong brukes bare når perioden dekker minst to hele år.
+#
+# Fra prognosen og spredningen i prognosefeilene beregnes sikkerhetslager for
+# leveringstiden og bestillingspunkt (forventet salg i leveringstiden +
+# sikkerhetslager).
+
+# Økes når modellen endres, så ferdigberegnede lagerrapporter beregnes på nytt
+FORECAST_VERSION = "1"
+
+PERIOD_DAYS = 7
+SEASON_LENGTH = 52
+ALPHAS = (0.1, 0.3, 0.5)
+BETA = 0.1
+GAMMA = 0.2
+PHI = 0.9
+
+# 3 uker leverings-/produksjonstid og 95 % servicenivå
+LEAD_TIME_PERIODS = 3
+SERVICE_Z = 1.65
+WEEKS_PER_MONTH = 30 / PERIOD_DAYS
+
+
+def demand_matrix(codes, dates, quantities, n_codes, end_date, n_periods, period_days=PERIOD_DAYS):
+    # Uke 0 er den eldste og uke n_periods-1 slutter på end_date; rader utenfor faller bort
+    end_day = np.datetime64(end_date, "D")
+    age = (end_day - dates.astype("datetime64[D]")).astype("int64") // period_days
+    period = n_periods - 1 - age
+    keep = (period >= 0) & (period < n_periods) & (codes >= 0)
+    flat = codes[keep].astype("int64") * n_periods + period[keep]
+    weights = np.nan_to_num(quantities[keep].astype("float64"))
+    totals = np.bincount(flat, weights=weights, minlength=n_codes * n_periods)
+    return totals.reshape(n_codes, n_periods)
+
+
+def _smooth(y, alpha, season_length):
+    # Ettstegs-prognoser og sluttilstand for alle rader i y (SKU × uke)
+    n_rows, n_periods = y.shape
+    seasonal = season_length is not None
+    if seasonal:
+        first = y[:, :season_length].mean(axis=1)
+        second = y[:, season_length:2 * season_length].mean(axis=1)
+        level = first
+        trend = (second - first) / season_length
+        season = y[:, :season_length] - first[:, None]
+        start = season_length
+    else:
+        level = y[:, 0].copy()
+        trend = np.zeros(n_rows)
+        season = np.zeros((n_rows, 1))
+        start = 1
+    season_length = season.shape[1]
+    errors = np.zeros((n_rows, n_periods - start))
+    for t in range(start, n_periods):
+        s = season[:, t % season_length]
+        predicted = level + PHI * trend + s
+        errors[:, t - start] = y[:, t] - predicted
+        new_level = alpha * (y[:, t] - s) + (1 - alpha) * (level + PHI * trend)
+        trend = BETA * (new_level - level) + (1 - BETA) * PHI * trend
+        if seasonal:
+            season[:, t % season_length] = GAMMA * (y[:, t] - new_level) + (1 - GAMMA) * s
+        level = new_level
+    return errors, (level, trend, season, n_periods)
+
+
+def _project(level, trend, season, n_periods, horizon):
+    # Prognose for de neste horizon ukene, som SKU × uke
+    steps = np.arange(1, horizon + 1)
+    damped = np.cumsum(PHI ** steps)
+    season_idx = (n_periods + steps - 1) % season.shape[1]
+    return np.maximum(level[:, None] + damped[None, :] * trend[:, None] + season[:, season_idx], 0.0)
+
+
+def forecast_demand(matrix, horizon=None, lead_time=LEAD_TIME_PERIODS, service_z=SERVICE_Z):
+    # matrix: SKU × uke med solgt antall, eldste uke først.
+    # Returnerer per SKU: prognose per uke, sikkerhetslager og bestillingspunkt.
+    y = np.asarray(matrix, dtype="float64")
+    n_rows, n_periods = y.shape
+    horizon = max(horizon or 0, lead_time, int(np.ceil(WEEKS_PER_MONTH)))
+    if n_rows == 0 or n_periods < 2:
+        weekly = y.mean(axis=1) if n_periods else np.zeros(n_rows)
+        path = np.repeat(weekly[:, None], horizon, axis=1)
+        sigma = np.zeros(n_rows)
+    else:
+        season_length = SEASON_LENGTH if n_periods >= 2 * SEASON_LENGTH else None
+        best = None
+        for alpha in ALPHAS:
+            errors, (level, trend, season, _) = _smooth(y, alpha, season_length)
+            sse = (errors ** 2).sum(axis=1)
+            if best is None:
+                best = [sse, errors, level, trend, season]
+                continue
+            # Behold den beste alphaen per SKU
+            better = sse < best[0]
+            for i, value in enumerate((sse, errors, level, trend, season)):
+                mask = better if value.ndim == 1 else better[:, None]
+                best[i] = np.where(mask, value, best[i])
+        _, best_errors, level, trend, season = best
+        path = _project(level, trend, season, n_periods, horizon)
+        sigma = np.sqrt((best_errors ** 2).mean(axis=1)) if best_errors.shape[1] else np.zeros(n_rows)
+
+    safety_stock = service_z * sigma * np.sqrt(lead_time)
+    lead_demand = path[:, :lead_time].sum(axis=1)
+    return {
+        "weekly": path,
+        "monthly": path[:, :int(np.ceil(WEEKS_PER_MONTH))].mean(axis=1) * WEEKS_PER_MONTH,
+        "sigma": sigma,
+        "safety_stock": safety_stock,
+        "reorder_point": lead_demand + safety_stock,
+    }
@@ -0,0 +1,278 @@
+import os
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+# ----------------------------
+# Cache for Google Analytics-rapporter
+# ----------------------------
+# Verdiene lagres per (property, metrikksett, dag). Ved en ny spørring hentes
+# bare dagene som mangler, pluss de siste dagene som GA fortsatt kan endre
+# (ikke ferdig prosessert) dersom de ble hentet for en stund siden.
+# Alt annet serveres lokalt. Klienten er utskiftbar: GoogleAnalyticsClient
+# snakker med GA, FakeAnalyticsClient lager syntetiske tall uten nettverk.
+#
+# Hentingen kan kjøres i bakgrunnen (start_fetch): rapporten hentes side for
+# side med limit/offset, hver side lagres i cachen så snart den kommer, og
+# jobben avbrytes når fristen er nådd. Siden kan dermed tegne et delvis
+# diagram mens resten hentes.
+
+GA_PROPERTY = "properties/283157216"
+
+# GA kan justere tallene for de siste dagene i etterkant
+UNSETTLED_DAYS = 3
+UNSETTLED_TTL_SECONDS = 15 * 60
+
+PAGE_SIZE = 1000
+REQUEST_TIMEOUT_SECONDS = 10
+FETCH_DEADLINE_SECONDS = 60
+# En henting som feilet prøves ikke på nytt før dette har gått
+FAILED_RETRY_SECONDS = 30
+
+
+class GoogleAnalyticsClient:
+    # Én BetaAnalyticsDataClient per prosess – klientbiblioteket importeres først her
+    def __init__(self):
+        from google.analytics.data_v1beta import BetaAnalyticsDataClient
+        self._client = BetaAnalyticsDataClient()
+
+    def fetch_pages(self, property_id, metric_names, start_date, end_date,
+                    page_size=PAGE_SIZE, timeout=REQUEST_TIMEOUT_SECONDS):
+        from google.analytics.data_v1beta import RunReportRequest
+        offset = 0
+        while True:
+            request = RunReportRequest(
+                property=property_id,
+                dimensions=[{"name": "date"}],
+                metrics=[{"name": name} for name in metric_names],
+                date_ranges=[{"start_date": start_date.strftime("%Y-%m-%d"), "end_date": end_date.strftime("%Y-%m-%d")}],
+                order_bys=[{"dimension": {"dimension_name": "date"}}],
+                limit=page_size,
+                offset=offset,
+            )
+            response = self._client.run_report(request, timeout=timeout)
+            rows = []
+            for row in response.rows:
+                day = datetime.strptime(row.dimension_values[0].value, "%Y%m%d").date()
+                rows.append((day, [float(value.value) for value in row.metric_values]))
+            yield rows
+            offset += len(rows)
+            if not rows or offset >= response.row_count:
+                break
+
+    def fetch_daily(self, property_id, metric_names, start_date, end_date):
+        return [row for page in self.fetch_pages(property_id, metric_names, start_date, end_date) for row in page]
+
+
+class FakeAnalyticsClient:
+    # Deterministiske tall per (metrikk, dag); teller kall slik at cachen kan testes.
+    # page_delay simulerer en treg GA-respons per side.
+    def __init__(self, page_delay=0.0):
+        self.calls = []
+        self.page_delay = page_delay
+
+    def fetch_pages(self, property_id, metric_names, start_date, end_date,
+                    page_size=PAGE_SIZE, timeout=REQUEST_TIMEOUT_SECONDS):
+        self.calls.append((property_id, tuple(metric_names), start_date, end_date))
+        n_days = (end_date - start_date).days + 1
+        for offset in range(0, n_days, page_size):
+            if self.page_delay:
+                time.sleep(self.page_delay)
+            rows = []
+            for i in range(offset, min(offset + page_size, n_days)):
+                day = start_date + timedelta(days=i)
+                values = [float(zlib.crc32(f"{name}:{day.isoformat()}".encode()) % 500) for name in metric_names]
+                rows.append((day, values))
+            yield rows
+
+    def fetch_daily(self, property_id, metric_names, start_date, end_date):
+        return [row for page in self.fetch_pages(property_id, metric_names, start_date, end_date) for row in page]
+
+
+def uses_fake_client():
+    # SMARTDASH_GA_CLIENT=fake gir syntetiske data uten nettverk og nøkkelfil
+    return os.environ.get("SMARTDASH_GA_CLIENT") == "fake"
+
+
+def default_client_factory():
+    if uses_fake_client():
+        return FakeAnalyticsClient()
+    return GoogleAnalyticsClient()
+
+
+class FetchJob:
+    # Status for en bakgrunnshenting: running, done, timeout eller failed
+    def __init__(self, ranges, deadline, clock=time.monotonic):
+        self.ranges = ranges
+        self.deadline = deadline
+        self.status = "running"
+        self.pages = 0
+        self.rows = 0
+        self.error = None
+        # Samme klokke som fristen, så tidsbruk, frist og ny-forsøk måles likt
+        self._clock = clock
+        self.started_at = clock()
+        self.finished_at = None
+        self.finished = threading.Event()
+
+    @property
+    def running(self):
+        return self.status == "running"
+
+    @property
+    def seconds(self):
+        end = self.finished_at if self.finished_at is not None else self._clock()
+        return end - self.started_at
+
+    def finish(self, status, error=None):
+        self.status = status
+        self.error = error
+        self.finished_at = self._clock()
+        self.finished.set()
+
+
+def _missing_ranges(days):
+    # Sammenhengende dager slås sammen til ett intervall per rapportkall
+    ranges = []
+    for day in days:
+        if ranges and ranges[-1][1] + timedelta(days=1) == day:
+            ranges[-1][1] = day
+        else:
+            ranges.append([day, day])
+    return ranges
+
+
+class GAReportCache:
+    def __init__(self, client_factory=default_client_factory, unsettled_days=UNSETTLED_DAYS,
+                 unsettled_ttl=UNSETTLED_TTL_SECONDS, today=date.today, clock=time.monotonic):
+        self._client_factory = client_factory
+        self._client = None
+        self.unsettled_days = unsettled_days
+        self.unsettled_ttl = unsettled_ttl
+        self._today = today
+        self._clock = clock
+        self._lock = threading.Lock()
+        # (property, metrikker) -> {dag: (verdier, hentet_tidspunkt)}
+        self._days = {}
+        self._jobs = {}
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="ga-fetch")
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = self._client_factory()
+            return self._client
+
+    def _stale_days(self, entries, start_date, end_date):
+        today = self._today()
+        unsettled_from = today - timedelta(days=self.unsettled_days)
+        now = self._clock()
+        stale = []
+        day = start_date
+        while day <= min(end_date, today):
+            cached = entries.get(day)
+            if cached is None or (day >= unsettled_from and now - cached[1] > self.unsettled_ttl):
+                stale.append(day)
+            day += timedelta(days=1)
+        return stale
+
+    def fetch_ranges(self, property_id, metric_names, start_date, end_date):
+        # Intervallene som må hentes fra GA for å dekke forespørselen
+        with self._lock:
+            return self._fetch_ranges_locked(property_id, metric_names, start_date, end_date)
+
+    def _fetch_ranges_locked(self, property_id, metric_names, start_date, end_date):
+        entries = self._days.get((property_id, tuple(metric_names)), {})
+        return _missing_ranges(self._stale_days(entries, start_date, end_date))
+
+    def store_rows(self, property_id, metric_names, rows):
+        key = (property_id, tuple(metric_names))
+        fetched_at = self._clock()
+        with self._lock:
+            entries = self._days.setdefault(key, {})
+            for day, values in rows:
+                entries[day] = (tuple(values), fetched_at)
+
+    def complete_range(self, property_id, metric_names, range_start, range_end, seen_days):
+        # Dager uten rader i svaret har ingen trafikk – lagres som 0
+        key = (property_id, tuple(metric_names))
+        fetched_at = self._clock()
+        empty = tuple(0.0 for _ in metric_names)
+        with self._lock:
+            entries = self._days.setdefault(key, {})
+            day = range_start
+            while day <= range_end:
+                if day not in seen_days:
+                    entries[day] = (empty, fetched_at)
+                day += timedelta(days=1)
+
+    def _fetch_range(self, property_id, metric_names, range_start, range_end, job=None):
+        seen_days = set()
+        for page in self.client.fetch_pages(property_id, metric_names, range_start, range_end):
+            self.store_rows(property_id, metric_names, page)
+            seen_days.update(day for day, _ in page)
+            if job is not None:
+                job.pages += 1
+                job.rows += len(page)
+                if self._clock() > job.deadline:
+                    return False
+        self.complete_range(property_id, metric_names, range_start, range_end, seen_days)
+        return True
+
+    def cached_frame(self, property_id, metric_names, start_date, end_date):
+        key = (property_id, tuple(metric_names))
+        with self._lock:
+            entries = self._days.get(key, {})
+            days = sorted(day for day in entries if start_date <= day <= end_date)
+            values = [entries[day][0] for day in days]
+        df = pd.DataFrame(values, columns=list(metric_names))
+        df.insert(0, "Dato", pd.to_datetime(pd.Series(days, dtype="object")))
+        return df
+
+    def get(self, property_id, metric_names, start_date, end_date):
+        # Blokkerende variant – henter alt som mangler før den returnerer
+        metric_names = list(metric_names)
+        for range_start, range_end in self.fetch_ranges(property_id, metric_names, start_date, end_date):
+            self._fetch_range(property_id, metric_names, range_start, range_end)
+        return self.cached_frame(property_id, metric_names, start_date, end_date)
+
+    def _retry_blocked(self, job):
+        return job.status == "failed" and self._clock() - job.finished_at < FAILED_RETRY_SECONDS
+
+    def start_fetch(self, property_id, metric_names, start_date, end_date, deadline=FETCH_DEADLINE_SECONDS):
+        # Starter henting i bakgrunnen og returnerer straks. Pågår det allerede en
+        # henting for samme property, metrikker og periode, returneres den jobben.
+        # Oppslaget og registreringen skjer under samme lås, så to sesjoner som ber om
+        # det samme samtidig ikke starter hver sin henting.
+        metric_names = list(metric_names)
+        key = (property_id, tuple(metric_names), start_date, end_date)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and (job.running or self._retry_blocked(job)):
+                return job
+            job = FetchJob(self._fetch_ranges_locked(property_id, metric_names, start_date, end_date),
+                           self._clock() + deadline, clock=self._clock)
+            if not job.ranges:
+                job.finish("done")
+                return job
+            # Ferdige jobber trengs ikke lenger (feilede beholdes til ny-forsøk er tillatt)
+            for old_key in [k for k, old in self._jobs.items() if not old.running and not self._retry_blocked(old)]:
+                del self._jobs[old_key]
+            self._jobs[key] = job
+        self._executor.submit(self._run_job, property_id, metric_names, job)
+        return job
+
+    def _run_job(self, property_id, metric_names, job):
+        try:
+            for range_start, range_end in job.ranges:
+                if not self._fetch_range(property_id, metric_names, range_start, range_end, job):
+                    job.finish("timeout")
+                    return
+            job.finish("done")
+        except Exception as e:
+            job.finish("failed", e)
@@ -0,0 +1,202 @@
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import types
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from io import BytesIO
+
+from smartdash.reports import is_streamed, load_dataset, load_product_sales, load_sales
+from smartdash.snapshots import content_hash, read_snapshot, read_source_bytes, snapshot_path, source_size
+
+# ----------------------------
+# Parallell innlesing av opplastede filer
+# ----------------------------
+# Når brukeren laster opp filer, sendes alle til en prosesspool med én gang
+# i stedet for at hver visning parser sin fil etter tur. Hver fil parses og
+# normaliseres nøyaktig én gang i en arbeidsprosess, som skriver Arrow-snapshotet
+# og sender tilbake bare stien og hashen. Hovedprosessen minnemapper snapshotet
+# og legger rammen i datasett-cachen under samme nøkkel som visningene slår opp
+# på, så rammen kopieres aldri mellom prosessene og deles med alle andre som
+# leser samme fil. En visning som trenger en fil som fortsatt leses, venter på den
+# jobben i stedet for å parse filen på nytt. Total ventetid blir dermed omtrent
+# tiden for den største filen, ikke summen av alle.
+#
+# Arbeidsprosessene startes med forkserver (spawn der den ikke finnes), aldri med
+# fork: Streamlit-serveren har mange tråder, og en fork midt i en låst logger,
+# allokator eller trådpool kan henge barneprosessen. Forkserveren importerer bare
+# denne modulen (pandas, pyarrow og parserne) én gang, og arbeidsprosessene forkes
+# fra den. Under Streamlit er __main__ selve dashapp.py, og nye prosesser importerer
+# __main__ på nytt – hele appen ville kjørt i hver arbeidsprosess. Mens prosessene
+# startes, peker __main__ derfor på en tom modul.
+# Med bare én kjerne er det ingenting å vinne (parsingen konkurrerer om samme
+# kjerne), så da er innlesingen i bakgrunnen av som standard.
+# SMARTDASH_INGEST_WORKERS=0 slår den av.
+
+_CPUS = os.cpu_count() or 1
+MAX_WORKERS = int(os.environ.get("SMARTDASH_INGEST_WORKERS", str(min(_CPUS, 6) if _CPUS > 1 else 0)))
+
+LOADERS = {
+    "sales": load_sales,
+    "cost": partial(load_dataset, schema="cost"),
+    "traffic": partial(load_dataset, schema="traffic"),
+    "product_sales": partial(load_dataset, schema="product_sales"),
+    "product_sales-daily": load_product_sales,
+    "prices": partial(load_dataset, schema="prices"),
+    "product_prices": partial(load_dataset, schema="product_prices"),
+}
+
+
+def dataset_kind(name, source):
+    # Cache-typen visningene bruker for datasettet; store produktfiler leses i strømmemodus
+    if name == "product_sales" and is_streamed(source):
+        return "product_sales-daily"
+    return name
+
+
+def ingest_file(kind, data):
+    # Kjøres i arbeidsprosessen: parser filen og skriver snapshotet (under samme navn som
+    # load_with_snapshot bruker), og returnerer bare stien og innholdshashen.
+    # Stien er None hvis rammen ikke kunne lagres; da parser visningen filen selv.
+    digest = content_hash(data)
+    path = snapshot_path(kind, digest)
+    LOADERS[kind](BytesIO(data))
+    return (path if os.path.exists(path) else None), digest
+
+
+def _context():
+    methods = multiprocessing.get_all_start_methods()
+    if "forkserver" not in methods:
+        return multiprocessing.get_context("spawn")
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload([__name__])
+    return context
+
+
+@contextmanager
+def _bare_main():
+    # Nye arbeidsprosesser startes ved submit(); de skal bare importere denne modulen
+    main = sys.modules["__main__"]
+    sys.modules["__main__"] = types.ModuleType("__main__")
+    try:
+        yield
+    finally:
+        sys.modules["__main__"] = main
+
+
+class IngestTask:
+    def __init__(self, label, key, size):
+        self.label = label
+        self.key = key
+        self.size = size
+        self.future = None
+        self.submitted_at = time.perf_counter()
+        self.seconds = None
+        self.rows = None
+        self.error = None
+        self.stored = False
+
+    @property
+    def done(self):
+        return self.future is None or self.future.done()
+
+    @property
+    def status(self):
+        if self.error is not None:
+            return "feil"
+        if self.done:
+            return "ferdig"
+        return "leser" if self.future.running() else "venter"
+
+    def elapsed(self):
+        return time.perf_counter() - self.submitted_at
+
+
+class IngestCoordinator:
+    def __init__(self, cache, max_workers=MAX_WORKERS):
+        self.cache = cache
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._pool = None
+        # nøkkel -> jobb for filer som leses eller nettopp er lest
+        self._tasks = {}
+
+    def _executor(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=_context())
+        return self._pool
+
+    def submit(self, label, source, key):
+        # Starter innlesingen av source hvis den ikke allerede er i cachen eller underveis;
+        # key er (cache-type, innholdshash), samme nøkkel som visningene slår opp på
+        if self.max_workers <= 0:
+            return None
+        kind = key[0]
+        with self._lock:
+            task = self._tasks.get(key)
+            if task is not None:
+                return task
+            task = IngestTask(label, key, source_size(source))
+            self._tasks[key] = task
+            if self.cache.peek(key) is not None:
+                task.stored = True
+                return task
+            try:
+                with _bare_main():
+                    task.future = self._executor().submit(ingest_file, kind, read_source_bytes(source))
+            except RuntimeError as e:
+                # Poolen er ødelagt (f.eks. en prosess som døde) – lag en ny neste gang
+                self._pool = None
+                task.error = repr(e)
+                return task
+        task.future.add_done_callback(lambda _: self._store(task))
+        return task
+
+    def _store(self, task):
+        with self._lock:
+            if task.stored or task.error is not None:
+                return
+            try:
+                path, digest = task.future.result()
+            except Exception as e:
+                task.error = repr(e)
+                if isinstance(e, BrokenProcessPool):
+                    self._pool = None
+                return
+            task.seconds = task.elapsed()
+            task.stored = True
+            df = read_snapshot(path) if path is not None and digest == task.key[1] else None
+            if df is None:
+                # Uten snapshot (f.eks. kolonner som ikke kan lagres) parser visningen filen selv
+                return
+            # Legges i cachen før jobben regnes som ferdig, så wait() aldri finner en tom cache
+            self.cache.put(task.key, df)
+            task.rows = len(df)
+
+    def wait(self, key):
+        # Venter på en fil som leses; etterpå ligger rammen i cachen (eller jobben feilet,
+        # og kalleren parser filen selv)
+        with self._lock:
+            task = self._tasks.get(key)
+        if task is None or task.future is None:
+            return
+        try:
+            task.future.result()
+        except Exception:
+            pass
+        self._store(task)
+
+    def tasks(self, keys):
+        with self._lock:
+            return [self._tasks[key] for key in keys if key in self._tasks]
+
+    def forget(self, keys_in_use):
+        # Glemmer jobbene for filer som ikke lenger er lastet opp
+        with self._lock:
+            for key in list(self._tasks):
+                if key not in keys_in_use and self._tasks[key].done:
+                    del self._tasks[key]
@@ -0,0 +1,264 @@
+import re
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from smartdash.schemas import widen_int
+
+# ----------------------------
+# Søkeordstatistikk for SEO-fanen
+# ----------------------------
+# Alle trafikkmetrikker summeres per søkeord én gang når datasettet lastes:
+# visninger, konverteringer, klikkrate og plassering (begge vektet med
+# visninger). Topplister hentes med delvis utvalg (argpartition) av de k
+# største i stedet for å sortere alle søkeordene.
+#
+# Nesten like søkeord grupperes i klynger. Først slås søkeord som er like uten
+# mellomrom og tegn sammen ("keratin behandling" = "keratinbehandling"), deretter
+# sammenlignes tegn-trigrammer med MinHash: hvert søkeord får en signatur, søkeord
+# som deler et bånd av signaturen er kandidater, og kandidater med estimert
+# likhet over CLUSTER_SIMILARITY knyttes sammen. Alt er vektoroperasjoner, så
+# hundretusener av søkeord grupperes uten å sammenligne alle par.
+
+# Økes når kolonnene eller klyngingen endres, så ferdigberegnede topplister beregnes på nytt
+KEYWORDS_VERSION = "1"
+
+METRICS = {
+    "antallvisninger": "Visninger",
+    "konverteringer": "Konverteringer",
+    "klikkrate": "Klikkrate",
+    "plassering": "Plassering",
+}
+# Lavere plassering er bedre
+ASCENDING_METRICS = {"plassering"}
+# Rater er bare meningsfulle med nok visninger; min_views gjelder disse
+RATE_METRICS = {"klikkrate", "plassering"}
+
+NGRAM = 3
+MINHASH_BANDS = 8
+MINHASH_ROWS = 2
+CLUSTER_SIMILARITY = 0.7
+
+_NON_WORD_RE = re.compile(r"[\W_]+")
+_MERSENNE = (1 << 31) - 1
+
+
+def normalize_keyword(text):
+    return _NON_WORD_RE.sub("", str(text).lower())
+
+
+def _ngram_hashes(keys):
+    # (søkeord-nr, trigram-hash) for alle trigrammer; # markerer start og slutt
+    owners, hashes = [], []
+    for i, key in enumerate(keys):
+        padded = f"#{key}#"
+        grams = {padded[j:j + NGRAM] for j in range(max(len(padded) - NGRAM + 1, 1))}
+        owners.extend([i] * len(grams))
+        hashes.extend(zlib.crc32(gram.encode("utf-8")) & 0x7FFFFFFF for gram in grams)
+    return np.asarray(owners, dtype="int64"), np.asarray(hashes, dtype="int64")
+
+
+def _minhash(owners, hashes, n_keys, n_hashes, seed=0):
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _MERSENNE, n_hashes)
+    b = rng.integers(0, _MERSENNE, n_hashes)
+    # owners er sortert, så hvert søkeord er et sammenhengende stykke
+    starts = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1]])
+    signatures = np.empty((n_keys, n_hashes), dtype="int64")
+    for h in range(n_hashes):
+        values = (a[h] * hashes + b[h]) % _MERSENNE
+        signatures[:, h] = np.minimum.reduceat(values, starts)
+    return signatures
+
+
+def _connected_labels(n, left, right):
+    # Minste nummer i hver sammenhengende gruppe, ved å spre minimum langs kantene
+    labels = np.arange(n)
+    while True:
+        low = np.minimum(labels[left], labels[right])
+        updated = labels.copy()
+        np.minimum.at(updated, left, low)
+        np.minimum.at(updated, right, low)
+        updated = updated[updated]
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+def cluster_keywords(keywords):
+    # Klyngenummer per søkeord (samme nummer = samme klynge)
+    keys, exact = np.unique([normalize_keyword(k) for k in keywords], return_inverse=True)
+    n_keys = len(keys)
+    if n_keys < 2:
+        return exact
+    owners, hashes = _ngram_hashes(keys)
+    signatures = _minhash(owners, hashes, n_keys, MINHASH_BANDS * MINHASH_ROWS)
+    left, right = [], []
+    for band in range(MINHASH_BANDS):
+        part = signatures[:, band * MINHASH_ROWS:(band + 1) * MINHASH_ROWS]
+        _, bucket = np.unique(part, axis=0, return_inverse=True)
+        bucket = bucket.ravel()
+        # Hvert søkeord sammenlignes med første søkeord i samme bøtte
+        order = np.argsort(bucket, kind="stable")
+        first = order[np.r_[0, np.flatnonzero(np.diff(bucket[order])) + 1]]
+        leader = first[np.searchsorted(bucket[first], bucket)]
+        candidates = np.flatnonzero(leader != np.arange(n_keys))
+        similarity = (signatures[candidates] == signatures[leader[candidates]]).mean(axis=1)
+        keep = candidates[similarity >= CLUSTER_SIMILARITY]
+        left.append(keep)
+        right.append(leader[keep])
+    labels = _connected_labels(n_keys, np.concatenate(left), np.concatenate(right))
+    return labels[exact]
+
+
+def _weighted_mean(codes, values, weights, n):
+    valid = ~np.isnan(values)
+    totals = np.bincount(codes[valid], weights=values[valid] * weights[valid], minlength=n)
+    weight_sums = np.bincount(codes[valid], weights=weights[valid], minlength=n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(weight_sums > 0, totals / weight_sums, np.nan)
+
+
+def _column(df, col):
+    if col not in df.columns:
+        return np.full(len(df), np.nan)
+    return widen_int(df[col]).to_numpy(dtype="float64", na_value=np.nan)
+
+
+def _keyword_codes(values):
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(), values.cat.categories
+    return pd.factorize(values)
+
+
+def _keyword_sums(traffic_df, codes, n):
+    # Summer per søkeord som metrikkene regnes fra; rater lagres som sum(verdi × visninger)
+    # og sum(visninger) for radene med verdi, så de kan legges til og trekkes fra
+    valid = codes >= 0
+    codes = codes[valid].astype("int64")
+    views = np.nan_to_num(_column(traffic_df, "antallvisninger")[valid])
+    sums = {
+        "rows": np.bincount(codes, minlength=n).astype("float64"),
+        "antallvisninger": np.bincount(codes, weights=views, minlength=n),
+        "konverteringer": np.bincount(codes, weights=np.nan_to_num(_column(traffic_df, "konverteringer")[valid]),
+                                      minlength=n),
+    }
+    for metric, col in (("klikkrate", "clicks"), ("plassering", "plassering")):
+        values = _column(traffic_df, col)[valid]
+        has_value = ~np.isnan(values)
+        sums[metric] = np.bincount(codes[has_value], weights=values[has_value] * views[has_value], minlength=n)
+        sums[f"{metric}_views"] = np.bincount(codes[has_value], weights=views[has_value], minlength=n)
+    return sums
+
+
+class KeywordStats:
+    def __init__(self, traffic_df):
+        codes, keywords = _keyword_codes(traffic_df["søkeord"])
+        self.keywords = np.asarray(keywords, dtype=object)
+        self._set_sums(_keyword_sums(traffic_df, codes, len(keywords)))
+
+    def _set_sums(self, sums):
+        self._sums = sums
+        self.rows = sums["rows"].astype("int64")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rates = {metric: np.where(sums[f"{metric}_views"] > 0, sums[metric] / sums[f"{metric}_views"], np.nan)
+                     for metric in RATE_METRICS}
+        self.metrics = {
+            "antallvisninger": sums["antallvisninger"],
+            "konverteringer": sums["konverteringer"],
+            "klikkrate": rates["klikkrate"],
+            "plassering": rates["plassering"],
+        }
+        self._clusters = None
+
+    def merge(self, delta_df, replaced_df):
+        # Ny statistikk der radene i delta_df er lagt til og radene de erstattet (replaced_df)
+        # er trukket fra; bare søkeordene i deltaen berøres. Nye søkeord legges til på slutten.
+        delta_codes, delta_keywords = _keyword_codes(delta_df["søkeord"])
+        replaced_codes, replaced_keywords = _keyword_codes(replaced_df["søkeord"])
+        known = pd.Index(self.keywords)
+        observed = np.asarray(delta_keywords, dtype=object)[np.unique(delta_codes[delta_codes >= 0])]
+        added = pd.Index(observed).difference(known, sort=False)
+        merged = KeywordStats.__new__(KeywordStats)
+        merged.keywords = np.concatenate([self.keywords, np.asarray(added, dtype=object)])
+        n = len(merged.keywords)
+        keyword_index = pd.Index(merged.keywords)
+
+        def remap(codes, keywords):
+            mapping = keyword_index.get_indexer(np.asarray(keywords, dtype=object))
+            return np.where(codes >= 0, mapping[np.maximum(codes, 0)], -1) if len(mapping) else codes
+
+        plus = _keyword_sums(delta_df, remap(delta_codes, delta_keywords), n)
+        minus = _keyword_sums(replaced_df, remap(replaced_codes, replaced_keywords), n)
+        sums = {}
+        for name, values in self._sums.items():
+            values = np.concatenate([values, np.zeros(n - len(values))])
+            sums[name] = values + plus[name] - minus[name]
+        merged._set_sums(sums)
+        return merged
+
+    @property
+    def nbytes(self):
+        size = self.keywords.nbytes + sum(len(k) for k in self.keywords) + self.rows.nbytes
+        size += sum(values.nbytes for values in self._sums.values()) + self.metrics["klikkrate"].nbytes * 2
+        if self._clusters is not None:
+            size += self._clusters[0].nbytes + sum(values.nbytes for values in self._clusters[2].values())
+        return size
+
+    def _cluster_metrics(self):
+        # Bygges første gang noen ber om klynger: (klynge per søkeord, navn, metrikker per klynge)
+        if self._clusters is None:
+            labels = cluster_keywords(self.keywords)
+            _, cluster = np.unique(labels, return_inverse=True)
+            n = cluster.max() + 1 if len(cluster) else 0
+            views = self.metrics["antallvisninger"]
+            metrics = {
+                "antallvisninger": np.bincount(cluster, weights=views, minlength=n),
+                "konverteringer": np.bincount(cluster, weights=self.metrics["konverteringer"], minlength=n),
+                "klikkrate": _weighted_mean(cluster, self.metrics["klikkrate"], views, n),
+                "plassering": _weighted_mean(cluster, self.metrics["plassering"], views, n),
+            }
+            # Klyngen får navn etter søkeordet med flest visninger
+            order = np.lexsort((-views, cluster))
+            leaders = order[np.r_[0, np.flatnonzero(np.diff(cluster[order])) + 1]] if n else order
+            sizes = np.bincount(cluster, minlength=n)
+            self._clusters = (cluster, (self.keywords[leaders], sizes), metrics)
+        return self._clusters
+
+    def top(self, k, by="antallvisninger", clustered=False, min_views=0):
+        if clustered:
+            _, (names, sizes), metrics = self._cluster_metrics()
+        else:
+            names, sizes, metrics = self.keywords, None, self.metrics
+        values = metrics[by]
+        # Størst først (minst først for plassering); manglende verdier og søkeord
+        # med for få visninger er utelatt
+        score = np.where(np.isnan(values), np.inf, values if by in ASCENDING_METRICS else -values)
+        if by in RATE_METRICS and min_views:
+            score[metrics["antallvisninger"] < min_views] = np.inf
+        k = min(k, len(score))
+        if k == 0:
+            chosen = np.zeros(0, dtype="int64")
+        else:
+            chosen = np.argpartition(score, k - 1)[:k] if k < len(score) else np.arange(len(score))
+            chosen = chosen[np.lexsort((chosen, score[chosen]))]
+            chosen = chosen[np.isfinite(score[chosen])]
+        result = pd.DataFrame({"søkeord": names[chosen]})
+        for name, metric in metrics.items():
+            result[name] = metric[chosen]
+        result["antallvisninger"] = result["antallvisninger"].astype("int64")
+        result["konverteringer"] = result["konverteringer"].astype("int64")
+        result["klikkrate"] = result["klikkrate"].round(4)
+        result["plassering"] = result["plassering"].round(2)
+        if clustered:
+            result["søkeord i klyngen"] = sizes[chosen]
+        return result
+
+    def cluster_members(self, keyword):
+        # Alle søkeord i samme klynge som keyword
+        cluster, _, _ = self._cluster_metrics()
+        matches = np.flatnonzero(self.keywords == keyword)
+        if not len(matches):
+            return []
+        return sorted(self.keywords[cluster == cluster[matches[0]]].tolist())
@@ -0,0 +1,231 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+# ----------------------------
+# Tidsmåling per steg og metrikker for hele prosessen
+# ----------------------------
+# Hver kjøring av appen får en RunTimer som måler de navngitte stegene:
+# innlasting (load.<datasett>), fanens beregninger (compute.<navn>), bygging av
+# figurer (figure.<navn>) og sending av figurer/tabeller til nettleseren
+# (emit.<navn>). Når kjøringen er ferdig, legges stegene inn i MetricsRegistry,
+# som også teller treff/bom i datasett-cachen per datasett.
+#
+# Metrikkene kan hentes på tre måter:
+#   - strukturert logg: én JSON-linje per kjøring på loggeren "smartdash.metrics"
+#     (SMARTDASH_METRICS_LOG=sti skriver linjene også til fil)
+#   - fil i Prometheus-tekstformat, skrevet etter hver kjøring (SMARTDASH_METRICS_FILE)
+#   - lokalt endepunkt /metrics og /metrics.json (SMARTDASH_METRICS_PORT)
+
+METRICS_FILE = os.environ.get("SMARTDASH_METRICS_FILE")
+METRICS_LOG = os.environ.get("SMARTDASH_METRICS_LOG")
+METRICS_PORT = os.environ.get("SMARTDASH_METRICS_PORT")
+
+# Antall siste målinger per steg som brukes til persentiler
+RECENT_SAMPLES = 200
+
+logger = logging.getLogger("smartdash.metrics")
+
+
+class RunTimer:
+    def __init__(self, view=None, clock=time.perf_counter):
+        self.view = view
+        self._clock = clock
+        self.started = clock()
+        self.stages = []
+        self.lookups = []
+
+    @contextmanager
+    def stage(self, name):
+        start = self._clock()
+        try:
+            yield
+        finally:
+            self.stages.append((name, self._clock() - start))
+
+    def lookup(self, kind, hit):
+        self.lookups.append((kind, hit))
+
+    def elapsed(self):
+        return self._clock() - self.started
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+class MetricsRegistry:
+    def __init__(self, metrics_file=METRICS_FILE):
+        self.metrics_file = metrics_file
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        # steg -> [antall, sum sekunder, maks, siste målinger]
+        self._stages = {}
+        # datasett -> [treff, bom]
+        self._lookups = {}
+        self._runs = {}
+        self._cache_stats = {}
+
+    def start_run(self, view=None):
+        return RunTimer(view)
+
+    def observe(self, name, seconds):
+        with self._lock:
+            entry = self._stages.get(name)
+            if entry is None:
+                entry = self._stages[name] = [0, 0.0, 0.0, deque(maxlen=RECENT_SAMPLES)]
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+            entry[3].append(seconds)
+
+    def count_lookup(self, kind, hit):
+        with self._lock:
+            entry = self._lookups.setdefault(kind, [0, 0])
+            entry[0 if hit else 1] += 1
+
+    def finish_run(self, run, cache_stats=None):
+        total = run.elapsed()
+        for name, seconds in run.stages:
+            self.observe(name, seconds)
+        self.observe("run", total)
+        for kind, hit in run.lookups:
+            self.count_lookup(kind, hit)
+        with self._lock:
+            view = run.view or "ukjent"
+            self._runs[view] = self._runs.get(view, 0) + 1
+            if cache_stats is not None:
+                self._cache_stats = dict(cache_stats)
+        logger.info(json.dumps({
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "view": run.view,
+            "seconds": round(total, 4),
+            "stages": [{"stage": name, "seconds": round(seconds, 4)} for name, seconds in run.stages],
+            "cache": [{"dataset": kind, "hit": hit} for kind, hit in run.lookups],
+        }, ensure_ascii=False))
+        if self.metrics_file:
+            self.write_file(self.metrics_file)
+
+    def snapshot(self):
+        with self._lock:
+            stages = {
+                name: {
+                    "count": count,
+                    "seconds_sum": total,
+                    "seconds_avg": total / count,
+                    "seconds_p50": _percentile(recent, 0.5),
+                    "seconds_p95": _percentile(recent, 0.95),
+                    "seconds_max": longest,
+                }
+                for name, (count, total, longest, recent) in self._stages.items()
+            }
+            lookups = {
+                kind: {"hits": hits, "misses": misses, "hit_rate": hits / (hits + misses)}
+                for kind, (hits, misses) in self._lookups.items()
+            }
+            return {"stages": stages, "cache_lookups": lookups, "runs": dict(self._runs),
+                    "dataset_cache": dict(self._cache_stats)}
+
+    def prometheus_text(self):
+        snap = self.snapshot()
+        lines = ["# TYPE smartdash_stage_seconds summary"]
+        for name, s in sorted(snap["stages"].items()):
+            label = f'stage="{_label(name)}"'
+            lines.append(f'smartdash_stage_seconds{{{label},quantile="0.5"}} {s["seconds_p50"]:.6f}')
+            lines.append(f'smartdash_stage_seconds{{{label},quantile="0.95"}} {s["seconds_p95"]:.6f}')
+            lines.append(f"smartdash_stage_seconds_sum{{{label}}} {s['seconds_sum']:.6f}")
+            lines.append(f"smartdash_stage_seconds_count{{{label}}} {s['count']}")
+        lines.append("# TYPE smartdash_stage_seconds_max gauge")
+        for name, s in sorted(snap["stages"].items()):
+            lines.append(f'smartdash_stage_seconds_max{{stage="{_label(name)}"}} {s["seconds_max"]:.6f}')
+        lines.append("# TYPE smartdash_cache_lookups_total counter")
+        for kind, s in sorted(snap["cache_lookups"].items()):
+            lines.append(f'smartdash_cache_lookups_total{{dataset="{_label(kind)}",result="hit"}} {s["hits"]}')
+            lines.append(f'smartdash_cache_lookups_total{{dataset="{_label(kind)}",result="miss"}} {s["misses"]}')
+        lines.append("# TYPE smartdash_runs_total counter")
+        for view, count in sorted(snap["runs"].items()):
+            lines.append(f'smartdash_runs_total{{view="{_label(view)}"}} {count}')
+        cache = snap["dataset_cache"]
+        for key in ("bytes", "max_bytes", "entries"):
+            if key in cache:
+                lines.append(f"# TYPE smartdash_dataset_cache_{key} gauge")
+                lines.append(f"smartdash_dataset_cache_{key} {cache[key]}")
+        for key in ("hits", "misses", "evictions", "expirations", "rejected"):
+            if key in cache:
+                lines.append(f"# TYPE smartdash_dataset_cache_{key}_total counter")
+                lines.append(f"smartdash_dataset_cache_{key}_total {cache[key]}")
+        return "\n".join(lines) + "\n"
+
+    def write_file(self, path):
+        # Skrives til en unik midlertidig fil og flyttes på plass, så en skraper aldri leser
+        # en halv fil. Sesjonene er tråder i samme prosess og skriver etter tur; en feil
+        # her logges og skal ikke stoppe kjøringen.
+        with self._file_lock:
+            tmp_path = None
+            try:
+                fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp",
+                                                dir=os.path.dirname(os.path.abspath(path)))
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(self.prometheus_text())
+                # mkstemp gir 0600; skraperen kjører ofte som en annen bruker
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.warning("Kunne ikke skrive metrikkfilen %s: %s", path, e)
+                if tmp_path is not None and os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+    def serve(self, port, host="127.0.0.1"):
+        # http.server importeres først her, så appen ikke betaler for det uten endepunkt
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, content_type = registry.prometheus_text(), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body, content_type = json.dumps(registry.snapshot(), ensure_ascii=False), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, int(port)), Handler)
+        threading.Thread(target=server.serve_forever, name="smartdash-metrics", daemon=True).start()
+        return server
+
+
+def create_registry():
+    # Én registry per prosess: logg til fil og endepunkt settes opp her, én gang
+    registry = MetricsRegistry()
+    if METRICS_LOG:
+        handler = logging.FileHandler(METRICS_LOG, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+    if METRICS_PORT:
+        try:
+            registry.serve(METRICS_PORT)
+        except OSError as e:
+            logger.warning("Kunne ikke starte metrikk-endepunktet på port %s: %s", METRICS_PORT, e)
+    return registry
@@ -0,0 +1,321 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from smartdash.forecast import PERIOD_DAYS, demand_matrix, forecast_demand
+from smartdash.keywords import KeywordStats
+from smartdash.day_groups import normalize_product_sales
+from smartdash.schemas import parse_csv
+from smartdash.snapshots import load_with_snapshot, source_size
+from smartdash.streaming import aggregate_product_sales
+from smartdash.valuation import derive_financials, monte_carlo_dcf
+
+# ----------------------------
+# Beregningene bak fanene, uten Streamlit
+# ----------------------------
+# Både appen og batchkjøringen (smartdash.batch) bruker disse funksjonene,
+# slik at tallene i en ferdigberegnet rapport er de samme som fanen viser.
+
+# Produktfiler over denne størrelsen leses i strømmemodus (summer per dag og SKU)
+STREAMING_THRESHOLD_BYTES = int(os.environ.get("SMARTDASH_STREAMING_THRESHOLD_MB", "50")) * 1024 * 1024
+
+COST_COLUMNS = ["varekostnad", "driftskostnader", "finansielle_kostnader", "lønnskostnad", "totale_kostnader"]
+
+# LuxusHair sine innkjøpspriser, brukes når ingen prisfil er lastet opp
+DEFAULT_PURCHASE_PRICES = {
+    "Clip On Extension Virgin 55 cm": 1300,
+    "Clip On Extension Virgin 60 cm": 3900,
+    "Clip On Extension Virgin 40 cm": 400,
+    "Clip On Extension Virgin 50 cm": 500,
+}
+MAIN_PRODUCT_TYPES = ["Clip On Extension Virgin", "Tape On Extension Virgin", "Keratin Extension Virgin"]
+MAIN_PRODUCT_LENGTHS = ["40", "50", "55", "60"]
+
+EBITDA = 755000
+EBITDA_MULTIPLE = 8
+DCF_MULTIPLE = 11
+
+SEO_TOP_N = 35
+
+
+# ----------------------------
+# Innlasting
+# ----------------------------
+def normalize_sales(df):
+    # Kolonnene beholder skjemanavnene (date, sales, antallordre); visningsnavnene
+    # (Dato, Omsetning, Ant. ordre) settes av SalesRollup. Dagen lagres som datetime64
+    # uten klokkeslett (ikke date-objekter), så kolonnen kan deles fra snapshotet.
+    if "date" in df.columns:
+        df = df.assign(date=df["date"].dt.normalize())
+    return df
+
+
+def parse_sales_data(buffer):
+    # Skjemaet gir ferdig typede kolonner (dato, beløp med tusenskille, heltall)
+    return normalize_sales(parse_csv(buffer, "sales"))
+
+
+def load_sales(source):
+    # Parset resultat lagres som snapshot på disk, nøklet på hash av filinnholdet
+    return load_with_snapshot(source, parse_sales_data, "sales")
+
+
+# Normalisering etter parsing, per skjema; resultatet er det som lagres i snapshotet
+NORMALIZERS = {
+    # Fyller datoen fremover til neste daterte linje og nummererer salgsdagene
+    "product_sales": normalize_product_sales,
+}
+
+
+def load_dataset(source, schema):
+    normalize = NORMALIZERS.get(schema, lambda df: df)
+    return load_with_snapshot(source, lambda buffer: normalize(parse_csv(buffer, schema)), schema)
+
+
+def normalize_cost(cost_df):
+    # Eksempel på kolonneomdøping
+    if "varekostnad" in cost_df.columns:
+        cost_df = cost_df.rename(columns={"varekostnad": "cost"})
+    return cost_df
+
+
+def is_streamed(source):
+    return source_size(source) > STREAMING_THRESHOLD_BYTES
+
+
+def load_product_sales(source):
+    if is_streamed(source):
+        # Filen foldes bit for bit inn i dag/SKU-summer i stedet for å lastes som én stor DataFrame
+        return load_with_snapshot(source, aggregate_product_sales, "product_sales-daily")
+    return load_dataset(source, "product_sales")
+
+
+# ----------------------------
+# FANE 2 – Kostnadsanalyse & Budsjett
+# ----------------------------
+def cost_columns(cost_df):
+    return [col for col in COST_COLUMNS if col in cost_df.columns]
+
+
+def cost_summary(cost_df, margin):
+    # margin som desimal (0.3 = 30 %)
+    columns = cost_columns(cost_df)
+    totals = {col: cost_df[col].sum() for col in columns}
+    if "totale_kostnader" in cost_df.columns:
+        total_cost = cost_df["totale_kostnader"].iloc[0]
+    else:
+        total_cost = sum(totals.values())
+    return {
+        "totals": totals,
+        "total_cost": total_cost,
+        "optimal_revenue": total_cost / (1 - margin),
+    }
+
+
+def cost_summary_frame(summary):
+    # Som tabell for batchrapporten; totalen og budsjettet er de to siste radene
+    rows = list(summary["totals"].items())
+    rows += [("Total kostnad", summary["total_cost"]), ("Optimal budsjettert omsetning", summary["optimal_revenue"])]
+    return pd.DataFrame(rows, columns=["Post", "Beløp (kr)"])
+
+
+def cost_summary_from_frame(frame):
+    values = frame["Beløp (kr)"].tolist()
+    return {
+        "totals": dict(zip(frame["Post"].iloc[:-2], values[:-2])),
+        "total_cost": values[-2],
+        "optimal_revenue": values[-1],
+    }
+
+
+# ----------------------------
+# FANE 3 – Lagerinnsikt & Innkjøpsstrategi
+# ----------------------------
+def _codes(values):
+    # Heltallskoder og unike verdier; kategorikolonner har dem allerede
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(), values.cat.categories
+    return pd.factorize(values, sort=True)
+
+
+def inventory_recommendations(product_sales_df, start_date, end_date, rows=None):
+    # rows: radposisjonene fra SKU-filteret (None = alle SKU-er). Summene regnes direkte
+    # på kolonnene for de valgte posisjonene, uten å kopiere ut et filtrert utsnitt.
+    start_dt = pd.to_datetime(start_date)
+    end_dt = pd.to_datetime(end_date)
+    df = product_sales_df
+    dates = df["date"].to_numpy()
+    in_period = (dates >= start_dt.to_datetime64()) & (dates <= end_dt.to_datetime64())
+    positions = np.flatnonzero(in_period) if rows is None else rows[in_period[rows]]
+
+    sku_codes, skus = _codes(df["sku"])
+    codes = sku_codes[positions]
+    positions, codes = positions[codes >= 0], codes[codes >= 0]
+    used, first = np.unique(codes, return_index=True)
+    quantities = df["antallsolgt"].to_numpy()[positions]
+    totals = np.bincount(codes, weights=np.nan_to_num(quantities.astype("float64")), minlength=len(skus))[used]
+    if pd.api.types.is_integer_dtype(quantities.dtype):
+        totals = totals.astype("int64")
+    grouped = pd.DataFrame({
+        "sku": np.asarray(skus, dtype=object)[used],
+        "antallsolgt": totals,
+        "product_name": df["product_name"].iloc[positions[first]].to_numpy(dtype=object),
+    })
+
+    # Beregn gjennomsnittlig solgt per måned og anbefalt varelager
+    n_months = (end_dt - start_dt).days / 30
+    if n_months <= 0:
+        n_months = 1
+    grouped["Gj.sn. solgt per måned"] = grouped["antallsolgt"] / n_months
+    grouped["Anbefalt varelager"] = np.ceil(grouped["Gj.sn. solgt per måned"].to_numpy() * 4 * 1.2).astype("int64")
+
+    # Prognose per SKU fra ukesalget i perioden (trend og sesong), med sikkerhetslager og bestillingspunkt
+    n_weeks = max(((end_dt - start_dt).days + 1) // PERIOD_DAYS, 1)
+    matrix = demand_matrix(codes, dates[positions], quantities, len(skus), end_dt, n_weeks)[used]
+    forecast = forecast_demand(matrix)
+    grouped["Prognose per måned"] = forecast["monthly"].round(1)
+    grouped["Sikkerhetslager"] = np.ceil(forecast["safety_stock"]).astype("int64")
+    grouped["Bestillingspunkt"] = np.ceil(forecast["reorder_point"]).astype("int64")
+    return grouped
+
+
+# ----------------------------
+# FANE 4 – Digital Analyse & SEO
+# ----------------------------
+def seo_top_keywords(traffic_df, n=SEO_TOP_N):
+    # Søkeordene med flest visninger, med alle trafikkmetrikkene summert per søkeord
+    return KeywordStats(traffic_df).top(n)
+
+
+# ----------------------------
+# FANE 6 – Optimale produktpriser
+# ----------------------------
+def purchase_price_map(prices_df=None):
+    if prices_df is None:
+        return dict(DEFAULT_PURCHASE_PRICES)
+    return dict(zip(prices_df["Produkt"], prices_df["Pris"]))
+
+
+def main_product_options():
+    return [f"{typ} {length} cm" for typ in MAIN_PRODUCT_TYPES for length in MAIN_PRODUCT_LENGTHS]
+
+
+def optimal_price(purchase_price, margin, overhead):
+    # (Innkjøpspris × (1 + overhead)) / (1 – margin), rundet ned til nærmeste …9
+    totalkost = purchase_price * (1 + overhead)
+    computed_price = totalkost / (1 - margin)
+    return (computed_price // 10) * 10 + 9
+
+
+def product_price_catalog(prices_df):
+    # Produktprisfilen har tomme skillelinjer mellom produktene
+    catalog = prices_df.dropna(subset=["product_name", "innkjøpspris"])
+    return catalog.reset_index(drop=True)
+
+
+def price_grid(purchase_prices, margins, overheads):
+    # Optimal pris for alle produkter og alle kombinasjoner av margin og overhead
+    # på én gang: produkt × margin × overhead
+    cost = np.asarray(purchase_prices, dtype="float64")[:, None, None]
+    margins = np.atleast_1d(np.asarray(margins, dtype="float64"))[None, :, None]
+    overheads = np.atleast_1d(np.asarray(overheads, dtype="float64"))[None, None, :]
+    return optimal_price(cost, margins, overheads)
+
+
+def price_deviations(catalog, margin, overhead):
+    # Avvik = optimal pris – nåværende pris; positivt avvik betyr at prisen bør opp
+    current = catalog["utpris"].to_numpy(dtype="float64")
+    optimal = price_grid(catalog["innkjøpspris"].to_numpy(), margin, overhead)[:, 0, 0]
+    deviation = optimal - current
+    with np.errstate(divide="ignore", invalid="ignore"):
+        percent = np.where(current > 0, deviation / current * 100, np.nan)
+    table = pd.DataFrame({
+        "Produkt": catalog["product_name"].to_numpy(dtype=object),
+        "Innkjøpspris": catalog["innkjøpspris"].to_numpy(),
+        "Nåværende pris": current,
+        "Optimal pris": optimal,
+        "Avvik (kr)": deviation,
+        "Avvik (%)": percent.round(1),
+    })
+    return table.sort_values("Avvik (%)", ascending=False, ignore_index=True)
+
+
+def sweep_values(bounds, step=5.0):
+    # (fra, til) i prosent fra en glider -> desimalverdier i steg på step prosentpoeng
+    return np.arange(bounds[0], bounds[1] + step / 2, step) / 100.0
+
+
+def price_sweep(catalog, margins, overheads):
+    # Oppsummering per kombinasjon av margin og overhead (margin/overhead som desimaler)
+    current = catalog["utpris"].to_numpy(dtype="float64")[:, None, None]
+    grid = price_grid(catalog["innkjøpspris"].to_numpy(), margins, overheads)
+    below = (current < grid).sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_deviation = np.nanmean(np.where(current > 0, (grid - current) / current * 100, np.nan), axis=0)
+    margin_values, overhead_values = np.meshgrid(margins, overheads, indexing="ij")
+    return pd.DataFrame({
+        "Margin (%)": (margin_values.ravel() * 100).round(1),
+        "Overhead (%)": (overhead_values.ravel() * 100).round(1),
+        "Produkter under optimal pris": below.ravel(),
+        "Snittavvik (%)": mean_deviation.ravel().round(1),
+    })
+
+
+# ----------------------------
+# FANE 7 – Verdivurdering
+# ----------------------------
+def valuation(cost_df=None, sales_rollup=None, assumptions=None, simulate=monte_carlo_dcf):
+    # EBITDA og omsetning hentes fra dataene; uten kostnadsdata brukes LuxusHair sin EBITDA.
+    # DCF-verdien er medianen av Monte Carlo-simuleringen, med 5- og 95-persentil som
+    # usikkerhetsbånd. simulate kan byttes ut, f.eks. med en cachet versjon i appen.
+    driftsresultat = None
+    if cost_df is not None and "driftsresultat" in cost_df.columns:
+        driftsresultat = pd.to_numeric(cost_df["driftsresultat"], errors="coerce").sum()
+    financials = derive_financials(cost_df, sales_rollup, fallback_ebitda=EBITDA)
+    ebitda = financials["ebitda"]
+
+    dcf = None
+    if financials["margin"] is not None:
+        assumptions = dict(assumptions or {})
+        if financials["growth"] is not None:
+            assumptions.setdefault("growth", financials["growth"])
+        dcf = simulate(financials["revenue"], financials["margin"], assumptions)
+        percentiles = dcf["value_percentiles"]
+        dcf_row = (percentiles[50], percentiles[5], percentiles[95])
+    else:
+        # Uten omsetning å regne margin fra faller DCF tilbake til bransjefaktoren
+        dcf_row = (ebitda * DCF_MULTIPLE,) * 3
+    value_df = pd.DataFrame({
+        "Metode": ["EBITDA-metoden", "DCF-modellen"],
+        "Verdi (kr)": [ebitda * EBITDA_MULTIPLE, dcf_row[0]],
+        "Lav (kr)": [ebitda * EBITDA_MULTIPLE, dcf_row[1]],
+        "Høy (kr)": [ebitda * EBITDA_MULTIPLE, dcf_row[2]],
+    })
+    return {"ebitda": ebitda, "value_df": value_df, "driftsresultat": driftsresultat,
+            "financials": financials, "dcf": dcf}
+
+
+def valuation_frame(result):
+    # value_df med resten av resultatet i attrs, slik at batchrapporten er ett snapshot.
+    # Attrs lagres som JSON, så persentilene lagres som par (JSON-nøkler er tekst).
+    value_df = result["value_df"].copy()
+    dcf = result["dcf"]
+    if dcf is not None:
+        dcf = dict(dcf, value_percentiles=[[p, float(v)] for p, v in dcf["value_percentiles"].items()],
+                   cash_flow_bands=dcf["cash_flow_bands"].to_dict("list"))
+    driftsresultat = result["driftsresultat"]
+    value_df.attrs = {"ebitda": float(result["ebitda"]),
+                      "driftsresultat": None if driftsresultat is None else float(driftsresultat),
+                      "financials": result["financials"], "dcf": dcf}
+    return value_df
+
+
+def valuation_from_frame(value_df):
+    attrs = value_df.attrs
+    dcf = attrs["dcf"]
+    if dcf is not None:
+        dcf = dict(dcf, value_percentiles={int(p): v for p, v in dcf["value_percentiles"]},
+                   cash_flow_bands=pd.DataFrame(dcf["cash_flow_bands"]))
+    return {"ebitda": attrs["ebitda"], "value_df": value_df, "driftsresultat": attrs["driftsresultat"],
+            "financials": attrs["financials"], "dcf": dcf}
@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+
+# ----------------------------
+# Dato-indeksert rollup av salgsdata
+# ----------------------------
+# Salgsradene summeres per dag (flere butikker/rader samme dag slås sammen),
+# og dagsverdiene summeres videre per uke (mandag som ukestart) og per måned.
+# Hvert nivå har sorterte nøkler og kumulative summer, slik at et start/slutt-
+# intervall slås opp med binærsøk, og totalsummer er en differanse av to
+# prefikssummer i stedet for en gjennomgang av alle rader.
+
+LABELS = {"D": "Dato", "W": "Uke", "M": "YearMonth"}
+# Visningsnavn for verdikolonnene i frame() og totals()
+VALUE_LABELS = {"sales": "Omsetning", "antallordre": "Ant. ordre"}
+
+
+def _week_start(days):
+    # 1970-01-01 var en torsdag; +3 gir mandag = 0
+    weekday = (days.astype("int64") + 3) % 7
+    return days - weekday.astype("timedelta64[D]")
+
+
+def _bucket(keys, values):
+    # keys er sortert – like nøkler ligger etter hverandre
+    unique_keys, starts = np.unique(keys, return_index=True)
+    if len(keys) == 0:
+        return unique_keys, np.zeros((0, values.shape[1]))
+    return unique_keys, np.add.reduceat(values, starts, axis=0)
+
+
+def _to_key(value, freq):
+    key = np.datetime64(value)
+    if freq == "M":
+        return key.astype("datetime64[M]")
+    key = key.astype("datetime64[D]")
+    return _week_start(key) if freq == "W" else key
+
+
+class SalesRollup:
+    def __init__(self, sales_df, date_col="date", value_cols=("sales", "antallordre")):
+        self.value_cols = [col for col in value_cols if col in sales_df.columns]
+        self.value_labels = [VALUE_LABELS.get(col, col) for col in self.value_cols]
+        self.attrs = dict(sales_df.attrs)
+
+        days = pd.to_datetime(sales_df[date_col], errors="coerce").to_numpy("datetime64[D]")
+        values = sales_df[self.value_cols].to_numpy(dtype="float64", na_value=np.nan)
+        valid = ~np.isnat(days)
+        days, values = days[valid], np.nan_to_num(values[valid])
+        order = np.argsort(days, kind="stable")
+        days, values = days[order], values[order]
+
+        self.levels = {}
+        day_keys, day_values = _bucket(days, values)
+        self._add_level("D", day_keys, day_values)
+        self._add_level("W", *_bucket(_week_start(day_keys), day_values))
+        self._add_level("M", *_bucket(day_keys.astype("datetime64[M]"), day_values))
+
+    def _add_level(self, freq, keys, values):
+        prefix = np.zeros((len(keys) + 1, values.shape[1]))
+        np.cumsum(values, axis=0, out=prefix[1:])
+        self.levels[freq] = (keys, values, prefix)
+
+    def _bounds(self, start, end, freq):
+        keys = self.levels[freq][0]
+        lo = np.searchsorted(keys, _to_key(start, freq), side="left")
+        hi = np.searchsorted(keys, _to_key(end, freq), side="right")
+        return lo, max(lo, hi)
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for level in self.levels.values() for array in level)
+
+    @property
+    def first_date(self):
+        keys = self.levels["D"][0]
+        return keys[0].astype(object) if len(keys) else None
+
+    @property
+    def last_date(self):
+        keys = self.levels["D"][0]
+        return keys[-1].astype(object) if len(keys) else None
+
+    def totals(self, start, end, freq="D"):
+        # Sum for hele intervallet: differansen mellom to prefikssummer
+        lo, hi = self._bounds(start, end, freq)
+        prefix = self.levels[freq][2]
+        return pd.Series(prefix[hi] - prefix[lo], index=self.value_labels)
+
+    def frame(self, start, end, freq="D"):
+        # Bøttene i intervallet, hentet som et utsnitt av de sorterte arrayene
+        lo, hi = self._bounds(start, end, freq)
+        keys, values, _ = self.levels[freq]
+        if freq == "M":
+            labels = keys[lo:hi].astype(str)
+        else:
+            labels = keys[lo:hi].astype("datetime64[ns]")
+        df = pd.DataFrame(values[lo:hi], columns=self.value_labels)
+        df.insert(0, LABELS[freq], labels)
+        return df
+
+    def daily(self):
+        # Dagssummene med skjemanavnene; SalesRollup(rollup.daily()) gir samme rollup.
+        # Batchkjøringen lagrer denne, så appen slipper å lese salgsfilen.
+        keys, values, _ = self.levels["D"]
+        df = pd.DataFrame(values, columns=self.value_cols)
+        df.insert(0, "date", keys.astype("datetime64[ns]"))
+        df.attrs = dict(self.attrs)
+        return df
+
+    def merge(self, delta_df, date_col="date"):
+        # Ny rollup der dagene i delta_df erstatter eksisterende dager. Bare ukene og
+        # månedene som berøres summeres på nytt; prefikssummene bygges fra bøttene.
+        delta = SalesRollup(delta_df, date_col, self.value_cols)
+        delta_days = delta.levels["D"][0]
+        merged = SalesRollup.__new__(SalesRollup)
+        merged.value_cols = self.value_cols
+        merged.value_labels = self.value_labels
+        merged.attrs = self.attrs
+        merged.levels = {}
+
+        keys, values, _ = self.levels["D"]
+        keep = ~np.isin(keys, delta_days)
+        day_keys = np.concatenate([keys[keep], delta_days])
+        day_values = np.concatenate([values[keep], delta.levels["D"][1]])
+        order = np.argsort(day_keys, kind="stable")
+        day_keys, day_values = day_keys[order], day_values[order]
+        merged._add_level("D", day_keys, day_values)
+
+        for freq, to_bucket in (("W", _week_start), ("M", lambda days: days.astype("datetime64[M]"))):
+            affected = np.unique(to_bucket(delta_days))
+            day_buckets = to_bucket(day_keys)
+            in_affected = np.isin(day_buckets, affected)
+            new_keys, new_values = _bucket(day_buckets[in_affected], day_values[in_affected])
+            keys, values, _ = self.levels[freq]
+            keep = ~np.isin(keys, affected)
+            bucket_keys = np.concatenate([keys[keep], new_keys])
+            bucket_values = np.concatenate([values[keep], new_values])
+            order = np.argsort(bucket_keys, kind="stable")
+            merged._add_level(freq, bucket_keys[order], bucket_values[order])
+        return merged
@@ -0,0 +1,365 @@
+import csv
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+except ImportError:  # pyarrow følger med streamlit; uten den leses og renses filene med pandas
+    pa = None
+    pc = None
+    pa_csv = None
+
+# ----------------------------
+# Skjema for de standardiserte CSV-filene
+# ----------------------------
+# Hver kolonne har en deklarert type, og datoer har eksplisitte formater.
+# Typer: "date", "number" (tall med mellomrom som tusenskille, f.eks. " 13 715.00"),
+# "int", "percent" ("19.87%" -> 0.1987), "text" og "category" (tekst som gjentas
+# på mange rader, f.eks. SKU – lagres som kategori med én kopi per unike verdi).
+# Kolonner som ikke er deklarert beholdes som tekst.
+# Heltall lagres som int32 når verdiene får plass; summer regnes i int64 (widen_int).
+#
+# Med pyarrow leses hele filer som Arrow-strenger, og tallkolonnene renses og
+# tolkes med pyarrow.compute (C, ikke én Python-operasjon per verdi). Bare
+# tekst- og datokolonnene gjøres om til Python-strenger. Ugyldige verdier finnes
+# ved å sammenligne tomme celler før tolkingen med manglende verdier etter.
+
+SCHEMAS = {
+    "sales": {
+        "lowercase_headers": True,
+        "aliases": {"dato": "date", "omsetning": "sales", "antallsolgt": "antallordre"},
+        "date_formats": ("%Y-%m-%d", "%d.%m.%Y", "%m/%d/%y"),
+        "columns": {
+            "date": "date",
+            "xsales": "number",
+            "antallordre": "int",
+            "produkt": "int",
+            "sales": "number",
+            "invoiced": "number",
+            "refunded": "number",
+            "sales tax": "number",
+            "sales shipping": "number",
+            "sales discount": "number",
+            "canceled": "number",
+        },
+    },
+    "cost": {
+        "aliases": {"dato": "date"},
+        "date_formats": ("%Y", "%Y-%m", "%Y-%m-%d"),
+        "columns": {
+            "date": "date",
+            "varekostnad": "number",
+            "driftskostnader": "number",
+            "finansielle_kostnader": "number",
+            "lønnskostnad": "number",
+            "totale_kostnader": "number",
+            "driftsresultat": "number",
+        },
+    },
+    "traffic": {
+        "aliases": {"dato": "date"},
+        "date_formats": ("%Y-%m-%d", "%Y-%m"),
+        "columns": {
+            "date": "date",
+            "søkeord": "category",
+            "konverteringer": "int",
+            "antallvisninger": "int",
+            "clicks": "percent",
+            "plassering": "number",
+        },
+    },
+    "product_sales": {
+        "aliases": {"dato": "date", "Produktnavn": "product_name", "SKU": "sku"},
+        "date_formats": ("%m/%d/%y", "%Y-%m-%d", "%d.%m.%Y"),
+        "columns": {
+            "date": "date",
+            "product_name": "category",
+            "sku": "category",
+            "antallsolgt": "int",
+        },
+    },
+    "prices": {
+        "columns": {
+            "Produkt": "text",
+            "Pris": "number",
+        },
+    },
+    "product_prices": {
+        "aliases": {
+            "vår utpris (med mva)": "utpris",
+            "inntekt (etter avsatt mva) pr produkt før skatt": "inntekt",
+            "prosentvis inntekt av salgspris før mva og skatt": "inntekt_prosent",
+        },
+        "columns": {
+            "product_name": "text",
+            "sku": "text",
+            "innkjøpspris": "number",
+            "utpris": "number",
+            "salgspris_uten_mva": "number",
+            "inntekt": "number",
+            "inntekt_prosent": "number",
+        },
+    },
+}
+
+# Antall avviste verdier som tas med i rapporten (totalen telles alltid)
+MAX_REPORTED_ISSUES = 200
+
+# Mellomrom, hardt mellomrom og smalt hardt mellomrom brukes som tusenskille
+_GROUPING_CHARS = r"[\s  ]"
+# For pyarrow: vanlig erstatning av de vanlige tegnene er flere ganger raskere enn
+# regex; regexen brukes bare når det er annet mellomrom igjen (tab, linjeskift)
+_GROUPING_SEPARATORS = (" ", "\u00a0", "\u202f")
+
+
+# Et tall etter at tusenskille er fjernet; alt annet er en avvist verdi
+_NUMBER_RE = r"^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$"
+_INTEGER_RE = r"^[+-]?\d+$"
+
+
+def _clean_numeric_text(raw):
+    return raw.str.replace(_GROUPING_CHARS, "", regex=True).str.replace("−", "-", regex=False)
+
+
+def _number_text(raw):
+    # Tallkolonnen som strippet tekst: en Arrow-streng med pyarrow, ellers en pandas-serie
+    if pc is None:
+        return raw.str.strip()
+    if isinstance(raw, pd.Series):
+        raw = pa.array(raw.to_numpy(dtype=object), type=pa.string())
+    return pc.utf8_trim_whitespace(raw)
+
+
+def _is_filled(text):
+    if pc is None:
+        return (text != "").to_numpy()
+    return pc.not_equal(text, "").to_numpy(zero_copy_only=False)
+
+
+def _text_value(text, pos):
+    return text.iat[pos] if pc is None else text[pos].as_py()
+
+
+def _parse_number(text):
+    # Som pd.to_numeric(errors="coerce"): int64 når alle verdiene er heltall, ellers float64
+    if pc is None:
+        return pd.to_numeric(_clean_numeric_text(text), errors="coerce").to_numpy()
+    if not len(text):
+        return np.zeros(0, dtype="int64")
+    cleaned = text
+    for separator in _GROUPING_SEPARATORS:
+        cleaned = pc.replace_substring(cleaned, separator, "")
+    if pc.any(pc.match_substring_regex(cleaned, r"\s")).as_py():
+        cleaned = pc.replace_substring_regex(cleaned, _GROUPING_CHARS, "")
+    cleaned = pc.replace_substring(cleaned, "−", "-")
+    # Heltallssjekken (regex) kjøres bare når ingen verdier har desimalpunktum
+    if (not pc.any(pc.match_substring(cleaned, ".")).as_py()
+            and pc.all(pc.match_substring_regex(cleaned, _INTEGER_RE)).as_py()):
+        try:
+            return pc.cast(cleaned, pa.int64()).to_numpy(zero_copy_only=False)
+        except pa.ArrowInvalid:
+            pass  # for store for int64; tolkes som flyttall som i pandas
+    numbers = pc.if_else(pc.match_substring_regex(cleaned, _NUMBER_RE), cleaned, None)
+    return pc.cast(numbers, pa.float64()).to_numpy(zero_copy_only=False)
+
+
+_INT32 = np.iinfo("int32")
+
+
+def _downcast_int(values):
+    # values er en serie eller et numpy-array
+    if values.dtype == "int64" and len(values) and _INT32.min <= values.min() and values.max() <= _INT32.max:
+        return values.astype("int32")
+    return values
+
+
+def widen_int(values):
+    # Før summering: smale heltall kan ellers flyte over i groupby-summer
+    if pd.api.types.is_integer_dtype(values.dtype):
+        return values.astype("int64")
+    return values
+
+
+def _parse_int(text):
+    values = _parse_number(text)
+    if values.dtype.kind == "f" and (np.isnan(values).any() or (values % 1 != 0).any()):
+        return values
+    return _downcast_int(values.astype("int64"))
+
+
+def _parse_percent(text):
+    text = text.str.rstrip("%") if pc is None else pc.utf8_rtrim(text, characters="%")
+    return _parse_number(text) / 100.0
+
+
+def _parse_date(raw, formats):
+    parsed = pd.to_datetime(raw, format=formats[0], errors="coerce")
+    for fmt in formats[1:]:
+        # Kun rader som ikke traff forrige format prøves med neste
+        remaining = parsed.isna() & (raw != "")
+        if not remaining.any():
+            break
+        parsed.loc[remaining] = pd.to_datetime(raw[remaining], format=fmt, errors="coerce")
+    return parsed
+
+
+def _parse_text(text):
+    # text er allerede strippet
+    return text.where(text != "")
+
+
+def _read_raw(buffer, chunksize=None):
+    if chunksize is None and pa_csv is not None and not isinstance(buffer, io.TextIOBase):
+        table = _read_arrow(buffer)
+        if table is not None:
+            return table
+    return pd.read_csv(buffer, dtype=str, keep_default_na=False, na_filter=False, chunksize=chunksize)
+
+
+def _header_names(line):
+    # Overskriftene som pandas gir dem: like navn får .1, .2 osv.
+    names = []
+    for name in next(csv.reader([line]), []):
+        candidate, n = name, 0
+        while candidate in names:
+            n += 1
+            candidate = f"{name}.{n}"
+        names.append(candidate)
+    return names
+
+
+def _read_arrow(buffer):
+    # Hele filen som en Arrow-tabell med alle kolonnene som tekst (tomme celler er ""),
+    # eller None når pyarrow ikke kan lese den; da leser pandas filen som før
+    if isinstance(buffer, (str, bytes, os.PathLike)):
+        with open(buffer, "rb") as f:
+            data = f.read()
+    else:
+        start = buffer.tell()
+        data = buffer.read()
+        buffer.seek(start)
+    header = data.split(b"\n", 1)[0].decode("utf-8-sig", errors="replace").rstrip("\r")
+    names = _header_names(header)
+    if not names:
+        return None
+    try:
+        return pa_csv.read_csv(
+            pa.py_buffer(data),
+            read_options=pa_csv.ReadOptions(column_names=names, skip_rows=1),
+            convert_options=pa_csv.ConvertOptions(column_types={name: pa.string() for name in names},
+                                                  strings_can_be_null=False, quoted_strings_can_be_null=False),
+        )
+    except pa.ArrowInvalid:
+        return None
+
+
+def _raw_columns(raw):
+    # (navn, kolonne) fra en Arrow-tabell eller en DataFrame med tekst
+    if isinstance(raw, pd.DataFrame):
+        return raw.index, list(raw.items())
+    return pd.RangeIndex(raw.num_rows), list(zip(raw.column_names, raw.columns))
+
+
+def _stripped(raw, index):
+    # Strippet tekst som pandas-serie; Arrow-kolonner strippes før de blir Python-strenger
+    if isinstance(raw, pd.Series):
+        return raw.str.strip()
+    return pd.Series(pc.utf8_trim_whitespace(raw).to_pandas(), index=index)
+
+
+def _parse_frame(raw_df, schema, first_row=0):
+    # first_row: posisjonen til første rad i filen, slik at linjenumrene stemmer for biter
+    index, raw_columns = _raw_columns(raw_df)
+    columns = pd.Index([name for name, _ in raw_columns]).str.strip()
+    if schema.get("lowercase_headers"):
+        columns = columns.str.lower()
+    aliases = schema.get("aliases", {})
+    columns = [aliases.get(col, col) for col in columns]
+
+    date_formats = schema.get("date_formats", ("%Y-%m-%d",))
+    issues = []
+    issue_count = 0
+    parsed = {}
+    for col, (_, raw) in zip(columns, raw_columns):
+        kind = schema["columns"].get(col, "text")
+        if kind == "text":
+            parsed[col] = _parse_text(_stripped(raw, index))
+            continue
+        if kind == "category":
+            parsed[col] = _parse_text(_stripped(raw, index)).astype("category")
+            continue
+        if kind == "date":
+            text = _stripped(raw, index)
+            values = _parse_date(text, date_formats)
+            filled = (text != "").to_numpy()
+        else:
+            text = _number_text(raw)
+            if kind == "int":
+                values = pd.Series(_parse_int(text), index=index)
+            elif kind == "percent":
+                values = pd.Series(_parse_percent(text), index=index)
+            else:
+                values = pd.Series(_parse_number(text), index=index)
+            filled = _is_filled(text)
+        parsed[col] = values
+
+        # Tomme celler er lov – kun ikke-tomme verdier som ikke kunne tolkes rapporteres
+        bad = np.flatnonzero(filled & values.isna().to_numpy())
+        issue_count += len(bad)
+        for pos in bad[:max(0, MAX_REPORTED_ISSUES - len(issues))]:
+            # +2: overskriftslinjen og 1-basert linjenummer i filen
+            issues.append({"row": first_row + int(pos) + 2, "column": col,
+                           "value": text.iat[pos] if kind == "date" else _text_value(text, pos)})
+
+    df = pd.DataFrame(parsed, index=index)
+    df.attrs["parse_issues"] = {"count": issue_count, "rows": issues}
+    return df
+
+
+def parse_csv(buffer, schema_name):
+    schema = SCHEMAS[schema_name]
+    return _parse_frame(_read_raw(buffer), schema)
+
+
+def iter_parse_csv(buffer, schema_name, chunksize):
+    # Leser og tolker filen i biter på chunksize rader; hver bit har sin egen avviksrapport
+    schema = SCHEMAS[schema_name]
+    first_row = 0
+    for raw_df in _read_raw(buffer, chunksize):
+        chunk = _parse_frame(raw_df, schema, first_row)
+        chunk.index = pd.RangeIndex(first_row, first_row + len(chunk))
+        first_row += len(chunk)
+        yield chunk
+
+
+def compact_frame(df, schema_name):
+    # For rammer som er satt sammen av flere deler (concat gir tekst i stedet for
+    # kategori når delene har ulike kategorier)
+    df = df.copy(deep=False)
+    for col, kind in SCHEMAS[schema_name]["columns"].items():
+        if col not in df.columns:
+            continue
+        if kind == "category" and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+        elif kind == "int":
+            df[col] = _downcast_int(df[col])
+    return df
+
+
+def merge_issue_reports(reports):
+    issue_count = 0
+    issues = []
+    for report in reports:
+        issue_count += report["count"]
+        issues.extend(report["rows"][:max(0, MAX_REPORTED_ISSUES - len(issues))])
+    return {"count": issue_count, "rows": issues}
+
+
+def parse_issues(df):
+    report = df.attrs.get("parse_issues") or {"count": 0, "rows": []}
+    return report["count"], pd.DataFrame(report["rows"], columns=["row", "column", "value"])
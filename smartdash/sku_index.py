@@ -0,0 +1,162 @@
+import re
+import threading
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+# ----------------------------
+# Søkeindeks for SKU-filteret i lagerinnsikten
+# ----------------------------
+# Alle distinkte sku- og product_name-verdier deles i ord én gang ved innlasting.
+# Ord og ordpar (bigram) peker til tekstene de finnes i, og hver tekst peker til
+# SKU-kodene sine. Et filter som "40 cm" eller "Clip On" blir dermed et oppslag
+# og en snittmengde, og SKU-kodene gir radposisjonene direkte uten å skanne strenger.
+
+_WORD_RE = re.compile(r"[^\W_]+")
+# "40cm" -> "40", "cm" slik at "40 cm" og "40cm" gir samme treff
+_DIGIT_SPLIT_RE = re.compile(r"(?<=\d)(?=[^\W\d_])|(?<=[^\W\d_])(?=\d)")
+
+
+def tokenize(text):
+    tokens = []
+    for word in _WORD_RE.findall(str(text).lower()):
+        tokens.extend(_DIGIT_SPLIT_RE.split(word))
+    return tokens
+
+
+def _contains_phrase(tokens, phrase):
+    n = len(phrase)
+    return any(tokens[i:i + n] == phrase for i in range(len(tokens) - n + 1))
+
+
+class SkuIndex:
+    def __init__(self, df, sku_col="sku", name_col="product_name"):
+        self._sku_col = sku_col
+        self._name_col = name_col
+        self.skus = pd.Index([], dtype=object)
+        self._text_ids = {}
+        self._text_tokens = []
+        self._text_skus = []
+        self._postings = {}
+        self._index(df)
+
+    def merge(self, df):
+        # Indeks for df (hele datasettet etter en delta). SKU-ene beholder kodene sine og
+        # tekstene som allerede er delt i ord gjenbrukes, så bare nye SKU-er og produktnavn
+        # deles i ord. Radposisjonene bygges på nytt for df.
+        merged = SkuIndex.__new__(SkuIndex)
+        merged._sku_col = self._sku_col
+        merged._name_col = self._name_col
+        merged.skus = self.skus
+        merged._text_ids = dict(self._text_ids)
+        merged._text_tokens = list(self._text_tokens)
+        merged._text_skus = list(self._text_skus)
+        merged._postings = dict(self._postings)
+        merged._index(df)
+        return merged
+
+    def _add_text(self, key, text, sku_codes, postings):
+        text_id = len(self._text_tokens)
+        self._text_ids[key] = text_id
+        tokens = tokenize(text)
+        self._text_tokens.append(tokens)
+        self._text_skus.append(sku_codes)
+        for token in tokens:
+            postings[token].add(text_id)
+        for pair in zip(tokens, tokens[1:]):
+            postings[pair].add(text_id)
+
+    def _index(self, df):
+        codes, uniques = pd.factorize(df[self._sku_col])
+        uniques = pd.Index(np.asarray(uniques, dtype=object))
+        new_skus = uniques[~uniques.isin(self.skus)]
+        first_new = len(self.skus)
+        self.skus = self.skus.append(new_skus)
+        n_skus = len(self.skus)
+        mapping = self.skus.get_indexer(uniques)
+        sku_codes = np.where(codes >= 0, mapping[np.maximum(codes, 0)], -1) if len(mapping) else codes
+
+        # Radposisjoner gruppert per SKU-kode (CSR): rader for kode k ligger i
+        # self._rows[self._offsets[k]:self._offsets[k + 1]]
+        order = np.argsort(sku_codes, kind="stable")
+        order = order[sku_codes[order] >= 0]
+        self._rows = order
+        self._offsets = np.searchsorted(sku_codes[order], np.arange(n_skus + 1))
+
+        # Nye ord samles for seg og slås inn til slutt; mengdene i postingene deles med
+        # indeksen det ble flettet fra og endres ikke
+        postings = defaultdict(set)
+        for code, sku in enumerate(new_skus, start=first_new):
+            self._add_text(("sku", sku), str(sku), np.array([code]), postings)
+        if self._name_col in df.columns:
+            name_codes, names = pd.factorize(df[self._name_col])
+            valid = (name_codes >= 0) & (sku_codes >= 0)
+            pairs = np.unique(name_codes[valid].astype("int64") * max(n_skus, 1) + sku_codes[valid])
+            pair_names, pair_skus = np.divmod(pairs, max(n_skus, 1))
+            bounds = np.searchsorted(pair_names, np.arange(len(names) + 1))
+            # Navn som ikke lenger finnes i df peker ikke til noen SKU-er
+            for key, text_id in self._text_ids.items():
+                if key[0] == "name":
+                    self._text_skus[text_id] = np.array([], dtype="int64")
+            for name_code, name in enumerate(names):
+                name_skus = pair_skus[bounds[name_code]:bounds[name_code + 1]]
+                text_id = self._text_ids.get(("name", name))
+                if text_id is None:
+                    self._add_text(("name", name), str(name), name_skus, postings)
+                else:
+                    self._text_skus[text_id] = name_skus
+        for key, text_ids in postings.items():
+            existing = self._postings.get(key)
+            self._postings[key] = text_ids if existing is None else existing | text_ids
+        # Delt mellom sesjonstrådene; låsen gjør oppslag, innsetting og tømming atomisk
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        # Omtrentlig: arrayene, og ca. 100 byte per ord, oppslag og tekst-ID i postingene
+        postings = sum(len(ids) for ids in self._postings.values()) + len(self._postings)
+        tokens = sum(len(tokens) for tokens in self._text_tokens)
+        return (self._rows.nbytes + self._offsets.nbytes + sum(codes.nbytes for codes in self._text_skus)
+                + 100 * (postings + tokens + len(self.skus)))
+
+    def sku_codes(self, query):
+        # None betyr tomt filter (alle SKU-er)
+        phrase = tokenize(query)
+        if not phrase:
+            return None
+        key = tuple(phrase)
+        with self._cache_lock:
+            cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        keys = phrase if len(phrase) == 1 else list(zip(phrase, phrase[1:]))
+        postings = sorted((self._postings.get(k, set()) for k in keys), key=len)
+        candidates = set.intersection(*postings)
+        if len(phrase) > 2:
+            # Ordparene må også ligge etter hverandre i samme tekst
+            candidates = {t for t in candidates if _contains_phrase(self._text_tokens[t], phrase)}
+        if candidates:
+            codes = np.unique(np.concatenate([self._text_skus[t] for t in candidates]))
+        else:
+            codes = np.array([], dtype="int64")
+        with self._cache_lock:
+            if len(self._cache) > 256:
+                self._cache.clear()
+            self._cache[key] = codes
+        return codes
+
+    def matching_skus(self, query):
+        codes = self.sku_codes(query)
+        return self.skus if codes is None else self.skus[codes]
+
+    def row_positions(self, query):
+        codes = self.sku_codes(query)
+        if codes is None:
+            return None
+        if len(codes) == 0:
+            return np.array([], dtype="int64")
+        rows = np.concatenate([self._rows[self._offsets[c]:self._offsets[c + 1]] for c in codes])
+        rows.sort()
+        return rows
@@ -0,0 +1,172 @@
+import hashlib
+import os
+import tempfile
+from io import BytesIO
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+except ImportError:  # pyarrow følger med streamlit, men vi klarer oss uten
+    pa = None
+    pa_ipc = None
+
+# ----------------------------
+# Snapshot-cache for innleste CSV-filer
+# ----------------------------
+# Hver ferdig parset og normalisert DataFrame lagres som en ukomprimert
+# Arrow IPC-fil på lokal disk, med navn etter en hash av filinnholdet.
+# Ved ny prosess eller ny sesjon blir snapshotet minnemappet i stedet for
+# at CSV-filen parses på nytt.
+#
+# Tallkolonner uten manglende verdier leses uten kopiering: DataFrame-kolonnene
+# peker rett inn i den minnemappede filen (skrivebeskyttet). Sidene ligger i
+# operativsystemets filcache og deles av alle prosesser på maskinen – Streamlit-
+# prosesser, innlesingsprosesser og batchjobber – så et datasett tar minne én
+# gang per maskin. Også første innlesing returnerer den minnemappede utgaven.
+# Kolonner med manglende datoer og tekst som ikke er kategorier må fortsatt kopieres.
+
+CACHE_DIR = os.environ.get(
+    "SMARTDASH_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".smartdash_cache"),
+)
+
+# Økes når parse-logikken endres, slik at gamle snapshots ikke gjenbrukes
+SNAPSHOT_VERSION = "7"
+
+# (sti, mtime, størrelse) -> hash, så standardfilene ikke hashes på hver rerun
+_path_hashes = {}
+# (file_id, størrelse) -> hash for Streamlit-opplastinger; en opplasting endres aldri,
+# og uten dette hashes hele filen for hvert cache-oppslag i hver rerun
+_upload_hashes = {}
+MAX_UPLOAD_HASHES = 256
+
+
+def read_source_bytes(source):
+    # Godtar filsti, Streamlit UploadedFile eller filobjekt
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            return f.read()
+    if hasattr(source, "getvalue"):
+        return source.getvalue()
+    data = source.read()
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return data
+
+
+def content_hash(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _file_hash(path, block_size=1 << 20):
+    # Leser filen blokkvis, så store filer ikke må ligge helt i minnet for å hashes
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_size(source):
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    if hasattr(source, "size"):
+        return source.size
+    return len(read_source_bytes(source))
+
+
+def open_source(source):
+    # Filstier åpnes direkte (strømmes fra disk); opplastinger ligger allerede i minnet
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, "rb")
+    return BytesIO(read_source_bytes(source))
+
+
+def source_hash(source):
+    if isinstance(source, (str, os.PathLike)):
+        path = os.path.abspath(source)
+        st_ = os.stat(path)
+        stamp = (path, st_.st_mtime_ns, st_.st_size)
+        cached = _path_hashes.get(stamp)
+        if cached is None:
+            cached = _file_hash(path)
+            _path_hashes[stamp] = cached
+        return cached
+    file_id = getattr(source, "file_id", None)
+    if file_id is None:
+        return content_hash(read_source_bytes(source))
+    stamp = (file_id, source_size(source))
+    cached = _upload_hashes.get(stamp)
+    if cached is None:
+        cached = content_hash(read_source_bytes(source))
+        if len(_upload_hashes) >= MAX_UPLOAD_HASHES:
+            # Eldste først (dict beholder innsettingsrekkefølgen)
+            _upload_hashes.pop(next(iter(_upload_hashes)), None)
+        _upload_hashes[stamp] = cached
+    return cached
+
+
+def snapshot_path(kind, digest):
+    return os.path.join(CACHE_DIR, f"{kind}-v{SNAPSHOT_VERSION}-{digest}.arrow")
+
+
+def read_snapshot(path):
+    if pa is None or not os.path.exists(path):
+        return None
+    try:
+        with pa.memory_map(path, "r") as source:
+            table = pa_ipc.open_file(source).read_all()
+        # split_blocks gir én blokk per kolonne, så kolonnene kan være visninger inn i filen
+        # (bufferne holder minnemappingen åpen etter at filen er lukket)
+        return table.to_pandas(split_blocks=True)
+    except (OSError, pa.ArrowInvalid):
+        return None
+
+
+def temp_path_for(path):
+    # Unik midlertidig fil i samme katalog (samme filsystem, så os.replace er atomisk).
+    # Sesjonene er tråder i samme prosess, så prosess-ID alene er ikke unik nok.
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp",
+                                    dir=os.path.dirname(path) or ".")
+    os.close(fd)
+    return tmp_path
+
+
+def write_snapshot(path, df):
+    if pa is None:
+        return False
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, ValueError):
+        # Kolonner med blandede typer kan ikke lagres kolonnevis – hopp over cachen
+        return False
+    tmp_path = None
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = temp_path_for(path)
+        with pa.OSFile(tmp_path, "wb") as sink:
+            with pa_ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+    except OSError:
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+    return True
+
+
+def load_with_snapshot(source, parse, kind):
+    # parse() får et binært filobjekt og returnerer en ferdig normalisert DataFrame
+    digest = source_hash(source)
+    path = snapshot_path(kind, digest)
+    df = read_snapshot(path)
+    if df is not None:
+        return df
+    with open_source(source) as buffer:
+        df = parse(buffer)
+    if write_snapshot(path, df):
+        # Den parsede rammen byttes mot den minnemappede, som deles med andre prosesser
+        mapped = read_snapshot(path)
+        if mapped is not None:
+            return mapped
+    return df
@@ -0,0 +1,57 @@
+import pandas as pd
+
+from smartdash.schemas import compact_frame, iter_parse_csv, merge_issue_reports, widen_int
+
+# ----------------------------
+# Strømmet innlesing av store produktsalgsfiler
+# ----------------------------
+# Filen leses i biter, og hver bit foldes straks inn i summer per dag og SKU –
+# den eneste granulariteten fanene bruker. Bare summene holdes i minnet, så
+# minnebruken følger antall (dag, SKU)-par og ikke antall ordrelinjer.
+
+CHUNK_ROWS = 100_000
+# Delresultatene slås sammen når de til sammen passerer dette antallet rader
+COMPACT_ROWS = 500_000
+
+KEYS = ["date", "sku"]
+
+
+def _combine(parts):
+    df = pd.concat(parts, ignore_index=True)
+    df["antallsolgt"] = widen_int(df["antallsolgt"])
+    return df.groupby(KEYS, as_index=False, sort=False, observed=True).agg(
+        product_name=("product_name", "first"),
+        antallsolgt=("antallsolgt", "sum"),
+    )
+
+
+def aggregate_product_sales(buffer, chunksize=CHUNK_ROWS):
+    parts = []
+    part_rows = 0
+    reports = []
+    last_date = pd.NaT
+    for chunk in iter_parse_csv(buffer, "product_sales", chunksize):
+        reports.append(chunk.attrs["parse_issues"])
+        # Bare første linje i en ordre har dato – datoen føres videre, også over bitgrenser
+        dates = chunk["date"].ffill()
+        if pd.notna(last_date):
+            dates = dates.fillna(last_date)
+        if dates.notna().any():
+            last_date = dates.iloc[-1]
+        chunk = chunk.assign(date=dates).dropna(subset=KEYS)
+        if chunk.empty:
+            continue
+        parts.append(_combine([chunk[["date", "sku", "product_name", "antallsolgt"]]]))
+        part_rows += len(parts[-1])
+        if part_rows > COMPACT_ROWS:
+            parts = [_combine(parts)]
+            part_rows = len(parts[0])
+
+    if parts:
+        df = _combine(parts).sort_values(KEYS, kind="stable").reset_index(drop=True)
+    else:
+        df = pd.DataFrame({"date": pd.Series(dtype="datetime64[ns]"), "sku": pd.Series(dtype=object),
+                           "product_name": pd.Series(dtype=object), "antallsolgt": pd.Series(dtype="float64")})
+    df = compact_frame(df[["date", "product_name", "sku", "antallsolgt"]], "product_sales")
+    df.attrs["parse_issues"] = merge_issue_reports(reports)
+    return df
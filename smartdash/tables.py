@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+
+from smartdash.sku_index import _contains_phrase, tokenize
+
+# ----------------------------
+# Sidedelte tabeller
+# ----------------------------
+# Søk, sortering og sidedeling gjøres på serveren, og bare radene på den synlige
+# siden sendes til nettleseren. Søket bruker samme ordsplitting som SKU-filteret
+# ("40 cm" treffer "40cm") og tolker hver distinkte tekstverdi én gang, så
+# kategorikolonner med hundretusener av rader sjekkes via kategoriene. Sorteringen
+# finner bare radene til og med valgt side (argpartition) når siden ligger langt
+# framme, i stedet for å sortere hele tabellen.
+
+PAGE_SIZE = 20
+# Over denne andelen av radene sorteres alt; ellers bare radene fram til siden
+PARTIAL_SORT_SHARE = 0.25
+
+
+def _text_codes(column):
+    # (kode per rad, distinkte verdier); -1 for manglende verdier
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.cat.codes.to_numpy(), column.cat.categories
+    return pd.factorize(column)
+
+
+def filter_rows(df, query):
+    # Radposisjoner der ordene i query står etter hverandre i minst én tekstkolonne; None = alle
+    phrase = tokenize(query)
+    if not phrase:
+        return None
+    mask = np.zeros(len(df), dtype=bool)
+    for col in df.columns:
+        column = df[col]
+        if not (isinstance(column.dtype, pd.CategoricalDtype) or column.dtype == object
+                or pd.api.types.is_string_dtype(column.dtype)):
+            continue
+        codes, values = _text_codes(column)
+        hits = np.fromiter((_contains_phrase(tokenize(value), phrase) for value in values),
+                           dtype=bool, count=len(values))
+        if hits.any():
+            mask |= (codes >= 0) & hits[np.maximum(codes, 0)]
+    return np.flatnonzero(mask)
+
+
+def _sort_keys(column):
+    # Tallverdier å sortere på; tekst sorteres etter rangen til de distinkte verdiene
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        codes = column.cat.codes.to_numpy()
+        categories = column.cat.categories
+        if column.cat.ordered:
+            ranks = np.arange(len(categories))
+        else:
+            ranks = np.argsort(np.argsort(categories.astype(str), kind="stable"))
+        keys = ranks[np.maximum(codes, 0)].astype("float64")
+        keys[codes < 0] = np.nan
+        return keys
+    if column.dtype == object or pd.api.types.is_string_dtype(column.dtype):
+        codes, _ = pd.factorize(column.astype(str).where(column.notna()), sort=True)
+        keys = codes.astype("float64")
+        keys[codes < 0] = np.nan
+        return keys
+    if pd.api.types.is_datetime64_any_dtype(column.dtype):
+        keys = column.to_numpy(dtype="datetime64[ns]").astype("int64").astype("float64")
+        keys[column.isna().to_numpy()] = np.nan
+        return keys
+    return pd.to_numeric(column, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+
+
+def table_page(df, query="", sort_by=None, descending=False, page=1, page_size=PAGE_SIZE):
+    # Én side av df etter søk og sortering: (rader på siden, antall treff, antall sider)
+    positions = filter_rows(df, query)
+    if positions is None:
+        positions = np.arange(len(df))
+    total = len(positions)
+    n_pages = max(-(-total // page_size), 1)
+    page = min(max(int(page), 1), n_pages)
+    start, end = (page - 1) * page_size, min(page * page_size, total)
+
+    if sort_by is not None and sort_by in df.columns and total:
+        keys = _sort_keys(df[sort_by])[positions]
+        # Manglende verdier havner sist uansett retning
+        keys = np.where(np.isnan(keys), np.inf, -keys if descending else keys)
+        if end < total * PARTIAL_SORT_SHARE:
+            # Alle rader med verdi til og med den end-te minste, så like verdier
+            # ordnes etter radposisjon som i den fullstendige sorteringen
+            kth = keys[np.argpartition(keys, end - 1)[end - 1]]
+            head = np.flatnonzero(keys <= kth)
+            order = head[np.lexsort((head, keys[head]))][:end]
+        else:
+            order = np.lexsort((np.arange(total), keys))
+        positions = positions[order]
+    return df.iloc[positions[start:end]], total, n_pages
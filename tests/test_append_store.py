@@ -0,0 +1,126 @@
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from smartdash.append_store import AppendStore
+from smartdash.day_groups import DayGroupIndex, daily_day_groups
+from smartdash.keywords import KeywordStats
+from smartdash.reports import normalize_sales
+from smartdash.rollups import SalesRollup
+from smartdash.sku_index import SkuIndex
+
+
+def csv(text):
+    return BytesIO(text.encode("utf-8"))
+
+
+SALES = """date,antallordre,sales
+2024-01-01,2, 1 000.00
+2024-01-01,1, 500.00
+2024-01-02,3, 2 000.00
+2024-02-01,1, 100.00
+"""
+
+PRODUCT_SALES = """date,product_name,sku,antallsolgt
+2024-01-01,Clip On Virgin 40 cm,CO-40,1
+,Tape Extensions 50 cm,TE-50,2
+2024-01-02,Clip On Virgin 40 cm,CO-40,1
+,Keratin Behandling,KB-1,1
+2024-02-01,Tape Extensions 50 cm,TE-50,4
+"""
+
+PRODUCT_DELTA = """date,product_name,sku,antallsolgt
+2024-01-02,Clip On Virgin 40 cm,CO-40,5
+2024-03-01,Parykk Virgin 60 cm,PA-60,1
+,Clip On Virgin 40 cm,CO-40,2
+"""
+
+TRAFFIC = """date,søkeord,konverteringer,antallvisninger,clicks,plassering
+2024-01-01,hair extensions,10,1000,5.00%,2.5
+,clip on,4,400,2.00%,
+2024-02-01,hair extensions,5,500,4.00%,3.0
+"""
+
+TRAFFIC_DELTA = """date,søkeord,konverteringer,antallvisninger,clicks,plassering
+2024-02-01,hair extensions,8,800,6.00%,1.5
+,parykk,1,50,1.00%,9.0
+"""
+
+
+def test_sales_rows_are_summed_per_day(tmp_path):
+    store = AppendStore("sales", root=str(tmp_path))
+    store.append_source(csv(SALES))
+    sales = store.read().set_index("date")["sales"]
+    assert sales[pd.Timestamp("2024-01-01")] == 1500.0
+    assert len(sales) == 3
+
+
+def test_same_file_is_applied_once(tmp_path):
+    store = AppendStore("sales", root=str(tmp_path))
+    assert store.append_source(csv(SALES)) is not None
+    version = store.version
+    assert store.append_source(csv(SALES)) is None
+    assert store.version == version
+
+
+def test_delta_replaces_days_and_returns_replaced_rows(tmp_path):
+    store = AppendStore("sales", root=str(tmp_path))
+    store.append_source(csv(SALES))
+    rollup = SalesRollup(normalize_sales(store.read()))
+    delta, replaced = store.append_source(csv("date,antallordre,sales\n2024-01-02,1, 50.00\n2024-03-01,1, 10.00\n"))
+    assert replaced["sales"].tolist() == [2000.0]
+    merged = rollup.merge(normalize_sales(delta))
+    rebuilt = SalesRollup(normalize_sales(store.read()))
+    for freq in ("D", "W", "M"):
+        pd.testing.assert_frame_equal(merged.frame(merged.first_date, merged.last_date, freq),
+                                      rebuilt.frame(rebuilt.first_date, rebuilt.last_date, freq))
+
+
+def test_undated_delta_is_rejected(tmp_path):
+    store = AppendStore("traffic", root=str(tmp_path))
+    # Grunnlaget i et tomt lager kan være uten dato
+    store.append_source(csv(TRAFFIC.replace("2024-01-01", "").replace("2024-02-01", "")))
+    version = store.version
+    with pytest.raises(ValueError):
+        store.append_source(csv("date,søkeord,antallvisninger\n,clip on,10\n"))
+    assert store.version == version
+
+
+def test_sku_and_day_group_indexes_merge_like_a_rebuild(tmp_path):
+    store = AppendStore("product_sales", root=str(tmp_path))
+    store.append_source(csv(PRODUCT_SALES))
+    sku_index = SkuIndex(store.read())
+    day_index = DayGroupIndex(daily_day_groups(store.read()))
+    delta, _ = store.append_source(csv(PRODUCT_DELTA))
+    df = store.read()
+
+    merged = sku_index.merge(df)
+    rebuilt = SkuIndex(df)
+    for query in ("40 cm", "virgin", "parykk", "te 50", "finnes ikke"):
+        assert np.array_equal(merged.row_positions(query), rebuilt.row_positions(query))
+    # Indeksen det ble flettet fra er uendret
+    assert len(sku_index.row_positions("parykk")) == 0
+
+    merged_days = day_index.merge(df, delta)
+    rebuilt_days = DayGroupIndex(daily_day_groups(df))
+    assert np.array_equal(merged_days.dates, rebuilt_days.dates)
+    assert np.array_equal(merged_days.lines, rebuilt_days.lines)
+    assert np.array_equal(merged_days.items, rebuilt_days.items)
+    rows = rebuilt.row_positions("clip on")
+    pd.testing.assert_frame_equal(
+        merged_days.sold_same_day(rows, "2024-01-01", "2024-12-31").sort_values("sku", ignore_index=True),
+        rebuilt_days.sold_same_day(rows, "2024-01-01", "2024-12-31").sort_values("sku", ignore_index=True))
+
+
+def test_keyword_stats_merge_like_a_rebuild(tmp_path):
+    store = AppendStore("traffic", root=str(tmp_path))
+    store.append_source(csv(TRAFFIC))
+    stats = KeywordStats(store.read())
+    delta, replaced = store.append_source(csv(TRAFFIC_DELTA))
+    merged = stats.merge(delta, replaced)
+    rebuilt = KeywordStats(store.read())
+    columns = ["søkeord", "antallvisninger", "konverteringer", "klikkrate", "plassering"]
+    pd.testing.assert_frame_equal(merged.top(10)[columns].sort_values("søkeord", ignore_index=True),
+                                  rebuilt.top(10)[columns].sort_values("søkeord", ignore_index=True))
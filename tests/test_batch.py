@@ -0,0 +1,57 @@
+import os
+import shutil
+
+import pandas as pd
+
+from smartdash import reports
+from smartdash.batch import DATA_FILES, DEFAULT_PARAMS, load_report, precompute_tenant
+from smartdash.rollups import SalesRollup
+from smartdash.valuation import default_growth_pct, derive_financials
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_tenant(tmp_path):
+    tenant = tmp_path / "tenants" / "lux"
+    tenant.mkdir(parents=True)
+    for filename in DATA_FILES.values():
+        shutil.copy(os.path.join(ROOT, filename), tenant / filename)
+    result = precompute_tenant(str(tenant), str(tmp_path / "out"))
+    assert result["error"] is None
+    return tenant, str(tmp_path / "out" / "lux")
+
+
+def test_reports_match_the_interactive_computations(tmp_path):
+    tenant, report_dir = make_tenant(tmp_path)
+    sales = str(tenant / DATA_FILES["sales"])
+    cost = str(tenant / DATA_FILES["cost"])
+
+    rollup = SalesRollup(reports.load_sales(sales))
+    daily = load_report(report_dir, "sales_daily", {"sales": sales}, {})
+    from_report = SalesRollup(daily)
+    for freq in ("D", "W", "M"):
+        pd.testing.assert_frame_equal(from_report.frame("2023-01-01", "2025-12-31", freq),
+                                      rollup.frame("2023-01-01", "2025-12-31", freq))
+
+    cost_df = reports.normalize_cost(reports.load_dataset(cost, "cost"))
+    summary = load_report(report_dir, "cost_summary", {"cost": cost}, {"margin": DEFAULT_PARAMS["margin"]})
+    assert reports.cost_summary_from_frame(summary) == reports.cost_summary(cost_df, DEFAULT_PARAMS["margin"])
+
+    growth_pct = default_growth_pct(derive_financials(cost_df, rollup))
+    params = {"growth": growth_pct, "discount": DEFAULT_PARAMS["valuation_discount"]}
+    result = reports.valuation_from_frame(load_report(report_dir, "valuation", {"cost": cost, "sales": sales}, params))
+    expected = reports.valuation(cost_df, rollup, assumptions={"growth": growth_pct / 100, "discount": 0.12})
+    pd.testing.assert_frame_equal(result["value_df"], expected["value_df"])
+    assert result["dcf"]["value_percentiles"] == expected["dcf"]["value_percentiles"]
+    pd.testing.assert_frame_equal(result["dcf"]["cash_flow_bands"], expected["dcf"]["cash_flow_bands"])
+
+
+def test_report_is_skipped_for_other_params_or_changed_source(tmp_path):
+    tenant, report_dir = make_tenant(tmp_path)
+    prices = str(tenant / DATA_FILES["product_prices"])
+    params = {"margin": DEFAULT_PARAMS["price_margin"], "overhead": DEFAULT_PARAMS["price_overhead"]}
+    assert load_report(report_dir, "prices", {"product_prices": prices}, params) is not None
+    assert load_report(report_dir, "prices", {"product_prices": prices}, dict(params, margin=0.4)) is None
+    with open(prices, "a", encoding="utf-8") as f:
+        f.write("\n")
+    assert load_report(report_dir, "prices", {"product_prices": prices}, params) is None
@@ -0,0 +1,191 @@
+import threading
+from datetime import date, timedelta
+
+import pandas as pd
+
+from smartdash.ga_reports import FAILED_RETRY_SECONDS, FakeAnalyticsClient, GAReportCache
+
+PROPERTY = "properties/1"
+METRICS = ["activeUsers", "newUsers"]
+TODAY = date(2025, 1, 31)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def make_cache(client, clock=None, **kwargs):
+    return GAReportCache(client_factory=lambda: client, today=lambda: TODAY, clock=clock or Clock(), **kwargs)
+
+
+def test_only_missing_ranges_are_fetched():
+    client = FakeAnalyticsClient()
+    cache = make_cache(client)
+    cache.get(PROPERTY, METRICS, date(2025, 1, 1), date(2025, 1, 10))
+    cache.get(PROPERTY, METRICS, date(2025, 1, 5), date(2025, 1, 15))
+    cache.get(PROPERTY, METRICS, date(2025, 1, 1), date(2025, 1, 15))
+    # Dager etter i dag hentes ikke
+    cache.get(PROPERTY, METRICS, date(2025, 1, 20), date(2025, 2, 10))
+    assert [(start, end) for _, _, start, end in client.calls] == [
+        (date(2025, 1, 1), date(2025, 1, 10)),
+        (date(2025, 1, 11), date(2025, 1, 15)),
+        (date(2025, 1, 20), TODAY),
+    ]
+
+
+def test_unsettled_days_are_refetched_after_the_ttl():
+    client = FakeAnalyticsClient()
+    clock = Clock()
+    cache = make_cache(client, clock, unsettled_days=3, unsettled_ttl=600)
+    cache.get(PROPERTY, METRICS, date(2025, 1, 1), TODAY)
+    clock.advance(599)
+    assert cache.fetch_ranges(PROPERTY, METRICS, date(2025, 1, 1), TODAY) == []
+    clock.advance(2)
+    assert cache.fetch_ranges(PROPERTY, METRICS, date(2025, 1, 1), TODAY) == [[TODAY - timedelta(days=3), TODAY]]
+    cache.get(PROPERTY, METRICS, date(2025, 1, 1), TODAY)
+    assert client.calls[-1][2:] == (TODAY - timedelta(days=3), TODAY)
+    assert cache.fetch_ranges(PROPERTY, METRICS, date(2025, 1, 1), TODAY) == []
+
+
+class GapClient(FakeAnalyticsClient):
+    # GA sender ingen rader for dager uten trafikk
+    def __init__(self, empty_days):
+        super().__init__()
+        self.empty_days = set(empty_days)
+
+    def fetch_pages(self, *args, **kwargs):
+        for page in super().fetch_pages(*args, **kwargs):
+            yield [(day, values) for day, values in page if day not in self.empty_days]
+
+
+def test_days_without_rows_are_stored_as_zero():
+    empty = date(2025, 1, 5)
+    client = GapClient([empty])
+    cache = make_cache(client)
+    df = cache.get(PROPERTY, METRICS, date(2025, 1, 1), date(2025, 1, 10))
+    assert len(df) == 10
+    assert df.loc[df["Dato"] == pd.Timestamp(empty), METRICS].values.tolist() == [[0.0, 0.0]]
+    assert cache.fetch_ranges(PROPERTY, METRICS, date(2025, 1, 1), date(2025, 1, 10)) == []
+
+
+def test_incremental_result_equals_a_full_fetch():
+    clock = Clock()
+    cache = make_cache(FakeAnalyticsClient(), clock)
+    for start, end in [(date(2024, 6, 1), date(2024, 8, 31)), (date(2024, 12, 1), TODAY),
+                       (date(2024, 7, 15), date(2024, 12, 15))]:
+        cache.get(PROPERTY, METRICS, start, end)
+        clock.advance(1000)
+    incremental = cache.get(PROPERTY, METRICS, date(2024, 6, 1), TODAY)
+    full = make_cache(FakeAnalyticsClient()).get(PROPERTY, METRICS, date(2024, 6, 1), TODAY)
+    pd.testing.assert_frame_equal(incremental, full)
+
+
+# Fem år med dager: to sider à 1000 rader
+FIVE_YEARS = (TODAY - timedelta(days=1826), TODAY)
+
+
+def finished(job):
+    assert job.finished.wait(10)
+    return job
+
+
+def test_fetch_job_pages_through_the_report():
+    client = FakeAnalyticsClient(page_delay=0.01)
+    cache = make_cache(client)
+    job = finished(cache.start_fetch(PROPERTY, METRICS, *FIVE_YEARS))
+    assert (job.status, job.pages, job.rows) == ("done", 2, 1827)
+    assert len(cache.cached_frame(PROPERTY, METRICS, *FIVE_YEARS)) == 1827
+
+
+class ClockedClient(FakeAnalyticsClient):
+    # Små sider der hver side tar page_seconds på den falske klokken
+    def __init__(self, clock, page_seconds, page_size=100):
+        super().__init__()
+        self.clock = clock
+        self.page_seconds = page_seconds
+        self.page_size = page_size
+
+    def fetch_pages(self, *args, **kwargs):
+        for page in super().fetch_pages(*args, page_size=self.page_size):
+            self.clock.advance(self.page_seconds)
+            yield page
+
+
+def test_fetch_stops_at_the_deadline_and_resumes_where_it_stopped():
+    clock = Clock()
+    client = ClockedClient(clock, page_seconds=25)
+    cache = make_cache(client, clock)
+    job = finished(cache.start_fetch(PROPERTY, METRICS, *FIVE_YEARS, deadline=60))
+    assert (job.status, job.pages, job.rows) == ("timeout", 3, 300)
+    assert len(cache.cached_frame(PROPERTY, METRICS, *FIVE_YEARS)) == 300
+
+    resumed = finished(cache.start_fetch(PROPERTY, METRICS, *FIVE_YEARS, deadline=1000))
+    assert resumed is not job
+    assert resumed.status == "done"
+    assert resumed.ranges == [[FIVE_YEARS[0] + timedelta(days=300), TODAY]]
+    assert resumed.rows == 1827 - 300
+    full = make_cache(FakeAnalyticsClient()).get(PROPERTY, METRICS, *FIVE_YEARS)
+    pd.testing.assert_frame_equal(cache.cached_frame(PROPERTY, METRICS, *FIVE_YEARS), full)
+
+
+class FailingClient(FakeAnalyticsClient):
+    def fetch_pages(self, *args, **kwargs):
+        self.calls.append(args)
+        raise RuntimeError("GA svarer ikke")
+
+
+def test_failed_fetch_is_not_retried_until_the_block_has_passed():
+    clock = Clock()
+    client = FailingClient()
+    cache = make_cache(client, clock)
+    job = finished(cache.start_fetch(PROPERTY, METRICS, date(2025, 1, 1), TODAY))
+    assert job.status == "failed" and isinstance(job.error, RuntimeError)
+    clock.advance(FAILED_RETRY_SECONDS - 1)
+    assert cache.start_fetch(PROPERTY, METRICS, date(2025, 1, 1), TODAY) is job
+    assert len(client.calls) == 1
+    clock.advance(2)
+    retry = finished(cache.start_fetch(PROPERTY, METRICS, date(2025, 1, 1), TODAY))
+    assert retry is not job
+    assert len(client.calls) == 2
+
+
+class BlockingClient(FakeAnalyticsClient):
+    # Holder første side tilbake til testen slipper den
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def fetch_pages(self, *args, **kwargs):
+        self.release.wait(10)
+        yield from super().fetch_pages(*args, **kwargs)
+
+
+def test_concurrent_start_fetch_calls_share_one_job():
+    client = BlockingClient()
+    cache = make_cache(client)
+    jobs = []
+    barrier = threading.Barrier(8)
+
+    def start():
+        barrier.wait()
+        jobs.append(cache.start_fetch(PROPERTY, METRICS, date(2025, 1, 1), TODAY))
+
+    threads = [threading.Thread(target=start) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # En annen periode er en egen jobb, ikke den som allerede kjører
+    other = cache.start_fetch(PROPERTY, METRICS, date(2024, 12, 1), date(2024, 12, 31))
+    client.release.set()
+    assert len({id(job) for job in jobs}) == 1
+    assert other is not jobs[0]
+    assert finished(jobs[0]).status == "done" and finished(other).status == "done"
+    assert len(client.calls) == 2
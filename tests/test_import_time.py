@@ -0,0 +1,13 @@
+from benchmarks.import_time import DEFAULT_BUDGET_SECONDS, app_imports, measure, slowest_modules
+
+
+def test_app_imports_stay_within_budget():
+    # Kald start i en ny prosess, som benchmarks.import_time; de tregeste modulene
+    # (fra -X importtime) vises når testen feiler
+    source = app_imports()
+    result = measure(source, repeat=3)
+    assert result["loaded"] == [], f"importeres ved oppstart, men skal lastes ved behov: {result['loaded']}"
+    if result["seconds"] > DEFAULT_BUDGET_SECONDS:
+        slowest = ", ".join(f"{name} {seconds:.3f} s" for name, seconds in slowest_modules(source, 10))
+        raise AssertionError(f"importtiden {result['seconds']:.3f} s er over budsjettet "
+                             f"{DEFAULT_BUDGET_SECONDS:g} s. Tregest: {slowest}")
@@ -0,0 +1,28 @@
+import time
+from io import BytesIO
+
+import pandas as pd
+
+from smartdash.dataset_cache import DatasetCache
+from smartdash.ingest import IngestCoordinator
+from smartdash.reports import parse_sales_data
+from smartdash.snapshots import content_hash
+
+
+def test_worker_writes_snapshot_and_parent_maps_it():
+    # Unikt innhold, så arbeidsprosessen må parse filen og skrive et nytt snapshot
+    data = f"date,antallordre,sales\n2024-01-01,2, 1 000.00\n2024-01-02,1,{time.time_ns()}\n".encode("utf-8")
+    key = ("sales", content_hash(data))
+    coordinator = IngestCoordinator(DatasetCache(), max_workers=1)
+    try:
+        task = coordinator.submit("Salgsdata", BytesIO(data), key)
+        coordinator.wait(key)
+        assert task.error is None and task.rows == 2
+        df = coordinator.cache.peek(key)
+        pd.testing.assert_frame_equal(df, parse_sales_data(BytesIO(data)))
+        # Tallkolonnen peker inn i den minnemappede filen, ikke i en kopi sendt fra arbeidsprosessen
+        assert not df["antallordre"].to_numpy().flags.writeable
+        # Samme fil sendes ikke på nytt
+        assert coordinator.submit("Salgsdata", BytesIO(data), key) is task
+    finally:
+        coordinator._pool.shutdown()
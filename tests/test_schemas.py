@@ -0,0 +1,41 @@
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from smartdash.schemas import iter_parse_csv, parse_csv, parse_issues
+
+SALES = (
+    "\ufeffdate,xsales,antallordre,produkt,sales\n"
+    "2024-01-01, 1 000.00 ,3,1.5,−12\n"
+    "2024-01-02,abc,x,,1e3\n"
+    " 03.01.2024 ,.5,  ,7, 1 234.5\n"
+    "2024-01-04,+3.,4,5,1\t000\n"
+)
+
+
+def test_numbers_with_grouping_and_bad_values():
+    df = parse_csv(BytesIO(SALES.encode("utf-8")), "sales")
+    assert df["xsales"].tolist()[0] == 1000.0
+    assert np.isnan(df["xsales"].iat[1])
+    assert df["sales"].tolist() == [-12.0, 1000.0, 1234.5, 1000.0]
+    assert df["date"].iat[2] == pd.Timestamp("2024-01-03")
+    # Ett ugyldig tall og én ugyldig heltallsverdi; tomme celler er lov
+    count, issues = parse_issues(df)
+    assert count == 2
+    assert issues[["row", "column", "value"]].values.tolist() == [[3, "xsales", "abc"], [3, "antallordre", "x"]]
+
+
+def test_integer_columns_keep_integer_dtype():
+    df = parse_csv(BytesIO(b"date,antallordre,produkt,sales\n2024-01-01,3,1,1 000\n2024-01-02,4,2,2 000\n"), "sales")
+    assert df["antallordre"].dtype == "int32"
+    assert df["sales"].dtype == "int64"
+    assert df["produkt"].tolist() == [1, 2]
+
+
+def test_chunks_parse_like_the_whole_file():
+    data = SALES.encode("utf-8")
+    whole = parse_csv(BytesIO(data), "sales")
+    chunks = list(iter_parse_csv(BytesIO(data), "sales", chunksize=2))
+    pd.testing.assert_frame_equal(pd.concat(chunks), whole, check_dtype=False)
+    assert sum(parse_issues(chunk)[0] for chunk in chunks) == parse_issues(whole)[0]